@@ -0,0 +1,321 @@
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from api.metrics import format_labels
+from api.routes.endpoints import endpoints
+from api.settings import api_settings
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average and bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Returns 0 if a token is available, else the seconds until one is."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop runs callbacks.
+
+    When the loop, or the GIL shared with job threads, is busy, a request that
+    arrives waits about this long before any middleware sees it. Rises to each
+    new high right away and decays over a few intervals.
+    """
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.lag = 0.0
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.lag = lag if lag > self.lag else self.lag + 0.3 * (lag - self.lag)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """Decides which requests to an endpoint are handled and which are turned away.
+
+    Requests are rate limited, with a 429, by a token bucket for the endpoint and
+    one for each client. Admitted requests then run at most max_concurrent at a
+    time; the rest wait in a queue of up to max_queue requests. A request is
+    rejected right away, with a 503, if the queue is full or if its expected wait
+    is over queue_target seconds. The expected wait is the event loop lag plus
+    the time the requests ahead of it take, from the recent time requests took.
+    Requests that still wait longer than queue_target are rejected then. Under
+    overload the excess is turned away cheaply instead of waiting, so the latency
+    of the requests that are handled stays close to queue_target.
+
+    Runs on the event loop thread, so the counters are plain attributes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: int,
+        client_rate: float,
+        client_burst: int,
+        max_concurrent: int,
+        max_queue: int,
+        queue_target: float,
+        max_clients: int = 10000,
+    ):
+        self.name = name
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_target = queue_target
+        self.max_clients = max_clients
+
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rate_limited = 0
+        self.shed = 0
+        # Moving average of the seconds a request takes once admitted
+        self.service_time = 0.0
+        self._bucket = TokenBucket(rate, burst, time.monotonic()) if rate > 0 else None
+        # Buckets of the most recent clients
+        self._client_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_client_bucket(self, client: str, now: float) -> TokenBucket:
+        bucket = self._client_buckets.get(client)
+        if bucket is None:
+            bucket = TokenBucket(self.client_rate, self.client_burst, now)
+            self._client_buckets[client] = bucket
+            if len(self._client_buckets) > self.max_clients:
+                self._client_buckets.popitem(last=False)
+        else:
+            self._client_buckets.move_to_end(client)
+        return bucket
+
+    def check_rate(self, client: str) -> None:
+        """Takes a token for the request from the endpoint's and the client's
+        buckets. Raises AdmissionRejected if either is empty."""
+        now = time.monotonic()
+        buckets: List[TokenBucket] = []
+        if self._bucket is not None:
+            buckets.append(self._bucket)
+        if self.client_rate > 0:
+            buckets.append(self._get_client_bucket(client, now))
+        wait = max([bucket.wait_time(now) for bucket in buckets], default=0.0)
+        if wait > 0:
+            self.rate_limited += 1
+            raise AdmissionRejected(429, "Too many requests", wait)
+        for bucket in buckets:
+            bucket.take()
+
+    def expected_wait(self, loop_lag: float = 0.0) -> float:
+        """Seconds a request arriving now is expected to wait for a turn."""
+        if self.active < self.max_concurrent:
+            return loop_lag
+        return loop_lag + (self.waiting + 1) * self.service_time / self.max_concurrent
+
+    async def acquire(self, loop_lag: float = 0.0) -> None:
+        """Waits for a turn to run. Raises AdmissionRejected if the wait would be
+        over queue_target."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        expected_wait = self.expected_wait(loop_lag)
+        if expected_wait > self.queue_target or (
+            self._semaphore.locked() and self.waiting >= self.max_queue
+        ):
+            self.shed += 1
+            raise AdmissionRejected(
+                503, "Server is busy", max(expected_wait, self.queue_target)
+            )
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_target)
+            except asyncio.TimeoutError:
+                self.shed += 1
+                raise AdmissionRejected(503, "Server is busy", self.queue_target)
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+
+    def release(self, duration: float) -> None:
+        self.active -= 1
+        self.service_time += 0.1 * (duration - self.service_time)
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "shed": self.shed,
+            "service_time": self.service_time,
+        }
+
+
+class AdmissionController:
+    """The AdmissionLimiter of each limited endpoint, by request method and path."""
+
+    def __init__(
+        self,
+        limiters: Dict[Tuple[str, str], AdmissionLimiter],
+        client_header: Optional[str] = None,
+    ):
+        self.limiters = limiters
+        self.lag_monitor = LoopLagMonitor()
+        self.client_header = client_header.lower().encode() if client_header else None
+
+    def get_limiter(self, scope: Scope) -> Optional[AdmissionLimiter]:
+        return self.limiters.get((scope["method"], scope["path"]))
+
+    def get_client(self, scope: Scope) -> str:
+        if self.client_header is not None:
+            for name, value in scope["headers"]:
+                if name == self.client_header:
+                    return value.decode("latin-1")
+        client = scope.get("client")
+        return client[0] if client else ""
+
+    def render(self) -> List[str]:
+        """Returns the metrics in the Prometheus text format, one line per item."""
+        limiters = {limiter.name: limiter for limiter in self.limiters.values()}
+        lines = [
+            "# HELP admission_requests_total Requests admitted, rate limited and shed.",
+            "# TYPE admission_requests_total counter",
+        ]
+        for name, limiter in sorted(limiters.items()):
+            stats = limiter.stats()
+            for result in ("admitted", "rate_limited", "shed"):
+                labels = format_labels({"limiter": name, "result": result})
+                lines.append(f"admission_requests_total{{{labels}}} {stats[result]}")
+        lines += [
+            "# TYPE admission_loop_lag_seconds gauge",
+            f"admission_loop_lag_seconds {self.lag_monitor.lag}",
+        ]
+        for gauge in ("active", "waiting"):
+            lines.append(f"# TYPE admission_{gauge} gauge")
+            for name, limiter in sorted(limiters.items()):
+                labels = format_labels({"limiter": name})
+                lines.append(f"admission_{gauge}{{{labels}}} {limiter.stats()[gauge]}")
+        return lines
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that runs requests to limited endpoints through their
+    AdmissionLimiter and answers rejected requests with a 429 or 503 and a
+    Retry-After header, without routing them."""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController) -> None:
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limiter = (
+            self.controller.get_limiter(scope) if scope["type"] == "http" else None
+        )
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        self.controller.lag_monitor.start()
+        try:
+            limiter.check_rate(self.controller.get_client(scope))
+            await limiter.acquire(self.controller.lag_monitor.lag)
+        except AdmissionRejected as e:
+            await self.reject(send, e)
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - start)
+
+    async def reject(self, send: Send, rejected: AdmissionRejected) -> None:
+        body = json.dumps({"detail": rejected.detail}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": rejected.status_code,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (
+                        b"retry-after",
+                        str(max(1, math.ceil(rejected.retry_after))).encode(),
+                    ),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+def create_admission_controller() -> AdmissionController:
+    def create_limiter(name: str, rate: float, burst: int) -> AdmissionLimiter:
+        return AdmissionLimiter(
+            name=name,
+            rate=rate,
+            burst=burst,
+            client_rate=api_settings.admission_client_rate,
+            client_burst=api_settings.admission_client_burst,
+            max_concurrent=api_settings.admission_max_concurrent,
+            max_queue=api_settings.admission_max_queue,
+            queue_target=api_settings.admission_queue_target,
+        )
+
+    run_limiter = create_limiter(
+        "run", api_settings.admission_run_rate, api_settings.admission_run_burst
+    )
+    train_limiter = create_limiter(
+        "train", api_settings.admission_train_rate, api_settings.admission_train_burst
+    )
+    return AdmissionController(
+        limiters={
+            ("POST", f"/v1{endpoints.RUN}/job"): run_limiter,
+            ("POST", f"/v1{endpoints.RUN}/jobs"): run_limiter,
+            ("POST", f"/v1{endpoints.TRAIN}/job"): train_limiter,
+        },
+        client_header=api_settings.admission_client_header,
+    )
+
+
+# Create AdmissionController object
+admission_controller = create_admission_controller()
@@ -1,16 +1,18 @@
 from fastapi import FastAPI
-from fastapi_utils.tasks import repeat_every
-from starlette.requests import Request
-from starlette.responses import Response
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
-from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR
-from sqlalchemy.engine import Engine, create_engine
-from sqlalchemy.orm import Session, scoped_session, sessionmaker
 
+from api.admission import AdmissionMiddleware, admission_controller
+from api.metrics import RequestMetricsMiddleware, request_metrics
 from api.settings import api_settings
 from api.routes.v1_routes import v1_router
-from utils.run_jobs import run_scheduled_jobs
-from utils.log import logger
+from db.session import create_sqlite_tables, dispose_db_engines, init_db_engines
+from jobs.engine import job_engine
+from jobs.scheduler import job_scheduler
+from jobs.sweeps import sweep_engine, trial_pool
+from jobs.training import train_engine
+from llm.cache import completion_cache
+from llm.client import completion_client
 
 
 # Create FastAPI App
@@ -25,26 +27,16 @@ app: FastAPI = FastAPI(
 # Add v1 router
 app.include_router(v1_router)
 
-# Create SQLAlchemy Engine
-db_uri = api_settings.get_db_uri()
-sqlalchemy_engine: Engine = create_engine(db_uri, pool_pre_ping=True)
-
-# Create 2 types of database sessions:
-# 1. db_session: used for background tasks
-# 2. request_db_session: used for each request
-# db_session is a scoped session which means it is created on app startup (i.e. when it is first accessed)
-# This is used by background tasks and long-running processes
-db_session: Session = scoped_session(
-    sessionmaker(autocommit=False, autoflush=False, bind=sqlalchemy_engine)
-)  # type: ignore # noqa
-
-# request_db_session is a session created for each request
-# This is added to the request state so that it can be accessed by the request handler
-request_db_session: Session = sessionmaker(
-    autocommit=False, autoflush=False, bind=sqlalchemy_engine
-)  # type: ignore
+# Database sessions are created in db/session.py
+# Routes that need a database session depend on db.session.get_db (sync routes)
+# or db.session.get_request_db (async routes), which create the session lazily
+# and close it after the request.
 
 # Add Middlewares
+# Rate limit the job endpoints and shed requests that would wait too long.
+# Added first so it is the innermost middleware and rejections get CORS headers.
+if api_settings.admission_enabled:
+    app.add_middleware(AdmissionMiddleware, controller=admission_controller)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=api_settings.cors_origin_list,
@@ -52,29 +44,60 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Record request counts, latency and in-flight requests for each route.
+# Added last so it is the outermost middleware and times the whole request.
+app.add_middleware(RequestMetricsMiddleware, metrics=request_metrics)
 
 
-# Add Middleware Functions
-# A middleware is a function that is always executed for each request,
-# and handles the code executed before and after the request.
-# We need to have an independent database session/connection (SessionLocal) per request,
-# use the same session through the request and then close it after the request is finished.
-@app.middleware("http")
-async def db_session_middleware(request: Request, call_next):
-    response = Response(
-        "Internal server error", status_code=HTTP_500_INTERNAL_SERVER_ERROR
-    )
+# Create database engines on startup rather than when the app is imported
+@app.on_event("startup")
+async def startup_db_engines():
+    await run_in_threadpool(init_db_engines)
+
+
+# Create tables for the sqlite fallback on startup
+@app.on_event("startup")
+async def startup_create_tables():
+    await create_sqlite_tables()
+
+
+# Start the job engine on startup and stop it on shutdown
+@app.on_event("startup")
+async def startup_job_engine():
+    job_engine.start()
+    train_engine.start()
+    sweep_engine.start()
 
-    try:
-        request.state.db = request_db_session()
-        response = await call_next(request)
-    finally:
-        request.state.db.close()
-    return response
 
+@app.on_event("shutdown")
+async def shutdown_job_engine():
+    job_engine.shutdown()
+    train_engine.shutdown()
+    sweep_engine.shutdown()
+    trial_pool.shutdown()
 
-# Create a background task to run every 60 seconds
+
+# Start the scheduler on startup and stop it on shutdown
+# The scheduler dispatches scheduled jobs onto the job engine
 @app.on_event("startup")
-@repeat_every(seconds=60, logger=logger)
-async def background_task():
-    run_scheduled_jobs()
+async def startup_scheduler():
+    if api_settings.scheduler_enabled:
+        job_scheduler.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_scheduler():
+    await job_scheduler.stop()
+
+
+# Close pooled database connections on shutdown, after jobs have stopped
+@app.on_event("shutdown")
+async def shutdown_db_engines():
+    await dispose_db_engines()
+
+
+# Close the pooled connections to the completion api on shutdown
+@app.on_event("shutdown")
+async def shutdown_completion_client():
+    await completion_client.aclose()
+    completion_cache.close()
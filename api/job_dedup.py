@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import json
+import threading
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional
+
+from api.settings import api_settings
+from db.crud.job_run_keys import (
+    ACTIVE_STATUSES,
+    JobRunClaim,
+    claim_job_run,
+    release_job_run_key,
+)
+from db.session import RequestDb
+from utils.log import logger
+
+
+@dataclass
+class RunKey:
+    value: str
+    # "idempotency" or "coalesce", see JobRunKeys
+    kind: str
+    # Seconds the key is held for
+    ttl: float
+    # sha256 of the job name and params the key was sent with
+    params_hash: str
+
+
+class JobRunKeyConflict(Exception):
+    """Raised when an idempotency key is sent again for another job or params."""
+
+
+def get_hash(value: Dict[str, Any]) -> str:
+    data = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def get_run_key(
+    endpoint: str,
+    job_name: str,
+    params: Dict[str, Any],
+    idempotency_key: Optional[str] = None,
+    coalesce: bool = False,
+) -> Optional[RunKey]:
+    """Returns the key a job request is deduplicated by, or None.
+
+    Requests with an idempotency key return the same run until the key expires,
+    if they are for the same job and params. Otherwise, with coalesce, requests
+    for the same job and params share a run while it is queued or running.
+    """
+    params_hash = get_hash({"job_name": job_name, "params": params})
+    if idempotency_key is not None:
+        value = get_hash({"endpoint": endpoint, "idempotency_key": idempotency_key})
+        return RunKey(
+            value, "idempotency", api_settings.idempotency_key_ttl, params_hash
+        )
+    if coalesce:
+        value = get_hash({"endpoint": endpoint, "params_hash": params_hash})
+        return RunKey(value, "coalesce", api_settings.job_coalesce_ttl, params_hash)
+    return None
+
+
+class JobDeduplicator:
+    """Attaches duplicate job requests to the run created for the first one.
+
+    Across replicas, the primary key of job_run_keys lets only one run hold a key.
+    Within a replica, concurrent requests for a key share one claim, and the runs
+    this replica started are kept in memory while they are queued or running, so
+    duplicates sent to it attach without reading the database.
+    """
+
+    def __init__(self) -> None:
+        self._runs: Dict[str, JobRunClaim] = {}
+        self._keys: Dict[int, str] = {}
+        self._claims: Dict[str, "asyncio.Future[JobRunClaim]"] = {}
+        self._lock = threading.Lock()
+
+    async def claim(self, db: RequestDb, run_key: RunKey, job_name: str) -> JobRunClaim:
+        """Returns a new run for run_key, with created set, or the run that
+        already holds it. Raises JobRunKeyConflict if the run holding it was
+        created for another job or params."""
+        with self._lock:
+            local = self._runs.get(run_key.value)
+        if local is not None:
+            return self._check(replace(local, created=False), run_key)
+        pending = self._claims.get(run_key.value)
+        if pending is not None:
+            claim = await asyncio.shield(pending)
+            return self._check(replace(claim, created=False), run_key)
+
+        future: "asyncio.Future[JobRunClaim]" = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._claims[run_key.value] = future
+        try:
+            claim = await db.run(
+                claim_job_run,
+                run_key.value,
+                run_key.kind,
+                job_name,
+                run_key.ttl,
+                run_key.params_hash,
+            )
+        except BaseException as e:
+            if isinstance(e, Exception):
+                future.set_exception(e)
+                # Mark the exception as retrieved, no request may be waiting for it
+                future.exception()
+            else:
+                future.cancel()
+            raise
+        finally:
+            del self._claims[run_key.value]
+        future.set_result(claim)
+        if claim.created:
+            with self._lock:
+                self._runs[run_key.value] = claim
+                self._keys[claim.id_job_run] = run_key.value
+        return self._check(claim, run_key)
+
+    @staticmethod
+    def _check(claim: JobRunClaim, run_key: RunKey) -> JobRunClaim:
+        # Keys stored before params were recorded have no params_hash
+        if claim.params_hash is not None and claim.params_hash != run_key.params_hash:
+            raise JobRunKeyConflict(
+                "Idempotency-Key was already used for a request with other params"
+            )
+        return claim
+
+    async def release(self, db: RequestDb, run_key: RunKey, id_job_run: int) -> None:
+        """Frees run_key when its run could not be started. If this fails, the key
+        is freed when it expires."""
+        self._forget(id_job_run)
+        try:
+            await db.run(release_job_run_key, run_key.value, id_job_run)
+        except Exception as e:
+            logger.error("Failed to release job run key of %s: %s", id_job_run, e)
+
+    def on_status(self, id_job_run: int, job_name: str, status: str) -> None:
+        """Job engine status listener, forgets runs once they end."""
+        if status in ACTIVE_STATUSES:
+            with self._lock:
+                run_key = self._keys.get(id_job_run)
+                if run_key is not None:
+                    self._runs[run_key] = replace(self._runs[run_key], status=status)
+        else:
+            self._forget(id_job_run)
+
+    def _forget(self, id_job_run: int) -> None:
+        with self._lock:
+            run_key = self._keys.pop(id_job_run, None)
+            if run_key is not None:
+                self._runs.pop(run_key, None)
+
+
+# Create JobDeduplicator object
+job_deduplicator = JobDeduplicator()
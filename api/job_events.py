@@ -0,0 +1,122 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from api.settings import api_settings
+from db.crud.job_runs import get_job_run_states
+from db.session import db_session
+from jobs.status import job_run_status
+from utils.log import logger
+
+# Statuses after which a run does not change
+FINAL_STATUSES = {job_run_status.SUCCESS, job_run_status.FAILED, job_run_status.PRUNED}
+
+
+def read_job_run_states(ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    try:
+        return {
+            state["id_job_run"]: state for state in get_job_run_states(db_session, ids)
+        }
+    finally:
+        db_session.remove()
+
+
+class JobRunWatcher:
+    """Pushes changes of job runs to the clients following them.
+
+    Status changes made by this process's job engines are pushed as they happen,
+    using the engines' status listeners. Changes made by other replicas, and job
+    progress, are picked up by one query every poll_interval seconds for all runs
+    that are followed, so the load on the database does not grow with the number
+    of clients.
+    """
+
+    def __init__(self, poll_interval: float, keepalive_interval: float):
+        self.poll_interval = poll_interval
+        self.keepalive_interval = keepalive_interval
+        self._queues: Dict[int, Set["asyncio.Queue[Dict[str, Any]]"]] = {}
+        self._states: Dict[int, Dict[str, Any]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._poller: Optional["asyncio.Task[None]"] = None
+
+    def on_status(self, id_job_run: int, job_name: str, status: str) -> None:
+        """Job engine status listener, called from the engine's threads."""
+        loop = self._loop
+        if loop is not None and id_job_run in self._queues:
+            loop.call_soon_threadsafe(
+                self._publish, id_job_run, {"job_name": job_name, "status": status}
+            )
+
+    def _publish(self, id_job_run: int, changes: Dict[str, Any]) -> None:
+        queues = self._queues.get(id_job_run)
+        if not queues:
+            return
+        state = {**self._states.get(id_job_run, {}), **changes}
+        if state == self._states.get(id_job_run):
+            return
+        self._states[id_job_run] = state
+        for queue in queues:
+            queue.put_nowait(state)
+
+    async def _poll(self) -> None:
+        while self._queues:
+            await asyncio.sleep(self.poll_interval)
+            ids = list(self._queues)
+            if not ids:
+                break
+            try:
+                states = await run_in_threadpool(read_job_run_states, ids)
+            except Exception as e:
+                logger.warning("Failed to poll job runs: %s", e)
+                continue
+            for id_job_run, state in states.items():
+                self._publish(id_job_run, state)
+        self._poller = None
+
+    async def get_state(self, id_job_run: int) -> Optional[Dict[str, Any]]:
+        """Reads the current state of a run from the database."""
+        states = await run_in_threadpool(read_job_run_states, [id_job_run])
+        return states.get(id_job_run)
+
+    async def follow(
+        self,
+        id_job_run: int,
+        state: Dict[str, Any],
+        keepalive_interval: Optional[float] = None,
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Yields the state of a run, starting with `state`, and then each change
+        until the run ends. Yields None every keepalive_interval seconds without
+        changes, so callers can keep idle connections open."""
+        keepalive_interval = keepalive_interval or self.keepalive_interval
+        self._loop = asyncio.get_running_loop()
+        queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        self._queues.setdefault(id_job_run, set()).add(queue)
+        self._states.setdefault(id_job_run, state)
+        if self._poller is None:
+            self._poller = asyncio.ensure_future(self._poll())
+        try:
+            while True:
+                yield state
+                if state.get("status") in FINAL_STATUSES:
+                    return
+                while True:
+                    try:
+                        state = await asyncio.wait_for(queue.get(), keepalive_interval)
+                        break
+                    except asyncio.TimeoutError:
+                        yield None
+        finally:
+            queues = self._queues.get(id_job_run)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._queues[id_job_run]
+                    self._states.pop(id_job_run, None)
+
+
+# Create JobRunWatcher object
+job_run_watcher = JobRunWatcher(
+    poll_interval=api_settings.job_events_poll_interval,
+    keepalive_interval=api_settings.job_events_keepalive_interval,
+)
@@ -0,0 +1,32 @@
+from typing import List, Optional
+
+from api.job_dedup import RunKey, job_deduplicator
+from db.crud.job_runs import update_job_runs_status
+from db.session import RequestDb
+from jobs.engine import JobEngine
+from jobs.status import job_run_status
+from utils.log import logger
+
+
+async def fail_job_runs(db: RequestDb, ids: List[int]) -> None:
+    """Marks runs that were created but could not be submitted as failed."""
+    try:
+        await db.run(update_job_runs_status, ids, job_run_status.FAILED, ended=True)
+    except Exception as e:
+        logger.error("Failed to mark job runs %s as failed: %s", ids, e)
+
+
+async def fail_job_run(
+    db: RequestDb,
+    engine: JobEngine,
+    id_job_run: Optional[int],
+    run_key: Optional[RunKey] = None,
+) -> None:
+    """Cleans up after a run that could not be queued: releases its slot on
+    engine and, if the run was created, marks it failed and frees its run key."""
+    engine.release()
+    if id_job_run is None:
+        return
+    await fail_job_runs(db, [id_job_run])
+    if run_key is not None:
+        await job_deduplicator.release(db, run_key, id_job_run)
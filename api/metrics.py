@@ -0,0 +1,168 @@
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# Route label for requests that do not match a route.
+# Raw paths are never used as labels, so unknown urls cannot add new series.
+UNMATCHED_ROUTE = "unmatched"
+
+
+def format_labels(labels: Dict[str, Any]) -> str:
+    return ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in labels.items()
+    )
+
+
+class RequestMetrics:
+    """Request counts, latency histograms and in-flight gauges per route template.
+
+    Updated by RequestMetricsMiddleware on the event loop thread, so the counters
+    are plain dicts without locks.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        # (method, route, status) -> count
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        # (method, route) -> [count per bucket..., count above the last bucket]
+        self.latency_buckets: Dict[Tuple[str, str], List[int]] = {}
+        self.latency_sum: Dict[Tuple[str, str], float] = {}
+        self.in_flight: Dict[Tuple[str, str], int] = {}
+
+    def start(self, key: Tuple[str, str]) -> None:
+        self.in_flight[key] = self.in_flight.get(key, 0) + 1
+
+    def finish(self, key: Tuple[str, str], status_code: int, duration: float) -> None:
+        self.in_flight[key] -= 1
+        requests_key = (key[0], key[1], status_code)
+        self.requests[requests_key] = self.requests.get(requests_key, 0) + 1
+        counts = self.latency_buckets.get(key)
+        if counts is None:
+            counts = self.latency_buckets[key] = [0] * (len(self.buckets) + 1)
+            self.latency_sum[key] = 0.0
+        counts[bisect_left(self.buckets, duration)] += 1
+        self.latency_sum[key] += duration
+
+    def render(self) -> List[str]:
+        """Returns the metrics in the Prometheus text format, one line per item."""
+        lines = [
+            "# HELP http_requests_total Requests by method, route and status code.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status_code), count in sorted(self.requests.items()):
+            labels = format_labels(
+                {"method": method, "route": route, "status": status_code}
+            )
+            lines.append(f"http_requests_total{{{labels}}} {count}")
+
+        lines += [
+            "# HELP http_request_duration_seconds Request latency by method and route.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), counts in sorted(self.latency_buckets.items()):
+            labels = format_labels({"method": method, "route": route})
+            cumulative = 0
+            for upper_bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(
+                    f'http_request_duration_seconds_bucket{{{labels},le="{upper_bound}"}} '
+                    f"{cumulative}"
+                )
+            cumulative += counts[-1]
+            lines += [
+                f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}',
+                f"http_request_duration_seconds_sum{{{labels}}} "
+                f"{self.latency_sum[(method, route)]}",
+                f"http_request_duration_seconds_count{{{labels}}} {cumulative}",
+            ]
+
+        lines += [
+            "# HELP http_requests_in_progress Requests being served by method and route.",
+            "# TYPE http_requests_in_progress gauge",
+        ]
+        for (method, route), count in sorted(self.in_flight.items()):
+            labels = format_labels({"method": method, "route": route})
+            lines.append(f"http_requests_in_progress{{{labels}}} {count}")
+        return lines
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware that records RequestMetrics for http requests.
+
+    This is a plain ASGI middleware rather than a BaseHTTPMiddleware, which runs
+    each request in a separate task and costs far more than the recording itself.
+    """
+
+    def __init__(self, app: ASGIApp, metrics: RequestMetrics) -> None:
+        self.app = app
+        self.metrics = metrics
+        # Paths of routes without path parameters, which are their own template
+        self._static_routes: Optional[Dict[str, str]] = None
+
+    def get_route(self, scope: Scope) -> str:
+        """Returns the template of the route matching the request."""
+        router = scope["app"].router
+        if self._static_routes is None:
+            self._static_routes = {
+                route.path: route.path
+                for route in router.routes
+                if getattr(route, "path", None) and not route.param_convertors
+            }
+        route_path = self._static_routes.get(scope["path"])
+        if route_path is not None:
+            return route_path
+
+        partial_match = None
+        for route in router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", UNMATCHED_ROUTE)
+            if match == Match.PARTIAL and partial_match is None:
+                partial_match = getattr(route, "path", UNMATCHED_ROUTE)
+        return partial_match or UNMATCHED_ROUTE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        key = (scope["method"], self.get_route(scope))
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        self.metrics.start(key)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.finish(key, status_code, time.perf_counter() - start)
+
+
+# Create RequestMetrics object
+request_metrics = RequestMetrics()
@@ -0,0 +1,231 @@
+import asyncio
+import io
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from api.settings import api_settings
+from jobs.artifacts import artifact_store
+from utils.log import logger
+
+
+@dataclass
+class CachedModel:
+    model_id: str
+    estimator: Any
+    n_features: int
+    # Size of the serialized model, used as an estimate of its size in memory
+    nbytes: int
+
+
+class ModelCache:
+    """A thread-safe LRU cache of fitted models, bounded by their total size.
+
+    When the models use more than max_bytes, the least recently used models are
+    evicted. Each model is loaded once when requested by concurrent callers.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._models: "OrderedDict[str, CachedModel]" = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+
+    def _get(self, model_id: str) -> Optional[CachedModel]:
+        with self._lock:
+            model = self._models.get(model_id)
+            if model is not None:
+                self._models.move_to_end(model_id)
+            return model
+
+    def _put(self, model: CachedModel) -> None:
+        with self._lock:
+            # Models larger than the cache are served but not kept
+            if model.nbytes > self.max_bytes:
+                return
+            self._models[model.model_id] = model
+            self._nbytes += model.nbytes
+            while self._nbytes > self.max_bytes:
+                _, evicted = self._models.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+                self.evictions += 1
+
+    def get_cached(self, model_id: str) -> Optional[CachedModel]:
+        """Returns a model if it is cached. Does not block, so the api can
+        skip the thread hop of get() for cached models."""
+        model = self._get(model_id)
+        if model is not None:
+            self.hits += 1
+        return model
+
+    def get(self, model_id: str) -> CachedModel:
+        """Returns a model, loading it from the artifact store if it is not cached.
+
+        Raises KeyError if the model was not trained. Blocks while loading,
+        call it from a thread.
+        """
+        model = self.get_cached(model_id)
+        if model is not None:
+            return model
+
+        with self._lock:
+            loading = self._loading.setdefault(model_id, threading.Lock())
+        with loading:
+            # Another caller may have loaded the model while this one waited
+            model = self._get(model_id)
+            if model is not None:
+                self.hits += 1
+                return model
+            self.misses += 1
+            try:
+                model = load_cached_model(model_id)
+                self._put(model)
+            finally:
+                with self._lock:
+                    self._loading.pop(model_id, None)
+        return model
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+            self._nbytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "models": len(self._models),
+            "bytes": self._nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def load_cached_model(model_id: str) -> CachedModel:
+    import joblib
+
+    record = artifact_store.get_model_record(model_id)
+    if record is None:
+        raise KeyError(f"Model not found: {model_id}")
+    data = artifact_store.get(record["artifact"])
+    logger.info("Loading model %s: %s bytes", model_id, len(data))
+    return CachedModel(
+        model_id=model_id,
+        estimator=joblib.load(io.BytesIO(data)),
+        n_features=record["n_features"],
+        nbytes=len(data),
+    )
+
+
+def predict_rows(model: CachedModel, rows: List[List[float]]) -> List[Any]:
+    """Returns the predictions of a model for rows, using one vectorized call."""
+    import numpy as np
+
+    X = np.asarray(rows, dtype=np.float64)
+    return model.estimator.predict(X).tolist()
+
+
+class PredictionBatcher:
+    """Coalesces concurrent single-row predictions into batches.
+
+    The first row for a model starts a batch, which collects rows for up to
+    window seconds or until it has max_batch_size rows, then predicts all of them
+    with one vectorized call on a worker thread. Each model has at most one batch
+    running; rows that arrive meanwhile are predicted as soon as it finishes,
+    so batches grow with the load. With a window of 0 each row is predicted
+    on its own.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, window: float, max_batch_size: int):
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.rows = 0
+        # Pending (row, future) for each model and the task that flushes them
+        self._pending: Dict[str, List[Tuple[List[float], asyncio.Future]]] = {}
+        self._flush_tasks: Dict[str, asyncio.Task] = {}
+        # Models with a batch running. The event loop only keeps weak references
+        # to tasks, so they are kept here until they finish.
+        self._batch_tasks: Dict[str, asyncio.Task] = {}
+
+    async def predict(self, model: CachedModel, row: List[float]) -> Any:
+        if self.window <= 0:
+            self.batches += 1
+            self.rows += 1
+            predictions = await run_in_threadpool(predict_rows, model, [row])
+            return predictions[0]
+
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending.setdefault(model.model_id, [])
+        pending.append((row, future))
+        if model.model_id in self._batch_tasks:
+            # Flushed when the running batch finishes
+            pass
+        elif len(pending) >= self.max_batch_size:
+            self._flush(model)
+        elif model.model_id not in self._flush_tasks:
+            self._flush_tasks[model.model_id] = asyncio.create_task(
+                self._flush_after_window(model)
+            )
+        return await future
+
+    async def _flush_after_window(self, model: CachedModel) -> None:
+        await asyncio.sleep(self.window)
+        self._flush(model)
+
+    def _flush(self, model: CachedModel) -> None:
+        task = self._flush_tasks.pop(model.model_id, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        pending = self._pending.pop(model.model_id, [])
+        batch = pending[: self.max_batch_size]
+        if len(pending) > len(batch):
+            self._pending[model.model_id] = pending[len(batch) :]
+        if batch:
+            self._batch_tasks[model.model_id] = asyncio.create_task(
+                self._predict_batch(model, batch)
+            )
+
+    async def _predict_batch(
+        self, model: CachedModel, batch: List[Tuple[List[float], asyncio.Future]]
+    ) -> None:
+        self.batches += 1
+        self.rows += len(batch)
+        try:
+            predictions = await run_in_threadpool(
+                predict_rows, model, [row for row, _ in batch]
+            )
+            for (_, future), prediction in zip(batch, predictions):
+                # The request may have been cancelled while the batch ran
+                if not future.done():
+                    future.set_result(prediction)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            del self._batch_tasks[model.model_id]
+            # Rows that arrived while this batch ran have waited long enough
+            if model.model_id in self._pending:
+                self._flush(model)
+
+    def stats(self) -> Dict[str, int]:
+        return {"batches": self.batches, "rows": self.rows}
+
+
+# Create ModelCache object
+model_cache = ModelCache(max_bytes=api_settings.predict_cache_max_mb * 1024 * 1024)
+
+# Create PredictionBatcher object
+prediction_batcher = PredictionBatcher(
+    window=api_settings.predict_batch_window_ms / 1000,
+    max_batch_size=api_settings.predict_max_batch_size,
+)
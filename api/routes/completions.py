@@ -0,0 +1,198 @@
+import asyncio
+import json
+from typing import AsyncIterator, List, Optional
+
+import anyio
+import httpx
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.status import (
+    HTTP_429_TOO_MANY_REQUESTS,
+    HTTP_502_BAD_GATEWAY,
+    HTTP_503_SERVICE_UNAVAILABLE,
+)
+
+from api.routes.endpoints import endpoints
+from api.settings import api_settings
+from api.sse import SSE_HEADERS, format_event
+from llm.cache import CacheLookup, CompletionCache, completion_cache
+from llm.client import (
+    CompletionClient,
+    CompletionsBusy,
+    StreamSlot,
+    UpstreamError,
+    completion_client,
+    iter_chat_stream,
+)
+from utils.log import logger
+
+######################################################
+## Router for LLM Completions
+######################################################
+
+completions_router = APIRouter(prefix=endpoints.COMPLETIONS, tags=["Completions"])
+
+
+def get_completion_client() -> CompletionClient:
+    """FastAPI dependency that provides the shared completion client."""
+    return completion_client
+
+
+def get_completion_cache() -> CompletionCache:
+    """FastAPI dependency that provides the shared completion cache."""
+    return completion_cache
+
+
+# -*- Pydantic models for request and response
+class ChatMessage(BaseModel):
+    role: str = "user"
+    content: str
+
+
+class ChatCompletionRequest(BaseModel):
+    messages: List[ChatMessage]
+    # Defaults to openai_model
+    model: Optional[str] = None
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    # Set to False to skip the completion cache
+    cache: bool = True
+
+
+async def replay_events(lookup: CacheLookup) -> AsyncIterator[str]:
+    """Sends a cached completion as one content event."""
+    yield format_event(json.dumps({"content": lookup.content}))
+    yield format_event("[DONE]")
+
+
+async def close_stream(response: httpx.Response, slot: StreamSlot) -> None:
+    await response.aclose()
+    slot.release()
+
+
+@completions_router.post("/chat")
+async def chat_completion(
+    chat_completion_request: ChatCompletionRequest,
+    client: CompletionClient = Depends(get_completion_client),
+    cache: CompletionCache = Depends(get_completion_cache),
+):
+    """Streams a chat completion as server-sent events.
+
+    Each event's data is a json object with the next piece of `content`,
+    followed by a final `[DONE]` event. Upstream errors during the stream are
+    sent as an `error` event.
+
+    Completions are cached. A cached completion is sent as a single content event,
+    and the `X-Cache` header is `exact` or `semantic` for cached completions and
+    `miss` otherwise. Set `cache` to false to skip the cache.
+    """
+    if not client.api_key:
+        raise HTTPException(
+            status_code=HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Completions are not configured: OPENAI_API_KEY is not set",
+        )
+    payload = chat_completion_request.dict(exclude_none=True, exclude={"cache"})
+    payload.setdefault("model", api_settings.openai_model)
+    headers = dict(SSE_HEADERS)
+
+    lookup: Optional[CacheLookup] = None
+    if chat_completion_request.cache and cache.enabled:
+        lookup = await cache.lookup(payload)
+        if lookup.content is not None:
+            return StreamingResponse(
+                replay_events(lookup),
+                media_type="text/event-stream",
+                headers={**headers, "X-Cache": lookup.kind or "exact"},
+            )
+        headers["X-Cache"] = "miss"
+
+    try:
+        slot = await client.acquire()
+    except CompletionsBusy as e:
+        raise HTTPException(
+            status_code=HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"},
+        )
+    try:
+        response = await client.open_chat_stream(payload)
+    except UpstreamError as e:
+        slot.release()
+        logger.warning("Completion request failed: %s", e)
+        # Pass on upstream rate limits so clients back off
+        if e.status_code == HTTP_429_TOO_MANY_REQUESTS:
+            retry_after = (
+                {"Retry-After": f"{e.retry_after:g}"} if e.retry_after else None
+            )
+            raise HTTPException(
+                status_code=e.status_code, detail=e.detail, headers=retry_after
+            )
+        raise HTTPException(status_code=HTTP_502_BAD_GATEWAY, detail=e.detail)
+    except httpx.HTTPError as e:
+        slot.release()
+        logger.warning("Completion request failed: %s", e)
+        raise HTTPException(status_code=HTTP_502_BAD_GATEWAY, detail=str(e))
+
+    async def read_upstream(queue: "asyncio.Queue[Optional[str]]") -> None:
+        parts: List[str] = []
+        cancelled = False
+        try:
+            try:
+                async for content in iter_chat_stream(response):
+                    parts.append(content)
+                    await queue.put(format_event(json.dumps({"content": content})))
+                # Only complete completions are cached
+                if lookup is not None:
+                    await cache.put(lookup, "".join(parts))
+                await queue.put(format_event("[DONE]"))
+            except asyncio.CancelledError:
+                # A subclass of Exception before python 3.8
+                raise
+            except httpx.HTTPError as e:
+                logger.warning("Completion stream failed: %s", e)
+                detail = json.dumps({"detail": str(e)})
+                await queue.put(format_event(detail, event="error"))
+            except Exception as e:
+                logger.exception("Completion stream failed: %s", e)
+                detail = json.dumps({"detail": "Completion stream failed"})
+                await queue.put(format_event(detail, event="error"))
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            try:
+                await response.aclose()
+            finally:
+                # events() waits for the end of the stream unless it cancelled this
+                if not cancelled:
+                    await queue.put(None)
+
+    async def events() -> AsyncIterator[str]:
+        # Upstream is read in its own task. When the client disconnects starlette
+        # cancels this generator, and cancelling a read inside it would stop httpx
+        # from closing the upstream connection. The small queue keeps upstream
+        # from running ahead of a slow client.
+        queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=16)
+        reader = asyncio.create_task(read_upstream(queue))
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            reader.cancel()
+            with anyio.CancelScope(shield=True):
+                await asyncio.wait([reader])
+                slot.release()
+
+    # Also close the upstream response after the response is sent, in case the
+    # client disconnected before events() started.
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers=headers,
+        background=BackgroundTask(close_stream, response, slot),
+    )
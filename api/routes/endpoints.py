@@ -5,9 +5,13 @@ from dataclasses import dataclass
 class ApiEndpoints:
     PING: str = "/ping"
     HEALTH: str = "/health"
+    METRICS: str = "/metrics"
     RUN: str = "/run"
     STATUS: str = "/status"
     TRAIN: str = "/train"
+    PREDICT: str = "/predict"
+    COMPLETIONS: str = "/completions"
+    SERIES: str = "/series"
 
 
 endpoints = ApiEndpoints()
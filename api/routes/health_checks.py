@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 
 from api.routes.endpoints import endpoints
+from db.session import get_pool_stats
 from utils.dttm import current_utc_str
 
 ######################################################
@@ -17,3 +18,15 @@ def health_ping():
         "path": endpoints.PING,
         "utc": current_utc_str(),
     }
+
+
+@health_checks_router.get(f"{endpoints.HEALTH}/db")
+def health_db_pools():
+    """Returns checked out connections, overflow, checkout wait times and timeouts
+    for each database connection pool."""
+    return {
+        "status": "success",
+        "path": f"{endpoints.HEALTH}/db",
+        "utc": current_utc_str(),
+        "pools": get_pool_stats(),
+    }
@@ -1,8 +1,32 @@
-from fastapi import APIRouter
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 
+from api.job_events import job_run_watcher
 from api.routes.endpoints import endpoints
+from api.settings import api_settings
+from api.sse import SSE_HEADERS, format_comment, format_event
+from db.crud.job_runs import (
+    get_job_runs_updated_since,
+    get_latest_job_run,
+    list_job_runs,
+)
+from db.session import RequestDb, get_request_db
+from db.tables.job_runs import JobRuns
+from jobs.archive import get_latest_archived_job_run
+from jobs.engine import job_engine
+from jobs.sweeps import sweep_engine
+from jobs.training import train_engine
+from utils.dttm import as_utc, current_utc
 from utils.log import logger
+from utils.ttl_cache import TTLCache
 
 ######################################################
 ## Router for Running Jobs
@@ -18,14 +42,314 @@ class JobStatusRequest(BaseModel):
 
 class JobStatusResponse(BaseModel):
     job_status: str
+    id_job_run: Optional[int] = None
+    # Set for jobs that report progress
+    progress_done: Optional[int] = None
+    progress_total: Optional[int] = None
+
+
+class JobRunStats(BaseModel):
+    job_name: str
+    window_start: datetime
+    runs: int
+    throughput_per_s: float
+    succeeded: int
+    failed: int
+    failure_rate: float
+    # Seconds from the start of the run on a worker to its end, without the time
+    # it was queued
+    p50_duration_s: Optional[float] = None
+    p95_duration_s: Optional[float] = None
+    p99_duration_s: Optional[float] = None
+
+
+class JobRunAnalyticsResponse(BaseModel):
+    window: str
+    since: datetime
+    until: datetime
+    stats: List[JobRunStats]
+
+
+class JobRunChangesResponse(BaseModel):
+    # Runs as columns, in (update_ts, id_job_run) order.
+    # Timestamps are in milliseconds since the epoch.
+    columns: Dict[str, List[Any]]
+    # Pass back as since and after_id to read the next page
+    since: Optional[datetime]
+    after_id: int
+    has_more: bool
+
+
+# Columns returned by /v1/status/job_runs/changes
+JOB_RUN_CHANGES_COLUMNS = [
+    "id_job_run",
+    "job_name",
+    "status",
+    "start_ts",
+    "update_ts",
+    "end_ts",
+    "progress_done",
+    "progress_total",
+    "id_parent_job_run",
+]
+JOB_RUN_CHANGES_TS_COLUMNS = {"start_ts", "update_ts", "end_ts"}
+
+
+class JobRunListResponse(BaseModel):
+    job_runs: List[Dict[str, Any]]
+    # Pass as cursor to read the next page, None on the last page
+    next_cursor: Optional[str] = None
+
+
+# Columns that can be requested with the fields param of /v1/status/job_runs
+JOB_RUN_FIELDS = list(JobRuns.__table__.columns.keys())
+
+
+def encode_cursor(start_ts: datetime, id_job_run: int) -> str:
+    cursor = json.dumps([start_ts.isoformat(), id_job_run])
+    return base64.urlsafe_b64encode(cursor.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        start_ts, id_job_run = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(start_ts), int(id_job_run)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Invalid cursor",
+        )
+
+
+def get_fields(fields: Optional[str]) -> List[str]:
+    if fields is None:
+        return JOB_RUN_FIELDS
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in JOB_RUN_FIELDS]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"fields must be a comma separated list of {JOB_RUN_FIELDS}",
+        )
+    return names
+
+
+def to_epoch_ms(dttm: Optional[datetime]) -> Optional[int]:
+    return None if dttm is None else int(as_utc(dttm).timestamp() * 1000)
+
+
+# -*- Cache of the latest status for each job_name
+# Clients poll this endpoint, so responses are cached for job_status_cache_ttl seconds.
+# Status changes made by this process's job engine invalidate the cache immediately,
+# changes made by other replicas are picked up when the entry expires.
+job_status_cache: TTLCache[JobStatusResponse] = TTLCache(
+    ttl=api_settings.job_status_cache_ttl,
+    maxsize=api_settings.job_status_cache_size,
+)
+
+
+def invalidate_job_status(id_job_run: int, job_name: str, status: str) -> None:
+    job_status_cache.delete(job_name)
+
+
+job_engine.add_status_listener(invalidate_job_status)
+train_engine.add_status_listener(invalidate_job_status)
+sweep_engine.add_status_listener(invalidate_job_status)
+# Push status changes to clients following a run
+job_engine.add_status_listener(job_run_watcher.on_status)
+train_engine.add_status_listener(job_run_watcher.on_status)
+sweep_engine.add_status_listener(job_run_watcher.on_status)
 
 
 @job_status_router.post("/job")
-def job_status(job_status_request: JobStatusRequest):
-    logger.info(f"Checking status for {job_status_request.job_name}")
+async def job_status(
+    job_status_request: JobStatusRequest,
+    db: RequestDb = Depends(get_request_db),
+):
+    logger.info("Checking status for %s", job_status_request.job_name)
+    cached_response = job_status_cache.get(job_status_request.job_name)
+    if cached_response is not None:
+        return cached_response
+    # A status change during the read invalidates the response before it is cached
+    generation = job_status_cache.generation(job_status_request.job_name)
+
     try:
-        # TODO: Get job status
-        return JobStatusResponse(job_status="success")
+        job_run = await db.run(get_latest_job_run, job_status_request.job_name)
+        if job_run is not None:
+            response = JobStatusResponse(
+                job_status=job_run.status,
+                id_job_run=job_run.id_job_run,
+                progress_done=job_run.progress_done,
+                progress_total=job_run.progress_total,
+            )
+        else:
+            # Fall back to runs that were moved to the archive
+            archived_run = await run_in_threadpool(
+                get_latest_archived_job_run, job_status_request.job_name
+            )
+            if archived_run is not None:
+                response = JobStatusResponse(
+                    job_status=archived_run["status"],
+                    id_job_run=archived_run["id_job_run"],
+                    progress_done=archived_run.get("progress_done"),
+                    progress_total=archived_run.get("progress_total"),
+                )
+            else:
+                response = JobStatusResponse(job_status="not_found")
+        job_status_cache.set(job_status_request.job_name, response, generation)
+        return response
     except Exception as e:
-        logger.error(f"Failed to get status for {job_status_request.job_name}: {e}")
+        logger.error("Failed to get status for %s: %s", job_status_request.job_name, e)
         return JobStatusResponse(job_status="failed")
+
+
+@job_status_router.get("/job/{id_job_run}/events")
+async def job_run_events(
+    id_job_run: int,
+    keepalive: Optional[float] = Query(None, ge=1, le=60),
+):
+    """Streams the status and progress of a run as server-sent events.
+
+    The current state is sent first, then each change, until the run ends.
+    Each event's data is a json object with `id_job_run`, `job_name`, `status`,
+    `progress_done` and `progress_total`. Use this to follow a run instead of
+    polling /v1/status/job.
+
+    A keepalive comment is sent after `keepalive` seconds without changes,
+    by default job_events_keepalive_interval.
+    """
+    state = await job_run_watcher.get_state(id_job_run)
+    if state is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job run not found: {id_job_run}",
+        )
+
+    async def events() -> AsyncIterator[str]:
+        async for change in job_run_watcher.follow(id_job_run, state, keepalive):
+            if change is None:
+                # A comment keeps proxies from closing the idle connection
+                yield format_comment("keepalive")
+            else:
+                yield format_event(json.dumps(change, default=str))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+@job_status_router.get("/job_runs", response_model=JobRunListResponse)
+async def job_runs(
+    job_name: Optional[str] = None,
+    run_status: Optional[str] = Query(None, alias="status"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1),
+    db: RequestDb = Depends(get_request_db),
+):
+    """Lists runs started in [since, until), newest first.
+
+    Filters by job_name and status when given. fields is a comma separated list
+    of the columns to return, all by default. Pages are read with the
+    next_cursor of the previous page, which picks up after its last run, so deep
+    pages are as fast as the first.
+    """
+    columns = get_fields(fields)
+    before = decode_cursor(cursor) if cursor is not None else None
+    limit = min(limit, api_settings.job_runs_list_max_limit)
+    # The keyset columns are read even if not requested, to build the cursor
+    read_columns = columns + [
+        name for name in ("start_ts", "id_job_run") if name not in columns
+    ]
+    rows = await db.run(
+        list_job_runs,
+        read_columns,
+        # Read one more run to know if there is a next page
+        limit=limit + 1,
+        job_name=job_name,
+        status=run_status,
+        since=since,
+        until=until,
+        before=before,
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["start_ts"], rows[-1]["id_job_run"])
+    if len(read_columns) > len(columns):
+        rows = [{name: row[name] for name in columns} for row in rows]
+    return JobRunListResponse(job_runs=rows, next_cursor=next_cursor)
+
+
+@job_status_router.get("/job_runs/changes", response_model=JobRunChangesResponse)
+async def job_run_changes(
+    since: Optional[datetime] = None,
+    after_id: int = 0,
+    limit: int = Query(1000, ge=1),
+    db: RequestDb = Depends(get_request_db),
+):
+    """Returns runs updated after the keyset (since, after_id), oldest first.
+
+    Clients keep a copy of job_runs up to date by reading pages until has_more is
+    false, then reading again from the last since and after_id, so each refresh
+    only reads the runs that changed. Without since, reads from the first run.
+    """
+    limit = min(limit, api_settings.job_run_changes_max_limit)
+    rows = await db.run(
+        get_job_runs_updated_since,
+        JOB_RUN_CHANGES_COLUMNS,
+        since=since,
+        after_id=after_id,
+        limit=limit,
+    )
+    columns: Dict[str, List[Any]] = {
+        name: [row[name] for row in rows] for name in JOB_RUN_CHANGES_COLUMNS
+    }
+    for name in JOB_RUN_CHANGES_TS_COLUMNS:
+        columns[name] = [to_epoch_ms(dttm) for dttm in columns[name]]
+    if rows:
+        since, after_id = rows[-1]["update_ts"], rows[-1]["id_job_run"]
+    return JobRunChangesResponse(
+        columns=columns, since=since, after_id=after_id, has_more=len(rows) == limit
+    )
+
+
+@job_status_router.get("/analytics", response_model=JobRunAnalyticsResponse)
+async def job_run_analytics(
+    job_name: Optional[str] = None,
+    window: str = "hour",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """Returns run counts, throughput, failure rate and p50/p95/p99 durations
+    per job_name and window, for runs started in [since, until).
+
+    Defaults to the last 24 hours. Durations run from the start of each run on a
+    worker, so they do not include the time runs were queued. Only runs started
+    in the last analytics_window_days are counted.
+    """
+    # Imported here, duckdb and polars are only needed by this route
+    from jobs.analytics import WINDOW_SECONDS, job_runs_snapshot
+
+    if window not in WINDOW_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"window must be one of {list(WINDOW_SECONDS)}",
+        )
+    until = until or current_utc()
+    since = since or until - timedelta(days=1)
+
+    # Refreshing the snapshot reads the db and aggregating is cpu bound
+    stats = await run_in_threadpool(
+        job_runs_snapshot.job_run_stats, since, until, window, job_name
+    )
+    return JobRunAnalyticsResponse(
+        window=window,
+        since=since,
+        until=until,
+        stats=[JobRunStats(**row) for row in stats],
+    )
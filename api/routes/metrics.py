@@ -0,0 +1,103 @@
+from typing import List
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from api.admission import admission_controller
+from api.metrics import format_labels, request_metrics
+from api.predictions import model_cache, prediction_batcher
+from api.routes.endpoints import endpoints
+from db.session import get_pool_stats
+from llm.cache import completion_cache
+from llm.client import completion_client
+
+######################################################
+## Router for Prometheus Metrics
+######################################################
+
+metrics_router = APIRouter(tags=["Metrics"])
+
+# Database pool stats exported as metrics, with their prometheus type
+DB_POOL_METRICS = {
+    "connections_created": "counter",
+    "connections_invalidated": "counter",
+    "checkouts": "counter",
+    "checkout_timeouts": "counter",
+    "wait_time_total_s": "counter",
+    "wait_time_max_s": "gauge",
+    "size": "gauge",
+    "checked_in": "gauge",
+    "checked_out": "gauge",
+    "overflow": "gauge",
+}
+
+
+def render_db_pool_metrics() -> List[str]:
+    pool_stats = get_pool_stats()
+    lines: List[str] = []
+    for name, metric_type in DB_POOL_METRICS.items():
+        lines.append(f"# TYPE db_pool_{name} {metric_type}")
+        for stats in pool_stats:
+            if stats.get(name) is not None:
+                labels = format_labels({"pool": stats["name"]})
+                lines.append(f"db_pool_{name}{{{labels}}} {stats[name]}")
+    return lines
+
+
+# Model cache, prediction batching, completion stream and completion cache stats
+# exported as metrics
+SERVING_METRICS = {
+    "model_cache_models": ("gauge", model_cache, "models"),
+    "model_cache_bytes": ("gauge", model_cache, "bytes"),
+    "model_cache_hits_total": ("counter", model_cache, "hits"),
+    "model_cache_misses_total": ("counter", model_cache, "misses"),
+    "model_cache_evictions_total": ("counter", model_cache, "evictions"),
+    "prediction_batches_total": ("counter", prediction_batcher, "batches"),
+    "prediction_rows_total": ("counter", prediction_batcher, "rows"),
+    "completion_streams_active": ("gauge", completion_client, "active"),
+    "completion_streams_waiting": ("gauge", completion_client, "waiting"),
+    "completion_streams_total": ("counter", completion_client, "started"),
+    "completion_streams_rejected_total": ("counter", completion_client, "rejected"),
+    "completion_cache_exact_hits_total": ("counter", completion_cache, "exact_hits"),
+    "completion_cache_semantic_hits_total": (
+        "counter",
+        completion_cache,
+        "semantic_hits",
+    ),
+    "completion_cache_misses_total": ("counter", completion_cache, "misses"),
+    "completion_cache_errors_total": ("counter", completion_cache, "errors"),
+    "completion_cache_hit_ratio": ("gauge", completion_cache, "hit_ratio"),
+    "completion_cache_evictions_total": ("counter", completion_cache, "evictions"),
+    "completion_cache_semantic_entries": (
+        "gauge",
+        completion_cache,
+        "semantic_entries",
+    ),
+}
+
+
+def render_serving_metrics() -> List[str]:
+    lines: List[str] = []
+    for name, (metric_type, source, key) in SERVING_METRICS.items():
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.append(f"{name} {source.stats()[key]}")
+    return lines
+
+
+@metrics_router.get(endpoints.METRICS, response_class=PlainTextResponse)
+async def metrics():
+    """Returns request, database pool, prediction, completion and admission
+    metrics in the Prometheus text format.
+
+    Runs on the event loop thread, which is the thread that updates the request
+    and admission metrics, so they are not read while they change.
+    """
+    lines = (
+        request_metrics.render()
+        + render_db_pool_metrics()
+        + render_serving_metrics()
+        + admission_controller.render()
+    )
+    return PlainTextResponse(
+        "\n".join(lines) + "\n", media_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,51 @@
+from typing import Any, List
+
+from fastapi import APIRouter, HTTPException, Path
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from starlette.status import HTTP_404_NOT_FOUND, HTTP_422_UNPROCESSABLE_ENTITY
+
+from api.predictions import model_cache, prediction_batcher
+from api.routes.endpoints import endpoints
+from utils.log import logger
+
+######################################################
+## Router for Predictions
+######################################################
+
+predictions_router = APIRouter(prefix=endpoints.PREDICT, tags=["Predictions"])
+
+
+# -*- Pydantic models for request and response
+class PredictRequest(BaseModel):
+    # Feature values of one row, in the order of the training dataset's columns
+    features: List[float]
+
+
+class PredictResponse(BaseModel):
+    model_id: str
+    prediction: Any
+
+
+@predictions_router.post("/model/{model_id}", response_model=PredictResponse)
+async def predict(
+    predict_request: PredictRequest,
+    model_id: str = Path(..., regex="^[0-9a-f]{64}$"),
+):
+    try:
+        model = model_cache.get_cached(model_id) or await run_in_threadpool(
+            model_cache.get, model_id
+        )
+    except KeyError:
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND, detail=f"Model not found: {model_id}"
+        )
+    if len(predict_request.features) != model.n_features:
+        raise HTTPException(
+            status_code=HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Model {model_id} takes {model.n_features} features, "
+            f"got {len(predict_request.features)}",
+        )
+    logger.debug("Predicting with model %s", model_id)
+    prediction = await prediction_batcher.predict(model, predict_request.features)
+    return PredictResponse(model_id=model_id, prediction=prediction)
@@ -1,7 +1,23 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
 
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from pydantic import BaseModel, validator
+from starlette.status import (
+    HTTP_404_NOT_FOUND,
+    HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+    HTTP_422_UNPROCESSABLE_ENTITY,
+    HTTP_503_SERVICE_UNAVAILABLE,
+)
+
+from api.job_dedup import JobRunKeyConflict, get_run_key, job_deduplicator
+from api.job_runs import fail_job_run, fail_job_runs
 from api.routes.endpoints import endpoints
+from api.settings import api_settings
+from db.crud.job_runs import create_job_run, create_job_runs
+from db.session import RequestDb, get_request_db
+from jobs.engine import JobQueueFull, job_engine
+from jobs.registry import job_registry
+from jobs.status import job_run_status
 from utils.log import logger
 
 ######################################################
@@ -10,24 +26,204 @@ from utils.log import logger
 
 run_jobs_router = APIRouter(prefix=endpoints.RUN, tags=["Run Jobs"])
 
+# Forget deduplicated runs once they end
+job_engine.add_status_listener(job_deduplicator.on_status)
+
 
 # -*- Pydantic models for request and response
 class RunJobRequest(BaseModel):
     job_name: str = "test"
+    job_params: Dict[str, Any] = {}
+    # Attach to a queued or running run of the same job_name and job_params
+    # instead of starting another one. Defaults to job_coalesce.
+    # Only supported by /v1/run/job, /v1/run/jobs rejects it.
+    coalesce: Optional[bool] = None
 
 
 class RunJobResponse(BaseModel):
     job_status: str = "failed"
+    id_job_run: Optional[int] = None
+    error: Optional[str] = None
+    # True if the request was attached to an existing run
+    deduplicated: bool = False
+
+
+class RunJobsRequest(BaseModel):
+    # Each job gets a new run, jobs are not deduplicated
+    jobs: List[RunJobRequest]
+
+    @validator("jobs")
+    def validate_jobs(cls, jobs):
+        if any(job.coalesce is not None for job in jobs):
+            raise ValueError("coalesce is only supported by /v1/run/job")
+        return jobs
+
+
+class RunJobsResponse(BaseModel):
+    # One response for each job in the request, in the same order
+    jobs: List[RunJobResponse]
+
+
+class JobInfo(BaseModel):
+    job_name: str
+    # First line of the job function's docstring
+    description: Optional[str] = None
+
+
+class JobListResponse(BaseModel):
+    jobs: List[JobInfo]
+
+
+def get_job_list() -> JobListResponse:
+    jobs = []
+    for job_name, job_fn in job_registry.items():
+        doc = (job_fn.__doc__ or "").strip()
+        jobs.append(JobInfo(job_name=job_name, description=doc.split("\n")[0] or None))
+    return JobListResponse(jobs=jobs)
+
+
+@run_jobs_router.get("/jobs", response_model=JobListResponse)
+def list_jobs(response: Response):
+    """Returns the jobs that can be run using /v1/run/job."""
+    # Jobs only change when the api is deployed, so clients can cache the list
+    response.headers["Cache-Control"] = "public, max-age=60"
+    return get_job_list()
 
 
 @run_jobs_router.post("/job")
-def run_job(run_job_request: RunJobRequest):
-    logger.info(f"Received request to run {run_job_request.job_name}")
+async def run_job(
+    run_job_request: RunJobRequest,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: RequestDb = Depends(get_request_db),
+):
+    """Queues a run of a job.
+
+    Requests with the same Idempotency-Key header return the same run, or 422
+    if the key was sent with another job or params. With coalesce, requests for
+    a job with the same params attach to the queued or running run instead of
+    starting another one.
+    """
+    logger.info("Received request to run %s", run_job_request.job_name)
+    job_fn = job_registry.get(run_job_request.job_name)
+    if job_fn is None:
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND,
+            detail=f"Unknown job: {run_job_request.job_name}",
+        )
+
+    try:
+        job_engine.reserve()
+    except JobQueueFull as e:
+        raise HTTPException(status_code=HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+    coalesce = run_job_request.coalesce
+    run_key = get_run_key(
+        endpoints.RUN,
+        run_job_request.job_name,
+        run_job_request.job_params,
+        idempotency_key=idempotency_key,
+        coalesce=api_settings.job_coalesce if coalesce is None else coalesce,
+    )
+    id_job_run: Optional[int] = None
+    try:
+        if run_key is None:
+            id_job_run = await db.run(
+                create_job_run, run_job_request.job_name, job_run_status.QUEUED
+            )
+        else:
+            claim = await job_deduplicator.claim(db, run_key, run_job_request.job_name)
+            if not claim.created:
+                job_engine.release()
+                logger.info(
+                    "Attached %s to %s", run_job_request.job_name, claim.id_job_run
+                )
+                return RunJobResponse(
+                    job_status=claim.status,
+                    id_job_run=claim.id_job_run,
+                    deduplicated=True,
+                )
+            id_job_run = claim.id_job_run
+        job_engine.submit(
+            id_job_run, run_job_request.job_name, job_fn, run_job_request.job_params
+        )
+        logger.info("Queued %s: %s", run_job_request.job_name, id_job_run)
+        return RunJobResponse(job_status=job_run_status.QUEUED, id_job_run=id_job_run)
+    except JobRunKeyConflict as e:
+        job_engine.release()
+        raise HTTPException(status_code=HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except Exception as e:
+        logger.error("Run %s failed: %s", run_job_request.job_name, e)
+        await fail_job_run(db, job_engine, id_job_run, run_key)
+        return RunJobResponse(
+            job_status=job_run_status.FAILED, error="Failed to queue job run"
+        )
+
+
+@run_jobs_router.post("/jobs")
+async def run_jobs(
+    run_jobs_request: RunJobsRequest,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: RequestDb = Depends(get_request_db),
+):
+    """Queues a run of each job, and returns a response for each one.
+
+    Jobs are not deduplicated, so coalesce and the Idempotency-Key header are
+    rejected.
+    """
+    if idempotency_key is not None:
+        raise HTTPException(
+            status_code=HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key is only supported by /v1/run/job",
+        )
+    num_jobs = len(run_jobs_request.jobs)
+    logger.info("Received request to run %s jobs", num_jobs)
+    if num_jobs > api_settings.job_batch_max_size:
+        raise HTTPException(
+            status_code=HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {api_settings.job_batch_max_size} jobs can be submitted at once",
+        )
+
+    responses: List[RunJobResponse] = [RunJobResponse() for _ in range(num_jobs)]
+    # Index of each job that will be queued
+    accepted: List[int] = []
+    for idx, job in enumerate(run_jobs_request.jobs):
+        if job.job_name in job_registry:
+            accepted.append(idx)
+        else:
+            responses[idx].error = f"Unknown job: {job.job_name}"
+
+    # Reserve a slot for as many jobs as possible, the rest are rejected
+    reserved = job_engine.reserve_many(len(accepted))
+    for idx in accepted[reserved:]:
+        responses[idx].error = "Job queue is full"
+    accepted = accepted[:reserved]
+
+    try:
+        job_names = [run_jobs_request.jobs[idx].job_name for idx in accepted]
+        ids = await db.run(create_job_runs, job_names, job_run_status.QUEUED)
+    except Exception as e:
+        job_engine.release(reserved)
+        logger.error("Run %s jobs failed: %s", num_jobs, e)
+        for idx in accepted:
+            responses[idx].error = "Failed to create job run"
+        return RunJobsResponse(jobs=responses)
+
+    submitted = 0
     try:
-        logger.info(f"Running {run_job_request.job_name}")
-        # TODO: Run job
-        logger.info(f"Run {run_job_request.job_name} complete")
-        return RunJobResponse(job_status="success")
+        for idx, id_job_run in zip(accepted, ids):
+            job = run_jobs_request.jobs[idx]
+            job_engine.submit(
+                id_job_run, job.job_name, job_registry[job.job_name], job.job_params
+            )
+            submitted += 1
+            responses[idx].job_status = job_run_status.QUEUED
+            responses[idx].id_job_run = id_job_run
     except Exception as e:
-        logger.error(f"Run {run_job_request.job_name} failed: {e}")
-        return RunJobResponse(job_status="failed")
+        # The slots and runs of the jobs that were not submitted are never used
+        job_engine.release(reserved - submitted)
+        logger.error("Run %s jobs failed: %s", num_jobs, e)
+        await fail_job_runs(db, ids[submitted:])
+        for idx in accepted[submitted:]:
+            responses[idx].error = "Failed to queue job run"
+    logger.info("Queued %s of %s jobs", submitted, num_jobs)
+    return RunJobsResponse(jobs=responses)
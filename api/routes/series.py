@@ -0,0 +1,98 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, validator
+from starlette.status import HTTP_404_NOT_FOUND, HTTP_422_UNPROCESSABLE_ENTITY
+
+from api.settings import api_settings
+from api.routes.endpoints import endpoints
+from utils.log import logger
+
+######################################################
+## Router for Time Series
+######################################################
+
+series_router = APIRouter(prefix=endpoints.SERIES, tags=["Series"])
+
+
+# -*- Pydantic models for request and response
+class DownsampleRequest(BaseModel):
+    # A csv or parquet file under datasets_dir
+    dataset: str
+    y: str
+    # Defaults to the row number
+    x: Optional[str] = None
+    points: int = 2000
+    method: str = "minmax_lttb"
+    # Only points with x in [x_min, x_max] are downsampled, set these when zooming
+    x_min: Optional[float] = None
+    x_max: Optional[float] = None
+
+    @validator("points")
+    def validate_points(cls, points):
+        # minmax needs 4 points for the first, last, min and max
+        if not 4 <= points <= api_settings.series_max_points:
+            raise ValueError(
+                f"points must be between 4 and {api_settings.series_max_points}"
+            )
+        return points
+
+    @validator("method")
+    def validate_method(cls, method):
+        from utils.downsample import DOWNSAMPLERS
+
+        if method not in DOWNSAMPLERS:
+            raise ValueError(f"method must be one of {', '.join(DOWNSAMPLERS)}")
+        return method
+
+
+class DownsampleResponse(BaseModel):
+    x: List[float]
+    # Missing values are null
+    y: List[Optional[float]]
+    # Points in the series, and in [x_min, x_max]
+    total_points: int
+    viewport_points: int
+
+
+@series_router.post("/downsample", response_model=DownsampleResponse)
+def downsample_series(downsample_request: DownsampleRequest):
+    """Returns at most `points` points of a series, picked to keep its shape.
+
+    Charts request about as many points as they have pixels across, and request
+    again with x_min and x_max when zoomed in, to see the detail in that range.
+    """
+    # Imported here, numpy and polars are only needed by this route
+    from api.series import load_series
+    from utils.downsample import downsample, get_viewport
+
+    try:
+        x, y = load_series(
+            downsample_request.dataset, downsample_request.x, downsample_request.y
+        )
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND,
+            detail=f"Dataset not found: {downsample_request.dataset}",
+        )
+    except Exception as e:
+        logger.warning("Failed to read %s: %s", downsample_request.dataset, e)
+        raise HTTPException(
+            status_code=HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e).split("\n")[0]
+        )
+
+    viewport = get_viewport(x, downsample_request.x_min, downsample_request.x_max)
+    x_out, y_out = downsample(
+        x,
+        y,
+        downsample_request.points,
+        method=downsample_request.method,
+        x_min=downsample_request.x_min,
+        x_max=downsample_request.x_max,
+    )
+    return DownsampleResponse(
+        x=x_out.tolist(),
+        y=[None if value != value else value for value in y_out.tolist()],
+        total_points=len(x),
+        viewport_points=viewport.stop - viewport.start,
+    )
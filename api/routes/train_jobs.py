@@ -1,7 +1,33 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional
 
+from fastapi import APIRouter, Depends, Header, HTTPException, Path
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from starlette.status import (
+    HTTP_404_NOT_FOUND,
+    HTTP_422_UNPROCESSABLE_ENTITY,
+    HTTP_503_SERVICE_UNAVAILABLE,
+)
+
+from api.job_dedup import JobRunKeyConflict, get_run_key, job_deduplicator
+from api.job_runs import fail_job_run
 from api.routes.endpoints import endpoints
+from api.settings import api_settings
+from db.crud.job_runs import create_job_run
+from db.session import RequestDb, get_request_db
+from jobs.artifacts import artifact_store
+from jobs.engine import JobQueueFull
+from jobs.status import job_run_status
+from jobs.sweeps import SweepSpec, get_sweep_model_id, run_sweep, sweep_engine
+from jobs.training import (
+    ESTIMATORS,
+    TrainSpec,
+    get_dataset_hash,
+    get_threads_per_job,
+    train_engine,
+    train_model,
+)
 from utils.log import logger
 
 ######################################################
@@ -10,24 +36,207 @@ from utils.log import logger
 
 train_jobs_router = APIRouter(prefix=endpoints.TRAIN, tags=["Train Jobs"])
 
+# Forget deduplicated runs once they end
+train_engine.add_status_listener(job_deduplicator.on_status)
+sweep_engine.add_status_listener(job_deduplicator.on_status)
+
 
 # -*- Pydantic models for request and response
+class SweepRequest(BaseModel):
+    # Values to try for each estimator param, e.g. {"C": [0.1, 1, 10]}
+    param_grid: Dict[str, List[Any]]
+    # "grid" tries every combination, "random" tries n_candidates of them
+    search: str = Field("grid", regex="^(grid|random)$")
+    n_candidates: int = Field(16, ge=1)
+    # Each round keeps the best 1/factor of the candidates
+    factor: int = Field(3, ge=2)
+    # Fewest training rows used in a round
+    min_samples: Optional[int] = Field(None, ge=1)
+    random_state: int = 0
+
+
 class TrainJobRequest(BaseModel):
     job_name: str = "test"
+    # "sklearn:<name>" or the path of a csv or parquet file under datasets_dir
+    dataset: str = "sklearn:iris"
+    # Label column for csv and parquet datasets
+    target: Optional[str] = None
+    estimator: str = "logistic_regression"
+    params: Dict[str, Any] = {}
+    test_size: float = 0.2
+    random_state: int = 0
+    # If set, trains the best params from a sweep, merged with params
+    sweep: Optional[SweepRequest] = None
+    # Attach to a queued or running run that trains the same model instead of
+    # starting another one. Defaults to train_coalesce.
+    coalesce: Optional[bool] = None
 
 
 class TrainJobResponse(BaseModel):
     job_status: str = "failed"
+    id_job_run: Optional[int] = None
+    # Same for the same training spec and data
+    model_id: Optional[str] = None
+    # True if the model was already trained and was not trained again
+    cached: bool = False
+    score: Optional[float] = None
+    # True if the request was attached to an existing run
+    deduplicated: bool = False
+
+
+class ModelResponse(BaseModel):
+    model_id: str
+    artifact: str
+    spec: Dict[str, Any]
+    score: float
+    n_features: int
+    trained_at: str
+    # Candidates tried and their scores, for models picked by a sweep
+    sweep: Optional[Dict[str, Any]] = None
 
 
 @train_jobs_router.post("/job")
-def train_job(train_job_request: TrainJobRequest):
-    logger.info(f"Received request to train {train_job_request.job_name}")
+async def train_job(
+    train_job_request: TrainJobRequest,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: RequestDb = Depends(get_request_db),
+):
+    """Queues a run that trains a model, unless the model was already trained.
+
+    Requests with the same Idempotency-Key header return the same run, or 422
+    if the key was sent with another job or model. With coalesce, requests that
+    train the same model attach to the queued or running run instead of starting
+    another one.
+    """
+    logger.info("Received request to train %s", train_job_request.job_name)
+    if train_job_request.estimator not in ESTIMATORS:
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND,
+            detail=f"Unknown estimator: {train_job_request.estimator}",
+        )
+    spec = TrainSpec(
+        dataset=train_job_request.dataset,
+        estimator=train_job_request.estimator,
+        params=train_job_request.params,
+        target=train_job_request.target,
+        test_size=train_job_request.test_size,
+        random_state=train_job_request.random_state,
+    )
     try:
-        logger.info(f"Training {train_job_request.job_name}")
-        # TODO: Train job
-        logger.info(f"Training {train_job_request.job_name} complete")
-        return TrainJobResponse(job_status="success")
+        data_hash = await run_in_threadpool(get_dataset_hash, spec.dataset)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND,
+            detail=f"Dataset not found: {spec.dataset}",
+        )
+
+    sweep: Optional[SweepSpec] = None
+    if train_job_request.sweep is not None:
+        sweep = SweepSpec(**train_job_request.sweep.dict())
+        n_candidates = sweep.get_n_candidates()
+        if n_candidates > api_settings.sweep_max_candidates:
+            raise HTTPException(
+                status_code=HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Sweep has {n_candidates} candidates, "
+                f"the limit is {api_settings.sweep_max_candidates}",
+            )
+
+    # Return the model if it was already trained on the same spec and data
+    if sweep is not None:
+        model_id = get_sweep_model_id(spec, sweep, data_hash)
+    else:
+        model_id = spec.get_model_id(data_hash)
+    record = await run_in_threadpool(artifact_store.get_model_record, model_id)
+    if record is not None:
+        logger.info("Model %s for %s is cached", model_id, train_job_request.job_name)
+        return TrainJobResponse(
+            job_status=job_run_status.SUCCESS,
+            model_id=model_id,
+            cached=True,
+            score=record["score"],
+        )
+
+    # Sweeps run on their own engine, which fans the trials out to a process pool
+    engine = sweep_engine if sweep is not None else train_engine
+    try:
+        engine.reserve()
+    except JobQueueFull as e:
+        raise HTTPException(status_code=HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+    coalesce = train_job_request.coalesce
+    run_key = get_run_key(
+        endpoints.TRAIN,
+        train_job_request.job_name,
+        {"model_id": model_id},
+        idempotency_key=idempotency_key,
+        coalesce=api_settings.train_coalesce if coalesce is None else coalesce,
+    )
+    id_job_run: Optional[int] = None
+    try:
+        if run_key is None:
+            id_job_run = await db.run(
+                create_job_run, train_job_request.job_name, job_run_status.QUEUED
+            )
+        else:
+            claim = await job_deduplicator.claim(
+                db, run_key, train_job_request.job_name
+            )
+            if not claim.created:
+                engine.release()
+                logger.info(
+                    "Attached training %s to %s",
+                    train_job_request.job_name,
+                    claim.id_job_run,
+                )
+                return TrainJobResponse(
+                    job_status=claim.status,
+                    id_job_run=claim.id_job_run,
+                    model_id=model_id,
+                    deduplicated=True,
+                )
+            id_job_run = claim.id_job_run
+        if sweep is not None:
+            engine.submit(
+                id_job_run,
+                train_job_request.job_name,
+                run_sweep,
+                {
+                    "id_job_run": id_job_run,
+                    "job_name": train_job_request.job_name,
+                    "spec": asdict(spec),
+                    "sweep": asdict(sweep),
+                    "model_id": model_id,
+                },
+            )
+        else:
+            engine.submit(
+                id_job_run,
+                train_job_request.job_name,
+                train_model,
+                {
+                    "spec": asdict(spec),
+                    "model_id": model_id,
+                    "threads": get_threads_per_job(train_engine.pool_size),
+                },
+            )
+        logger.info("Queued training %s: %s", train_job_request.job_name, id_job_run)
+        return TrainJobResponse(
+            job_status=job_run_status.QUEUED, id_job_run=id_job_run, model_id=model_id
+        )
+    except JobRunKeyConflict as e:
+        engine.release()
+        raise HTTPException(status_code=HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
     except Exception as e:
-        logger.error(f"Training {train_job_request.job_name} failed: {e}")
-        return TrainJobResponse(job_status="failed")
+        logger.error("Training %s failed: %s", train_job_request.job_name, e)
+        await fail_job_run(db, engine, id_job_run, run_key)
+        return TrainJobResponse(job_status=job_run_status.FAILED)
+
+
+@train_jobs_router.get("/model/{model_id}", response_model=ModelResponse)
+async def get_model(model_id: str = Path(..., regex="^[0-9a-f]{64}$")):
+    record = await run_in_threadpool(artifact_store.get_model_record, model_id)
+    if record is None:
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND, detail=f"Model not found: {model_id}"
+        )
+    return record
@@ -2,12 +2,20 @@ from fastapi import APIRouter
 
 from api.routes.health_checks import health_checks_router
 from api.routes.train_jobs import train_jobs_router
+from api.routes.predictions import predictions_router
+from api.routes.completions import completions_router
+from api.routes.series import series_router
 from api.routes.run_jobs import run_jobs_router
 from api.routes.job_status import job_status_router
+from api.routes.metrics import metrics_router
 
 
 v1_router = APIRouter(prefix="/v1")
 v1_router.include_router(health_checks_router)
 v1_router.include_router(train_jobs_router)
+v1_router.include_router(predictions_router)
+v1_router.include_router(completions_router)
+v1_router.include_router(series_router)
 v1_router.include_router(run_jobs_router)
 v1_router.include_router(job_status_router)
+v1_router.include_router(metrics_router)
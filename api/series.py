@@ -0,0 +1,55 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from api.settings import api_settings
+from jobs.training import get_dataset_path
+from utils.ttl_cache import TTLCache
+
+Series = Tuple[np.ndarray, np.ndarray]
+
+# Series are kept in memory so zooming in does not read the file again.
+# Keyed by (dataset, x, y, file size, file mtime), so changed files are read again.
+series_cache: TTLCache[Series] = TTLCache(
+    ttl=api_settings.series_cache_ttl, maxsize=api_settings.series_cache_size
+)
+
+
+def read_series(dataset: str, x: Optional[str], y: str) -> Series:
+    """Reads the x and y columns of a csv or parquet file under datasets_dir as
+    float64 arrays, sorted by x.
+
+    Date and datetime x columns are converted to milliseconds since the epoch.
+    If x is not set, the row number is used.
+    """
+    import polars as pl
+
+    path = get_dataset_path(dataset)
+    columns = [y] if x is None else [x, y]
+    if path.suffix == ".parquet":
+        df = pl.read_parquet(path, columns=columns)
+    else:
+        df = pl.read_csv(path, columns=columns)
+
+    y_values = df[y].cast(pl.Float64).to_numpy()
+    if x is None:
+        return np.arange(len(y_values), dtype=np.float64), y_values
+    x_column = df[x]
+    if x_column.dtype in (pl.Date, pl.Datetime):
+        x_column = x_column.dt.epoch("ms")
+    x_values = x_column.cast(pl.Float64).to_numpy()
+    if len(x_values) > 1 and not np.all(x_values[1:] >= x_values[:-1]):
+        order = np.argsort(x_values, kind="stable")
+        x_values, y_values = x_values[order], y_values[order]
+    return x_values, y_values
+
+
+def load_series(dataset: str, x: Optional[str], y: str) -> Series:
+    """Returns a cached series, reading it if it is not cached."""
+    stat = get_dataset_path(dataset).stat()
+    key = (dataset, x, y, stat.st_size, stat.st_mtime_ns)
+    series = series_cache.get(key)
+    if series is None:
+        series = read_series(dataset, x, y)
+        series_cache.set(key, series)
+    return series
@@ -33,19 +33,222 @@ class ApiSettings(BaseSettings):
     db_pass: Optional[str]
     db_schema: Optional[str]
     db_driver: str = "mysql+mysqlconnector"
+    # Set db_async to True to serve requests using an AsyncEngine and AsyncSession.
+    # db_async_driver is used in place of db_driver when db_async is True.
+    db_async: bool = False
+    db_async_driver: str = "mysql+aiomysql"
+    # Path to the sqlite database used when no database is provided.
+    # If not set, an in-memory sqlite database is used.
+    db_sqlite_path: Optional[str] = None
+
+    # Database connection pool configuration, not used for in-memory sqlite.
+    # Connections kept open for api requests
+    db_pool_size: int = 5
+    # Connections that can be opened beyond db_pool_size under load
+    db_max_overflow: int = 10
+    # Seconds to wait for a connection before the request fails
+    db_pool_timeout: float = 10
+    # Seconds after which a connection is replaced.
+    # Keep this below the database's wait_timeout.
+    db_pool_recycle: int = 1800
+    # When connections are checked before use. Valid values are:
+    # "always": on every checkout, which adds a round trip to each checkout.
+    # "idle": only connections idle for longer than db_pool_ping_idle_seconds.
+    # "never": rely on db_pool_recycle and retrying failed requests.
+    db_pool_pre_ping: str = "idle"
+    db_pool_ping_idle_seconds: float = 30
+    # Separate pool used by db_session for background tasks and jobs,
+    # so long-running jobs do not take connections from api requests.
+    db_background_pool_size: int = 4
+    db_background_max_overflow: int = 4
+
+    # Job engine configuration
+    # Number of jobs that run at the same time
+    job_pool_size: int = 4
+    # Number of jobs that can wait for a worker before new jobs are rejected
+    job_queue_depth: int = 100
+    # Max number of jobs that can be submitted in one /v1/run/jobs request
+    job_batch_max_size: int = 10000
+    # Executor used to run jobs. Valid values are "thread" and "process".
+    # Use "process" for cpu-bound jobs so they do not compete with the api for the GIL.
+    job_executor: str = "thread"
+    # Attach /v1/run/job requests to a queued or running run of the same job_name
+    # and job_params instead of starting another run. Requests can override it.
+    job_coalesce: bool = False
+    # Seconds a run holds its coalesce key for if the replica running it stops
+    # before the run ends
+    job_coalesce_ttl: float = 3600
+    # Seconds that requests with the same Idempotency-Key header return the same run
+    idempotency_key_ttl: float = 86400
+
+    # Admission control for /v1/run/job, /v1/run/jobs and /v1/train/job.
+    # Requests over the rate limits are rejected with a 429, and requests that
+    # would wait too long for a turn with a 503, both with a Retry-After header.
+    admission_enabled: bool = True
+    # Requests per second allowed to the run and the train endpoints, and the
+    # bursts above that. Set a rate to 0 for no limit.
+    admission_run_rate: float = 0
+    admission_run_burst: int = 100
+    admission_train_rate: float = 0
+    admission_train_burst: int = 20
+    # Requests per second allowed to each client on each endpoint, and the burst.
+    # Set the rate to 0 for no limit.
+    admission_client_rate: float = 0
+    admission_client_burst: int = 20
+    # Header that identifies clients, e.g. set by a gateway. If not set, clients
+    # are told apart by address.
+    admission_client_header: Optional[str] = None
+    # Requests each endpoint handles at the same time, and that can wait for a turn
+    admission_max_concurrent: int = 8
+    admission_max_queue: int = 256
+    # Seconds a request may wait for a turn. Requests expected to wait longer are
+    # rejected right away.
+    admission_queue_target: float = 0.25
+
+    # Training configuration
+    # Number of training jobs that run at the same time, each in its own process
+    train_pool_size: int = 2
+    # Number of training jobs that can wait for a process
+    train_queue_depth: int = 20
+    # BLAS/OpenMP threads for each training process.
+    # If not set, the cpu cores are divided between the train_pool_size processes.
+    train_threads_per_job: Optional[int] = None
+    # Fitted models are stored under artifacts_uri, a local directory or an s3:// uri
+    artifacts_uri: str = "data/artifacts"
+    # Directory of the csv and parquet files that can be used as training datasets
+    datasets_dir: str = "data/datasets"
+    # Processes that run the trials of hyperparameter sweeps.
+    # If not set, one process per cpu core.
+    sweep_pool_size: Optional[int] = None
+    # Number of sweeps that run at the same time, sharing the sweep processes
+    sweep_concurrency: int = 1
+    # Number of sweeps that can wait to run
+    sweep_queue_depth: int = 10
+    # Largest number of candidates a sweep can try
+    sweep_max_candidates: int = 256
+    # Attach /v1/train/job requests to a queued or running run that trains the
+    # same model. Requests can override it.
+    train_coalesce: bool = True
+
+    # Prediction configuration
+    # Megabytes of fitted models kept in memory, measured by the size of their artifacts
+    predict_cache_max_mb: int = 512
+    # Milliseconds that concurrent single-row predictions for a model are collected
+    # for and predicted together. Set to 0 to predict each row on its own.
+    predict_batch_window_ms: float = 2
+    # Rows predicted together at most
+    predict_max_batch_size: int = 256
+
+    # Time series downsampling configuration
+    # Most points /v1/series/downsample returns
+    series_max_points: int = 10000
+    # Series kept in memory, and for how many seconds
+    series_cache_size: int = 4
+    series_cache_ttl: float = 300
+
+    # Scheduler configuration
+    # Set to False to stop this replica from running scheduled jobs.
+    # Replicas coordinate using a lease in the job_leases table,
+    # so only one replica runs scheduled jobs at a time.
+    scheduler_enabled: bool = True
+    # Seconds between scheduler ticks
+    scheduler_interval: float = 15
+    # Seconds a replica holds the scheduler lease for if it stops renewing it
+    scheduler_lease_ttl: float = 60
+
+    # Job run archive configuration
+    # Finished runs older than job_runs_retention_days are moved from job_runs to
+    # parquet files under job_runs_archive_uri, a local directory or an s3:// uri.
+    job_runs_retention_days: int = 30
+    job_runs_archive_uri: str = "data/archive/job_runs"
+    # Number of monthly job_runs partitions to create ahead of time on MySQL
+    job_runs_partition_months_ahead: int = 3
+
+    # Min seconds between refreshes of the job run analytics snapshot
+    analytics_refresh_interval: float = 10
+    # Days of job runs kept in the analytics snapshot, older runs are not in the stats
+    analytics_window_days: int = 30
+
+    # Seconds that job status lookups are cached for.
+    # Status changes made by this process invalidate the cache immediately.
+    job_status_cache_ttl: float = 2.0
+    job_status_cache_size: int = 10000
+    # Seconds between checks for changes made by other replicas, and for progress,
+    # of the runs followed using /v1/status/job/{id_job_run}/events
+    job_events_poll_interval: float = 5
+    # Seconds between keepalive comments on idle event streams
+    job_events_keepalive_interval: float = 15
+    # Max runs returned per page of /v1/status/job_runs/changes
+    job_run_changes_max_limit: int = 5000
+    # Max runs returned per page of /v1/status/job_runs
+    job_runs_list_max_limit: int = 1000
 
     # API Keys
     openai_api_key: Optional[str]
 
+    # OpenAI compatible completion api configuration
+    # Point openai_base_url at a local mock to test without calling OpenAI.
+    openai_base_url: str = "https://api.openai.com/v1"
+    openai_model: str = "gpt-3.5-turbo"
+    # Number of completion streams open upstream at the same time
+    openai_max_streams: int = 100
+    # Seconds a request waits for a free stream before it is rejected with a 503
+    openai_queue_timeout: float = 2.0
+    # Connections in the shared http pool, at least openai_max_streams
+    openai_max_connections: int = 100
+    # Seconds to wait for each read from the upstream api
+    openai_timeout: float = 60
+    # Model used to embed requests for semantic cache lookups
+    openai_embedding_model: str = "text-embedding-ada-002"
+
+    # Completion cache configuration
+    # Where completions are cached. Valid values are:
+    # "disk": a sqlite file at completion_cache_path, shared by the workers on a host.
+    # "redis": the redis at redis_host, shared by all replicas.
+    # "none": completions are not cached.
+    completion_cache: str = "disk"
+    completion_cache_path: str = "data/cache/completions.db"
+    # Seconds a completion is cached for
+    completion_cache_ttl: float = 86400
+    # Completions kept at most. Past this, the least recently read are evicted.
+    completion_cache_max_entries: int = 100000
+    # Set to True to also return the completion of the most similar cached request,
+    # comparing embeddings of the messages. Each exact miss then embeds the request.
+    completion_cache_semantic: bool = False
+    # Min cosine similarity for a semantic match
+    completion_cache_similarity: float = 0.95
+    # Embeddings kept in memory by each worker for semantic lookups
+    completion_cache_semantic_max_entries: int = 10000
+
+    # Batch completion job configuration
+    # Results are written under llm_batch_output_uri, a local directory or an s3:// uri
+    llm_batch_output_uri: str = "data/llm_batch"
+    # Completion requests each batch job runs at the same time, at most.
+    # Rate limited jobs lower their concurrency and raise it again as requests succeed.
+    llm_batch_concurrency: int = 16
+    # Times a request is retried after a rate limit, server or connection error
+    llm_batch_max_retries: int = 6
+    # Results are written to a new parquet file, and progress is recorded, every
+    # llm_batch_checkpoint_rows results or llm_batch_checkpoint_interval seconds
+    llm_batch_checkpoint_rows: int = 500
+    llm_batch_checkpoint_interval: float = 10
+
+    # Redis configuration
+    redis_host: Optional[str]
+    redis_port: Optional[str]
+    redis_pass: Optional[str]
+    # Redis database number
+    redis_schema: Optional[str]
+
     # Cors origin list to allow requests from.
     # This list is set using the set_cors_origin_list validator
     # which uses the runtime_env variable to set the
     # default cors origin list.
     cors_origin_list: Optional[List[str]] = None
 
-    def get_db_uri(self) -> str:
+    def get_db_uri(self, use_async: bool = False) -> str:
         uri = "{}://{}{}@{}:{}/{}".format(
-            self.db_driver,
+            self.db_async_driver if use_async else self.db_driver,
             self.db_user,
             f":{self.db_pass}" if self.db_pass else "",
             self.db_host,
@@ -53,8 +256,14 @@ class ApiSettings(BaseSettings):
             self.db_schema,
         )
         if "None" in uri:
+            sqlite_driver = "sqlite+aiosqlite" if use_async else "sqlite"
+            if self.db_sqlite_path is not None:
+                logger.warning(
+                    f"No database provided, using sqlite at {self.db_sqlite_path}"
+                )
+                return f"{sqlite_driver}:///{self.db_sqlite_path}"
             logger.warning("No database provided, using in-memory sqlite")
-            return "sqlite://"
+            return f"{sqlite_driver}://"
         return uri
 
     @validator("runtime_env")
@@ -64,6 +273,27 @@ class ApiSettings(BaseSettings):
             raise ValueError(f"Invalid runtime_env: {runtime_env}")
         return runtime_env
 
+    @validator("db_pool_pre_ping")
+    def validate_db_pool_pre_ping(cls, db_pool_pre_ping):
+        valid_db_pool_pre_pings = ["always", "idle", "never"]
+        if db_pool_pre_ping not in valid_db_pool_pre_pings:
+            raise ValueError(f"Invalid db_pool_pre_ping: {db_pool_pre_ping}")
+        return db_pool_pre_ping
+
+    @validator("job_executor")
+    def validate_job_executor(cls, job_executor):
+        valid_job_executors = ["thread", "process"]
+        if job_executor not in valid_job_executors:
+            raise ValueError(f"Invalid job_executor: {job_executor}")
+        return job_executor
+
+    @validator("completion_cache")
+    def validate_completion_cache(cls, completion_cache):
+        valid_completion_caches = ["disk", "redis", "none"]
+        if completion_cache not in valid_completion_caches:
+            raise ValueError(f"Invalid completion_cache: {completion_cache}")
+        return completion_cache
+
     @validator("cors_origin_list", always=True)
     def set_cors_origin_list(cls, cors_origin_list, values):
         valid_cors = cors_origin_list or []
@@ -0,0 +1,17 @@
+from typing import Dict, Optional
+
+# Headers of server-sent event responses. Proxies must not cache or buffer them,
+# or clients only see the events once the stream ends.
+SSE_HEADERS: Dict[str, str] = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def format_event(data: str, event: Optional[str] = None) -> str:
+    """Returns a server-sent event."""
+    lines = [f"event: {event}"] if event is not None else []
+    lines += [f"data: {line}" for line in data.split("\n")]
+    return "\n".join(lines) + "\n\n"
+
+
+def format_comment(comment: str) -> str:
+    """Returns a server-sent event comment, which clients ignore."""
+    return f": {comment}\n\n"
@@ -7,7 +7,8 @@ st.set_page_config(
 
 st.markdown("## Select an App from the sidebar")
 st.markdown("1. Run Jobs: Run a job and check its status")
-st.markdown("2. Plotting Demo: Plot random numbers")
+st.markdown("2. Plotting Demo: Plot a large time series, downsampled")
+st.markdown("3. Job History: Recent job runs, refreshed incrementally")
 st.markdown("\n")
 
 st.sidebar.success("Select an App from above")
@@ -0,0 +1,87 @@
+import json
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+
+import streamlit as st
+
+from app.settings import app_settings
+
+
+class ApiError(Exception):
+    """Raised when the api cannot be reached or returns an error."""
+
+
+# -*- Http client shared by all sessions.
+# cache_resource creates it once per app process, so sessions reuse its pooled
+# connections instead of connecting to the api on each rerun.
+@st.cache_resource
+def get_api_client() -> httpx.Client:
+    return httpx.Client(
+        base_url=app_settings.api_url,
+        limits=httpx.Limits(
+            max_connections=app_settings.api_max_connections,
+            max_keepalive_connections=app_settings.api_max_connections,
+        ),
+        timeout=app_settings.api_timeout,
+    )
+
+
+def request(method: str, path: str, **kwargs: Any) -> Any:
+    """Sends a request to the api and returns the json response."""
+    try:
+        response = get_api_client().request(method, path, **kwargs)
+    except httpx.HTTPError as e:
+        raise ApiError(f"Could not reach the api at {app_settings.api_url}: {e}")
+    if response.status_code >= 400:
+        raise ApiError(
+            f"{method} {path} returned {response.status_code}: {response.text}"
+        )
+    return response.json()
+
+
+# -*- Jobs that can be run, cached for all sessions.
+# The list only changes when the api is deployed.
+@st.cache_data(ttl=60, show_spinner=False)
+def get_jobs() -> List[Dict[str, Any]]:
+    return request("GET", "/v1/run/jobs")["jobs"]
+
+
+def run_job(job_name: str, job_params: Dict[str, Any]) -> Dict[str, Any]:
+    # Double clicks and reruns attach to the run already queued for the same params
+    return request(
+        "POST",
+        "/v1/run/job",
+        json={"job_name": job_name, "job_params": job_params, "coalesce": True},
+    )
+
+
+def iter_job_run_events(
+    id_job_run: int, keepalive: float = 1
+) -> Iterator[Optional[Dict[str, Any]]]:
+    """Yields the state of a job run each time it changes, until the run ends.
+
+    Yields None for each keepalive from the api, at least every `keepalive`
+    seconds. Streamlit only stops a script for a rerun when it calls streamlit,
+    so pages update something on each keepalive to react to widgets quickly.
+    """
+    path = f"/v1/status/job/{id_job_run}/events"
+    try:
+        with get_api_client().stream(
+            "GET",
+            path,
+            params={"keepalive": keepalive},
+            timeout=httpx.Timeout(app_settings.api_timeout, read=keepalive + 30),
+        ) as response:
+            if response.status_code >= 400:
+                response.read()
+                raise ApiError(
+                    f"GET {path} returned {response.status_code}: {response.text}"
+                )
+            for line in response.iter_lines():
+                if line.startswith("data:"):
+                    yield json.loads(line[len("data:") :])
+                elif line.startswith(":"):
+                    yield None
+    except httpx.HTTPError as e:
+        raise ApiError(f"Lost the connection to the api: {e}")
@@ -0,0 +1,160 @@
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import polars as pl
+
+from app.api_client import request
+from utils.dttm import as_utc, current_utc
+
+# Columns of the job runs read from /v1/status/job_runs/changes
+JOB_RUNS_SCHEMA = {
+    "id_job_run": pl.Int64,
+    "job_name": pl.Utf8,
+    "status": pl.Utf8,
+    "start_ts": pl.Int64,
+    "update_ts": pl.Int64,
+    "end_ts": pl.Int64,
+    "progress_done": pl.Int64,
+    "progress_total": pl.Int64,
+    "id_parent_job_run": pl.Int64,
+}
+# Timestamps are sent as milliseconds since the epoch
+TS_COLUMNS = ["start_ts", "update_ts", "end_ts"]
+
+
+def to_frame(columns: Dict[str, List[Any]]) -> pl.DataFrame:
+    return pl.DataFrame(columns, schema=JOB_RUNS_SCHEMA).with_columns(
+        [pl.col(name).cast(pl.Datetime("ms")) for name in TS_COLUMNS]
+    )
+
+
+@dataclass
+class RefreshStats:
+    # Runs and requests read by the refresh
+    rows: int
+    requests: int
+    elapsed_ms: float
+    # Runs in the history after the refresh
+    total_rows: int
+    # time.time() of the refresh
+    refreshed_at: float
+
+
+class JobHistory:
+    """Job runs of the last `days` days, kept up to date incrementally.
+
+    The first refresh reads the runs updated in the last `days` days. Later
+    refreshes only read runs updated after the latest update_ts seen, and merge
+    them in by id_job_run, so their cost depends on how many runs changed rather
+    than on the size of job_runs. Runs are kept sorted by start_ts, newest first,
+    so pages of the history are slices.
+    """
+
+    def __init__(
+        self,
+        days: int,
+        refresh_interval: float,
+        batch_size: int,
+        refresh_overlap: float = 5.0,
+    ):
+        self.days = days
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        # Runs committed late can have an update_ts before the watermark, so each
+        # refresh also re-reads runs updated in the `refresh_overlap` seconds before
+        # the last refresh started.
+        self.refresh_overlap = timedelta(seconds=refresh_overlap)
+        # Changes each time runs are merged in, to key caches of derived data
+        self.version = 0
+        self.last_refresh: Optional[RefreshStats] = None
+
+        self._runs = to_frame({})
+        # Keyset (update_ts, id_job_run) of the latest run read
+        self._watermark: Optional[datetime] = None
+        self._watermark_id = 0
+        self._read_at: Optional[datetime] = None
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def runs(self) -> pl.DataFrame:
+        return self._runs
+
+    def refresh(self, force: bool = False) -> Optional[RefreshStats]:
+        """Merges in the runs updated since the last refresh.
+
+        Returns None without reading the api if the last refresh was less than
+        refresh_interval seconds ago.
+        """
+        with self._lock:
+            if (
+                not force
+                and time.monotonic() - self._refreshed_at < self.refresh_interval
+            ):
+                return None
+            start = time.perf_counter()
+            read_at = current_utc()
+            oldest = read_at - timedelta(days=self.days)
+            if self._watermark is None or self._read_at is None:
+                since, after_id = oldest, 0
+            else:
+                since, after_id = self._watermark, self._watermark_id
+                reread_since = self._read_at - self.refresh_overlap
+                if reread_since < since:
+                    since, after_id = max(reread_since, oldest), 0
+            rows = requests = 0
+            while True:
+                page = request(
+                    "GET",
+                    "/v1/status/job_runs/changes",
+                    params={
+                        "since": since.isoformat(),
+                        "after_id": after_id,
+                        "limit": self.batch_size,
+                    },
+                )
+                requests += 1
+                updates = to_frame(page["columns"])
+                if updates.height > 0:
+                    self._merge(updates)
+                    rows += updates.height
+                    since = as_utc(datetime.fromisoformat(page["since"]))
+                    after_id = page["after_id"]
+                    if self._watermark is None or (since, after_id) > (
+                        self._watermark,
+                        self._watermark_id,
+                    ):
+                        self._watermark, self._watermark_id = since, after_id
+                if not page["has_more"]:
+                    break
+            self._read_at = read_at
+            self._prune(oldest)
+            self._refreshed_at = time.monotonic()
+            self.last_refresh = RefreshStats(
+                rows=rows,
+                requests=requests,
+                elapsed_ms=(time.perf_counter() - start) * 1000,
+                total_rows=self._runs.height,
+                refreshed_at=time.time(),
+            )
+            return self.last_refresh
+
+    def _merge(self, updates: pl.DataFrame) -> None:
+        runs = pl.concat(
+            [
+                self._runs.filter(~pl.col("id_job_run").is_in(updates["id_job_run"])),
+                updates,
+            ]
+        )
+        self._runs = runs.sort("start_ts", descending=True)
+        self.version += 1
+
+    def _prune(self, oldest: datetime) -> None:
+        cutoff = pl.lit(int(oldest.timestamp() * 1000)).cast(pl.Datetime("ms"))
+        runs = self._runs.filter(pl.col("start_ts") >= cutoff)
+        if runs.height < self._runs.height:
+            self._runs = runs
+            self.version += 1
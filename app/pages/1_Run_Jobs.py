@@ -1,21 +1,65 @@
-from typing import Optional
+import json
+import time
+from typing import Any, Dict, Optional
 
 import streamlit as st
 
-# -*- List of test jobs
-Jobs = {
-    "Test 1": "path_to_test_1",
-    "Test 2": "path_to_test_3",
-    "Test 3": "path_to_test_3",
-}
+from app.api_client import ApiError, get_jobs, iter_job_run_events, run_job
+
+# Statuses after which a job run does not change
+FINAL_STATUSES = {"success", "failed", "pruned"}
 
 
 # -*- Run a job
-def run_job(job_name: Optional[str] = None) -> None:
+def run_selected_job(job_name: Optional[str], job_params: str) -> None:
     if job_name is None:
-        st.write("No job selected")
+        st.sidebar.warning("No job selected")
+        return
+    try:
+        params = json.loads(job_params or "{}")
+    except json.JSONDecodeError as e:
+        st.sidebar.error(f"Job params are not valid json: {e}")
+        return
+    try:
+        response = run_job(job_name, params)
+    except ApiError as e:
+        st.sidebar.error(str(e))
+        return
+    if response.get("id_job_run") is None:
+        error = response.get("error") or response.get("job_status")
+        st.sidebar.error(f"Could not run {job_name}: {error}")
+        return
+    st.session_state["id_job_run"] = response["id_job_run"]
+
+
+# -*- Show a job run, updated as its status changes
+def show_job_run(id_job_run: Optional[int]) -> None:
+    if id_job_run is None:
+        st.write("No job run yet, select a job and click Run")
         return
-    st.write(f"Running job: {job_name}")
+
+    st.markdown(f"### Job run {id_job_run}")
+    status_text = st.empty()
+    progress_bar = st.empty()
+    heartbeat = st.empty()
+    state: Dict[str, Any] = {}
+    try:
+        # The api pushes each change, so the page does not rerun to poll for them
+        for event in iter_job_run_events(id_job_run):
+            if event is not None:
+                state = event
+                status_text.markdown(f"**{state['job_name']}**: {state['status']}")
+                done, total = state.get("progress_done"), state.get("progress_total")
+                if total:
+                    progress_bar.progress(
+                        min(1.0, (done or 0) / total), text=f"{done} / {total}"
+                    )
+            heartbeat.caption(f"Following, last checked {time.strftime('%H:%M:%S')}")
+    except ApiError as e:
+        st.error(str(e))
+        return
+    if state.get("status") in FINAL_STATUSES:
+        heartbeat.caption(f"Finished with status {state['status']}")
 
 
 #
@@ -24,13 +68,21 @@ def run_job(job_name: Optional[str] = None) -> None:
 def create_sidebar():
     st.sidebar.markdown("## Settings")
 
-    selected_job = st.sidebar.selectbox("Select a job", Jobs.keys())
-    if selected_job is not None and selected_job in Jobs:
+    try:
+        jobs = {job["job_name"]: job for job in get_jobs()}
+    except ApiError as e:
+        st.sidebar.error(str(e))
+        jobs = {}
+
+    selected_job = st.sidebar.selectbox("Select a job", list(jobs.keys()))
+    if selected_job is not None and selected_job in jobs:
         st.session_state["selected_job"] = selected_job
-        st.session_state["selected_job_path"] = Jobs[selected_job]
+        if jobs[selected_job].get("description"):
+            st.sidebar.caption(jobs[selected_job]["description"])
 
+    job_params = st.sidebar.text_area("Job params (json)", "{}")
     if st.sidebar.button("Run"):
-        run_job(selected_job)
+        run_selected_job(selected_job, job_params)
 
     st.sidebar.markdown("---")
 
@@ -43,3 +95,4 @@ def create_sidebar():
 # -*- Run the app
 #
 create_sidebar()
+show_job_run(st.session_state.get("id_job_run"))
@@ -1,37 +1,59 @@
 import time
+from typing import Tuple
 
 import numpy as np
+import pandas as pd
 
 import streamlit as st
 
+from utils.downsample import DOWNSAMPLERS, downsample, get_viewport
+
+# Sizes of the generated series
+SERIES_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
 
-def plotting_demo():
-    progress_bar = st.sidebar.progress(0)
-    status_text = st.sidebar.empty()
-    last_rows = np.random.randn(1, 1)
-    chart = st.line_chart(last_rows)
 
-    for i in range(1, 101):
-        new_rows = last_rows[-1, :] + np.random.randn(5, 1).cumsum(axis=0)
-        status_text.text("%i%% Complete" % i)
-        chart.add_rows(new_rows)
-        progress_bar.progress(i)
-        last_rows = new_rows
-        time.sleep(0.05)
+# -*- Generate a random walk, shared by all sessions.
+# cache_resource returns the same arrays on each rerun instead of a copy,
+# the arrays must not be changed.
+@st.cache_resource(max_entries=2)
+def get_series(points: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    x = np.arange(points, dtype=np.float64)
+    y = rng.standard_normal(points).cumsum()
+    return x, y
 
-    progress_bar.empty()
 
-    # Streamlit widgets automatically run the script from top to bottom. Since
-    # this button is not connected to any other logic, it just causes a plain
-    # rerun.
-    st.button("Re-run")
+def plotting_demo():
+    points = st.sidebar.select_slider(
+        "Points in the series", options=SERIES_SIZES, value=1_000_000
+    )
+    method = st.sidebar.selectbox("Downsampling", list(DOWNSAMPLERS))
+    max_points = st.sidebar.slider("Points per render", 500, 5000, 2000, step=500)
+
+    x, y = get_series(points)
+    # Zooming downsamples the selected range again, showing its detail
+    x_min, x_max = st.slider("Zoom", 0, points - 1, (0, points - 1))
+
+    start = time.perf_counter()
+    x_view, y_view = downsample(
+        x, y, max_points, method=method, x_min=x_min, x_max=x_max
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    st.line_chart(pd.DataFrame({"value": y_view}, index=x_view))
+    viewport = get_viewport(x, x_min, x_max)
+    st.caption(
+        f"Sent {len(x_view):,} of the {viewport.stop - viewport.start:,} points in "
+        f"view ({points:,} in total), downsampled in {elapsed_ms:.1f} ms"
+    )
 
 
 st.markdown("# Plotting Demo")
 st.write(
-    """This demo illustrates plotting and animation with Streamlit.
-    We're generating a bunch of random numbers in a loop for around
-    5 seconds."""
+    """This demo plots a random walk of up to 10 million points. Only a few
+    thousand points are sent to the browser: the series is downsampled to keep
+    its shape, and downsampled again when you zoom in. The Api serves the same
+    downsampling for datasets at /v1/series/downsample."""
 )
 
 st.sidebar.header("Plotting Demo")
@@ -0,0 +1,98 @@
+import time
+from typing import Tuple
+
+import pandas as pd
+import polars as pl
+
+import streamlit as st
+
+from app.api_client import ApiError
+from app.job_history import JobHistory
+from app.settings import app_settings
+
+# Runs shown per page of the table
+PAGE_SIZE = 100
+
+
+# -*- Job history, shared by all sessions.
+# Each rerun only reads the runs changed since the last refresh, and at most once
+# every job_history_refresh_interval seconds for all sessions together.
+@st.cache_resource
+def get_job_history() -> JobHistory:
+    return JobHistory(
+        days=app_settings.job_history_days,
+        refresh_interval=app_settings.job_history_refresh_interval,
+        batch_size=app_settings.job_history_batch_size,
+    )
+
+
+# -*- Runs started per hour and status, recomputed when the history changes
+@st.cache_data(max_entries=32, show_spinner=False)
+def get_runs_per_hour(
+    _history: JobHistory, version: int, job_names: Tuple[str, ...]
+) -> pd.DataFrame:
+    runs = filter_runs(_history.runs, job_names)
+    hourly = runs.select(
+        [pl.col("start_ts").dt.truncate("1h").alias("hour"), pl.col("status")]
+    ).to_pandas()
+    return pd.crosstab(hourly["hour"], hourly["status"])
+
+
+def filter_runs(runs: pl.DataFrame, job_names: Tuple[str, ...]) -> pl.DataFrame:
+    if not job_names:
+        return runs
+    return runs.filter(pl.col("job_name").is_in(list(job_names)))
+
+
+def show_refresh_cost(history: JobHistory) -> None:
+    stats = history.last_refresh
+    if stats is None:
+        return
+    rows, requests, elapsed, total = st.columns(4)
+    rows.metric("Runs read", stats.rows)
+    requests.metric("Requests", stats.requests)
+    elapsed.metric("Refresh ms", f"{stats.elapsed_ms:.0f}")
+    total.metric("Runs in history", stats.total_rows)
+    st.caption(
+        f"Last refresh {time.time() - stats.refreshed_at:.0f} s ago. "
+        "Refreshes read only the runs changed since the one before, "
+        "so their cost should not grow with the size of job_runs."
+    )
+
+
+def job_history():
+    history = get_job_history()
+    force = st.sidebar.button("Refresh now")
+    try:
+        history.refresh(force=force)
+    except ApiError as e:
+        st.error(str(e))
+
+    st.markdown(f"## Job runs of the last {history.days} days")
+    show_refresh_cost(history)
+
+    runs = history.runs
+    job_names = tuple(
+        st.sidebar.multiselect("Jobs", sorted(runs["job_name"].unique().to_list()))
+    )
+    runs = filter_runs(runs, job_names)
+
+    per_hour = get_runs_per_hour(history, history.version, job_names)
+    if not per_hour.empty:
+        st.markdown("### Runs started per hour")
+        st.bar_chart(per_hour)
+
+    # Runs are sorted newest first, so each page is a slice
+    pages = max(1, -(-runs.height // PAGE_SIZE))
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1)
+    st.caption(f"Page {page} of {pages}, {runs.height} runs")
+    st.dataframe(
+        runs.slice((page - 1) * PAGE_SIZE, PAGE_SIZE).to_pandas(),
+        use_container_width=True,
+    )
+
+
+#
+# -*- Run the app
+#
+job_history()
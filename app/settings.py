@@ -15,6 +15,22 @@ class AppSettings(BaseSettings):
     # Max size, in megabytes, for files uploaded with the file_uploader.
     max_upload_size: int = 256
 
+    # Api the pages call
+    api_url: str = "http://localhost:9090"
+    # Seconds to wait for the api to respond
+    api_timeout: float = 10
+    # Connections to the api shared by all sessions. Each session following a
+    # job run holds one open, so keep this above the expected number of users.
+    api_max_connections: int = 100
+
+    # Days of job runs shown on the Job History page
+    job_history_days: int = 7
+    # Seconds between reads of changed job runs. The history is shared by all
+    # sessions, so reruns within this interval read nothing from the api.
+    job_history_refresh_interval: float = 5
+    # Runs read per request
+    job_history_batch_size: int = 5000
+
 
 # Create AppSettings object
 app_settings = AppSettings()
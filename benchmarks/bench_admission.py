@@ -0,0 +1,158 @@
+"""Benchmark admission control
+Sends requests to /v1/run/job at fixed arrival rates, whether or not earlier ones
+have returned, with admission control off and on. Reports the requests handled
+per second, their p50 and p99 latency, and the requests rejected with a 429 or
+503 and how fast that was. Past the rate the api can handle, latency without
+admission control grows with the backlog; with it, the excess is rejected and
+the p99 of handled requests stays near the queue target.
+
+Usage:
+    $ python -m benchmarks.bench_admission --rates 50 100 200 --duration 8
+    $ python -m benchmarks.bench_admission --queue-target 0.1 --max-concurrent 4
+"""
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+from benchmarks.load import LoadResult, run_api_server
+
+Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class RawClient:
+    """Sends one pre-encoded request over keep-alive connections.
+
+    The benchmark machine runs the client and the api, so the client has to be
+    far cheaper per request than httpx for the api to get the cpu.
+    """
+
+    def __init__(self, base_url: str, path: str, body: bytes):
+        url = urlsplit(base_url)
+        self.host, self.port = url.hostname or "127.0.0.1", url.port or 80
+        self.request = (
+            f"POST {path} HTTP/1.1\r\nHost: {url.netloc}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+        ).encode() + body
+        self._idle: List[Connection] = []
+
+    async def post(self) -> int:
+        """Sends the request and returns the status code, 0 if it failed."""
+        for _ in range(2):
+            if self._idle:
+                reader, writer = self._idle.pop()
+            else:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                writer.write(self.request)
+                status_line = await reader.readline()
+                if not status_line:
+                    # The server closed an idle connection, retry on a new one
+                    writer.close()
+                    continue
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b""):
+                        break
+                    name, _, value = line.partition(b":")
+                    if name.lower() == b"content-length":
+                        length = int(value)
+                await reader.readexactly(length)
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                writer.close()
+                return 0
+            self._idle.append((reader, writer))
+            return int(status_line.split()[1])
+        return 0
+
+    def close(self) -> None:
+        for _, writer in self._idle:
+            writer.close()
+
+
+async def run_open_loop(
+    base_url: str, rate: float, duration: float
+) -> Tuple[LoadResult, LoadResult, Dict[int, int]]:
+    """Starts a request every 1 / rate seconds for duration seconds. Returns the
+    handled and rejected requests and the count of each status code."""
+    handled, rejected = LoadResult(), LoadResult()
+    statuses: Dict[int, int] = {}
+    job = {"job_name": "test", "job_params": {"seconds": 0}}
+    client = RawClient(base_url, "/v1/run/job", json.dumps(job).encode())
+
+    async def send() -> None:
+        start = time.perf_counter()
+        status_code = await client.post()
+        result = handled if status_code == 200 else rejected
+        result.latencies.append(time.perf_counter() - start)
+        result.requests += 1
+        statuses[status_code] = statuses.get(status_code, 0) + 1
+
+    tasks: List["asyncio.Task[None]"] = []
+    start = time.perf_counter()
+    for i in range(int(rate * duration)):
+        delay = start + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(send()))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    client.close()
+    handled.elapsed = rejected.elapsed = elapsed
+    return handled, rejected, statuses
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rates", type=float, nargs="+", default=[50, 100, 200])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--max-concurrent", type=int, default=2)
+    parser.add_argument("--queue-target", type=float, default=0.25)
+    args = parser.parse_args()
+
+    modes = {
+        "off": {"ADMISSION_ENABLED": "false"},
+        "on": {
+            "ADMISSION_MAX_CONCURRENT": str(args.max_concurrent),
+            "ADMISSION_QUEUE_TARGET": str(args.queue_target),
+        },
+    }
+    print(
+        f"{args.duration:g} s per rate, admission max_concurrent "
+        f"{args.max_concurrent}, queue target {args.queue_target * 1000:g} ms"
+    )
+    print(
+        f"{'admission':<10}{'offered/s':>10}{'handled/s':>10}{'p50 ms':>9}"
+        f"{'p99 ms':>9}{'rejected':>10}{'reject p99 ms':>15}  statuses"
+    )
+    for mode, mode_env in modes.items():
+        for rate in args.rates:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                env = {
+                    **mode_env,
+                    "DB_SQLITE_PATH": str(Path(tmp_dir).joinpath("bench.db")),
+                    # Measure the api, not the job queue filling up
+                    "JOB_QUEUE_DEPTH": "1000000",
+                    "SCHEDULER_ENABLED": "false",
+                    "LOG_LEVEL": "WARNING",
+                }
+                with run_api_server(env=env) as api_url:
+                    handled, rejected, statuses = asyncio.run(
+                        run_open_loop(api_url, rate, args.duration)
+                    )
+            print(
+                f"{mode:<10}{rate:>10g}{handled.rps:>10.1f}"
+                f"{handled.percentile(50):>9.1f}{handled.percentile(99):>9.1f}"
+                f"{rejected.requests:>10}{rejected.percentile(99):>15.1f}  "
+                f"{dict(sorted(statuses.items()))}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Benchmark the completion cache
+Sends a workload of repeated and reworded prompts to /v1/completions/chat, backed by
+a local mock of the OpenAI api, with the cache off, with exact lookups and with
+exact and semantic lookups. Reports latency, hit ratio and the requests that reached
+the upstream api.
+
+Prompts are drawn from `--prompts` questions with a skewed popularity, and
+`--reworded` of requests change the wording of the question a little.
+
+Usage:
+    $ python -m benchmarks.bench_completion_cache --requests 400 --prompts 50
+    $ python -m benchmarks.bench_completion_cache --reworded 0.5 --similarity 0.85
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.load import run_api_server
+
+SUBJECTS = ["invoices", "payments", "orders", "customers", "shipments", "refunds"]
+ACTIONS = ["summarize", "list the risks of", "explain", "forecast", "compare"]
+REWORDINGS = ["please ", "can you ", "quickly ", "briefly "]
+
+
+def get_prompts(requests: int, prompts: int, reworded: float, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    questions = [
+        f"{rng.choice(ACTIONS)} the {rng.choice(SUBJECTS)} of region {i} for the "
+        f"last quarter and point out anything unusual"
+        for i in range(prompts)
+    ]
+    # Zipf-like popularity, a few questions are asked most of the time
+    weights = [1 / (rank + 1) for rank in range(prompts)]
+    workload = []
+    for question in rng.choices(questions, weights=weights, k=requests):
+        if rng.random() < reworded:
+            question = rng.choice(REWORDINGS) + question
+        workload.append(question)
+    return workload
+
+
+async def send(client: httpx.AsyncClient, prompt: str) -> float:
+    start = time.perf_counter()
+    payload = {"messages": [{"role": "user", "content": prompt}]}
+    async with client.stream("POST", "/v1/completions/chat", json=payload) as r:
+        async for _ in r.aiter_lines():
+            pass
+    return time.perf_counter() - start
+
+
+async def run_workload(
+    base_url: str, workload: List[str], concurrency: int
+) -> Dict[str, float]:
+    queue: "asyncio.Queue[str]" = asyncio.Queue()
+    for prompt in workload:
+        queue.put_nowait(prompt)
+    latencies: List[float] = []
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        while not queue.empty():
+            latencies.append(await send(client, queue.get_nowait()))
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 1),
+    }
+
+
+def get_cache_stats(metrics: str) -> Dict[str, float]:
+    stats = {}
+    for line in metrics.splitlines():
+        if line.startswith("completion_cache_") and "semantic_entries" not in line:
+            name, value = line.split()
+            stats[name[len("completion_cache_") :]] = float(value)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--prompts", type=int, default=50)
+    parser.add_argument("--reworded", type=float, default=0.3)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.02)
+    parser.add_argument("--similarity", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workload = get_prompts(args.requests, args.prompts, args.reworded, args.seed)
+    modes = {
+        "off": {"COMPLETION_CACHE": "none"},
+        "exact": {"COMPLETION_CACHE": "disk"},
+        "exact+semantic": {
+            "COMPLETION_CACHE": "disk",
+            "COMPLETION_CACHE_SEMANTIC": "true",
+            "COMPLETION_CACHE_SIMILARITY": str(args.similarity),
+        },
+    }
+    print(
+        f"{args.requests} requests over {args.prompts} prompts, "
+        f"{args.reworded:.0%} reworded, {args.concurrency} concurrent clients, "
+        f"upstream streams {args.chunks} chunks every {args.delay * 1000:g} ms"
+    )
+    for mode, mode_env in modes.items():
+        mock_env = {
+            "MOCK_OPENAI_CHUNKS": str(args.chunks),
+            "MOCK_OPENAI_DELAY": str(args.delay),
+        }
+        with tempfile.TemporaryDirectory() as tmp_dir, run_api_server(
+            env=mock_env, app="llm.mock_upstream:app", ready_path="/stats"
+        ) as upstream_url:
+            api_env = {
+                **mode_env,
+                "OPENAI_BASE_URL": upstream_url,
+                "OPENAI_API_KEY": "benchmark",
+                "COMPLETION_CACHE_PATH": str(Path(tmp_dir).joinpath("cache.db")),
+                "DB_SQLITE_PATH": str(Path(tmp_dir).joinpath("benchmark.db")),
+                "SCHEDULER_ENABLED": "false",
+                "LOG_LEVEL": "WARNING",
+            }
+            with run_api_server(env=api_env) as api_url:
+                result = asyncio.run(run_workload(api_url, workload, args.concurrency))
+                cache_stats = get_cache_stats(httpx.get(f"{api_url}/v1/metrics").text)
+            upstream = httpx.get(f"{upstream_url}/stats").json()
+        print(
+            f"{mode:<16}{result} upstream completions {upstream['requests']} "
+            f"hit ratio {cache_stats.get('hit_ratio', 0):.2f} "
+            f"(exact {cache_stats.get('exact_hits_total', 0):g}, "
+            f"semantic {cache_stats.get('semantic_hits_total', 0):g})"
+        )
+
+
+if __name__ == "__main__":
+    main()
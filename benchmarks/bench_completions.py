@@ -0,0 +1,112 @@
+"""Benchmark concurrent completion streams
+Runs the Api (one uvicorn worker) against a local mock of the OpenAI api that streams
+`--chunks` tokens, `--delay` seconds apart. Opens increasing numbers of concurrent
+streams to /v1/completions/chat and reports, for each level, how many completed or
+were rejected, the time to the first event and how much longer streams took than the
+mock's own duration.
+
+Usage:
+    $ python -m benchmarks.bench_completions --streams 50 200 800
+    $ python -m benchmarks.bench_completions --streams 400 --max-streams 100
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.load import run_api_server
+
+PAYLOAD = {"messages": [{"role": "user", "content": "benchmark"}]}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def open_stream(client: httpx.AsyncClient) -> Optional[Dict[str, float]]:
+    """Returns the seconds to the first event and to the end of one stream,
+    or None if the stream was rejected."""
+    start = time.perf_counter()
+    first_event = None
+    async with client.stream("POST", "/v1/completions/chat", json=PAYLOAD) as r:
+        if r.status_code != 200:
+            await r.aread()
+            return None
+        async for line in r.aiter_lines():
+            if first_event is None and line.startswith("data:"):
+                first_event = time.perf_counter() - start
+    return {"first_event": first_event or 0.0, "total": time.perf_counter() - start}
+
+
+async def run_streams(base_url: str, streams: int) -> Dict[str, float]:
+    limits = httpx.Limits(max_connections=streams, max_keepalive_connections=streams)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as c:
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(open_stream(c) for _ in range(streams)), return_exceptions=True
+        )
+        elapsed = time.perf_counter() - start
+    completed = [r for r in results if isinstance(r, dict)]
+    first_events = [r["first_event"] for r in completed]
+    totals = [r["total"] for r in completed]
+    return {
+        "completed": len(completed),
+        "rejected": sum(1 for r in results if r is None),
+        "errors": sum(1 for r in results if isinstance(r, BaseException)),
+        "elapsed_s": round(elapsed, 2),
+        "first_event_p50_ms": round(percentile(first_events, 50) * 1000, 1),
+        "first_event_p99_ms": round(percentile(first_events, 99) * 1000, 1),
+        "stream_mean_s": round(statistics.mean(totals), 3) if totals else 0.0,
+        "stream_p99_s": round(percentile(totals, 99), 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streams", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.05)
+    parser.add_argument("--max-streams", type=int, default=1000)
+    parser.add_argument("--queue-timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    mock_env = {
+        "MOCK_OPENAI_CHUNKS": str(args.chunks),
+        "MOCK_OPENAI_DELAY": str(args.delay),
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir, run_api_server(
+        env=mock_env, app="llm.mock_upstream:app", ready_path="/stats"
+    ) as upstream_url:
+        api_env = {
+            "OPENAI_BASE_URL": upstream_url,
+            "OPENAI_API_KEY": "benchmark",
+            "OPENAI_MAX_STREAMS": str(args.max_streams),
+            "OPENAI_MAX_CONNECTIONS": str(args.max_streams),
+            "OPENAI_QUEUE_TIMEOUT": str(args.queue_timeout),
+            "DB_SQLITE_PATH": str(Path(tmp_dir).joinpath("benchmark.db")),
+            "SCHEDULER_ENABLED": "false",
+            "LOG_LEVEL": "WARNING",
+        }
+        with run_api_server(env=api_env) as api_url:
+            print(
+                f"1 api worker, upstream streams {args.chunks} chunks "
+                f"every {args.delay * 1000:g} ms "
+                f"({args.chunks * args.delay:g} s), max streams {args.max_streams}"
+            )
+            for streams in args.streams:
+                print(
+                    f"{streams:>6} streams  {asyncio.run(run_streams(api_url, streams))}"
+                )
+
+
+if __name__ == "__main__":
+    main()
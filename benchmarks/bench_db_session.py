@@ -0,0 +1,86 @@
+"""Benchmark per-request database sessions
+Compares the old `db_session_middleware`, which opened a session for every request,
+with the lazy `get_db` dependency, which only opens one when a route asks for it.
+
+Usage:
+    $ python -m benchmarks.bench_db_session --requests 5000
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Dict
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+from api.routes.health_checks import health_checks_router
+from db.session import SessionLocal, get_db, init_db_engines
+
+
+def build_middleware_app() -> FastAPI:
+    """The app as it was: a session is opened for every request in a middleware."""
+    app = FastAPI()
+    app.include_router(health_checks_router, prefix="/v1")
+
+    @app.middleware("http")
+    async def db_session_middleware(request: Request, call_next):
+        try:
+            request.state.db = SessionLocal()
+            response = await call_next(request)
+        finally:
+            request.state.db.close()
+        return response
+
+    @app.get("/v1/db")
+    def db_route(request: Request):
+        return {"value": request.state.db.execute(text("SELECT 1")).scalar()}
+
+    return app
+
+
+def build_dependency_app() -> FastAPI:
+    """The app as it is now: a session is only opened for routes that depend on get_db."""
+    app = FastAPI()
+    app.include_router(health_checks_router, prefix="/v1")
+
+    @app.get("/v1/db")
+    def db_route(db: Session = Depends(get_db)):
+        return {"value": db.execute(text("SELECT 1")).scalar()}
+
+    return app
+
+
+async def measure_rps(app: FastAPI, path: str, num_requests: int) -> float:
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        # Warm up
+        for _ in range(50):
+            await client.get(path)
+        start = time.perf_counter()
+        for _ in range(num_requests):
+            await client.get(path)
+        elapsed = time.perf_counter() - start
+    return num_requests / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    init_db_engines()
+    apps: Dict[str, FastAPI] = {
+        "before (middleware)": build_middleware_app(),
+        "after (dependency)": build_dependency_app(),
+    }
+    for path in ("/v1/ping", "/v1/db"):
+        for name, app in apps.items():
+            rps = asyncio.run(measure_rps(app, path, args.requests))
+            print(f"{path:<10} {name:<22} {rps:>10.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
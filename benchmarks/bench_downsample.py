@@ -0,0 +1,70 @@
+"""Benchmark time series downsampling
+Downsamples a random walk of `--points` points with each method to a few output
+sizes, for the whole series and for a zoomed-in viewport, and reports the median
+time and the size of the points as json compared to sending the whole series.
+
+Usage:
+    $ python -m benchmarks.bench_downsample --points 10000000
+    $ python -m benchmarks.bench_downsample --out 1000 2000 5000 --zoom 0.01
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from utils.downsample import DOWNSAMPLERS, downsample
+
+
+def time_ms(fn: Callable[[], object], repeat: int) -> float:
+    times: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=10_000_000)
+    parser.add_argument("--out", type=int, nargs="+", default=[1000, 2000, 5000])
+    # Fraction of the series in view when zoomed in
+    parser.add_argument("--zoom", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    x = np.arange(args.points, dtype=np.float64)
+    y = rng.standard_normal(args.points).cumsum()
+    # json of the whole series, estimated from the first 100k points
+    sample = min(args.points, 100_000)
+    full_mb = (
+        len(json.dumps({"x": x[:sample].tolist(), "y": y[:sample].tolist()}))
+        * args.points
+        / sample
+        / 1e6
+    )
+    x_min = args.points * 0.5
+    x_max = x_min + args.points * args.zoom
+    print(f"{args.points:,} points, whole series as json ~{full_mb:,.0f} MB")
+
+    for n_out in args.out:
+        for method in DOWNSAMPLERS:
+            whole = time_ms(lambda: downsample(x, y, n_out, method), args.repeat)
+            zoomed = time_ms(
+                lambda: downsample(x, y, n_out, method, x_min, x_max), args.repeat
+            )
+            x_out, y_out = downsample(x, y, n_out, method)
+            out_kb = len(json.dumps({"x": x_out.tolist(), "y": y_out.tolist()})) / 1e3
+            print(
+                f"{n_out:>6} points  {method:<12} whole {whole:7.1f} ms  "
+                f"zoomed to {args.zoom:.0%} {zoomed:6.1f} ms  json {out_kb:6.1f} kB"
+            )
+
+
+if __name__ == "__main__":
+    main()
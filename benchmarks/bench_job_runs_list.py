@@ -0,0 +1,170 @@
+"""Benchmark listing job runs
+Fills a sqlite job_runs table with `--rows` runs, then reads pages at increasing
+depths, newest first, with OFFSET and with the keyset on (start_ts, id_job_run)
+used by /v1/status/job_runs. Reports the median latency of each, without filters
+and filtered by job_name and by status, and of the endpoint itself.
+
+The table is kept at `--db` and reused when it already has `--rows` runs.
+
+Usage:
+    $ python -m benchmarks.bench_job_runs_list --rows 5000000
+    $ python -m benchmarks.bench_job_runs_list --rows 100000 --depths 1 10 100
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+JOB_NAMES = [f"job_{i}" for i in range(20)]
+STATUSES = ["success"] * 90 + ["failed"] * 8 + ["pruned"] * 2
+# Format sqlalchemy stores datetimes in on sqlite
+TS_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def generate_runs(rows: int, seed: int = 0) -> Iterator[Tuple[Any, ...]]:
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    # A year of runs, a few starting at the same time
+    step = 365 * 86400 / rows
+    for i in range(rows):
+        start_ts = start + timedelta(seconds=int(i * step))
+        end_ts = start_ts + timedelta(seconds=rng.randint(1, 600))
+        yield (
+            rng.choice(JOB_NAMES),
+            rng.choice(STATUSES),
+            start_ts.strftime(TS_FORMAT),
+            end_ts.strftime(TS_FORMAT),
+            end_ts.strftime(TS_FORMAT),
+        )
+
+
+def fill_table(db_path: Path, rows: int) -> None:
+    from sqlalchemy import create_engine
+
+    from db.tables import BaseTable
+
+    if db_path.exists():
+        with sqlite3.connect(db_path) as conn:
+            if conn.execute("SELECT count(*) FROM job_runs").fetchone()[0] == rows:
+                return
+        db_path.unlink()
+    BaseTable.metadata.create_all(create_engine(f"sqlite:///{db_path}"))
+    start = time.perf_counter()
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO job_runs (job_name, status, start_ts, end_ts, update_ts) "
+            "VALUES (?, ?, ?, ?, ?)",
+            generate_runs(rows),
+        )
+        conn.execute("ANALYZE")
+    print(f"Inserted {rows} runs in {time.perf_counter() - start:.0f} s")
+
+
+def median_ms(fn: Callable[[], Any], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument(
+        "--depths", type=int, nargs="+", default=[1, 100, 1000, 10000, 40000]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db", default="data/benchmarks/job_runs_list.db")
+    args = parser.parse_args()
+
+    db_path = Path(args.db).resolve()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    # Settings are read on import, so configure them before importing the app
+    os.environ["DB_SQLITE_PATH"] = str(db_path)
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    os.environ["LOG_LEVEL"] = "WARNING"
+
+    fill_table(db_path, args.rows)
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import select
+
+    from api.app import app
+    from db.crud.job_runs import list_job_runs
+    from db.session import SessionLocal, init_db_engines
+    from db.tables.job_runs import JobRuns
+
+    init_db_engines()
+    db = SessionLocal()
+    columns = ["id_job_run", "job_name", "status", "start_ts", "end_ts"]
+    filters: Dict[str, Dict[str, Optional[str]]] = {
+        "all runs": {},
+        "job_name": {"job_name": JOB_NAMES[0]},
+        "status": {"status": "failed"},
+    }
+
+    def offset_page(
+        offset: int, job_name: Optional[str] = None, status: Optional[str] = None
+    ) -> List[Any]:
+        stmt = select(*(JobRuns.__table__.c[name] for name in columns))
+        if job_name is not None:
+            stmt = stmt.where(JobRuns.job_name == job_name)
+        if status is not None:
+            stmt = stmt.where(JobRuns.status == status)
+        stmt = stmt.order_by(JobRuns.start_ts.desc(), JobRuns.id_job_run.desc())
+        return db.execute(stmt.limit(args.page_size).offset(offset)).all()
+
+    print(f"{args.rows} runs, {args.page_size} runs per page, median of {args.repeat}")
+    print(f"{'filter':<10}{'page':>8}{'offset ms':>12}{'keyset ms':>12}")
+    for name, where in filters.items():
+        for depth in args.depths:
+            offset = (depth - 1) * args.page_size
+            before = None
+            if offset > 0:
+                # The last run of the previous page, as a client would have it
+                last = offset_page(offset - 1, **where)
+                if not last:
+                    break
+                before = (last[0].start_ts, last[0].id_job_run)
+            offset_ms = median_ms(lambda: offset_page(offset, **where), args.repeat)
+            keyset_ms = median_ms(
+                lambda: list_job_runs(
+                    db, columns, args.page_size, before=before, **where
+                ),
+                args.repeat,
+            )
+            print(f"{name:<10}{depth:>8}{offset_ms:>12.2f}{keyset_ms:>12.2f}")
+    db.close()
+
+    # End to end, following next_cursor from the first page
+    with TestClient(app) as client:
+        params: Dict[str, Any] = {
+            "limit": args.page_size,
+            "fields": "id_job_run,status",
+        }
+        timings = []
+        for _ in range(min(args.depths[-1], 200)):
+            start = time.perf_counter()
+            page = client.get("/v1/status/job_runs", params=params).json()
+            timings.append(time.perf_counter() - start)
+            if page["next_cursor"] is None:
+                break
+            params["cursor"] = page["next_cursor"]
+    print(
+        f"/v1/status/job_runs: {len(timings)} pages following next_cursor, "
+        f"median {statistics.median(timings) * 1000:.2f} ms, "
+        f"max {max(timings) * 1000:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark the batch completion job
+Runs the llm_batch job over `--rows` prompts against a local mock of the OpenAI api
+that takes `--delay` seconds per token, one request at a time and with increasing
+concurrency, and reports rows per second and the rate limits hit. With
+`--max-concurrent` the mock rate limits requests beyond that many in flight.
+
+Usage:
+    $ python -m benchmarks.bench_llm_batch --rows 1000 --concurrency 1 8 32
+    $ python -m benchmarks.bench_llm_batch --concurrency 64 --max-concurrent 16
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--chunks", type=int, default=10)
+    parser.add_argument("--delay", type=float, default=0.01)
+    parser.add_argument("--max-concurrent", type=int, default=0)
+    args = parser.parse_args()
+
+    tmp_dir = Path(tempfile.mkdtemp())
+    datasets_dir = tmp_dir.joinpath("datasets")
+    datasets_dir.mkdir()
+    mock_env = {
+        "MOCK_OPENAI_CHUNKS": str(args.chunks),
+        "MOCK_OPENAI_DELAY": str(args.delay),
+        "MOCK_OPENAI_MAX_CONCURRENT": str(args.max_concurrent),
+    }
+    # Settings are read on import, so configure them before importing jobs
+    os.environ.update(
+        {
+            "DATASETS_DIR": str(datasets_dir),
+            "LLM_BATCH_OUTPUT_URI": str(tmp_dir.joinpath("output")),
+            "OPENAI_API_KEY": "benchmark",
+            "LOG_LEVEL": "WARNING",
+        }
+    )
+
+    import polars as pl
+
+    from api.settings import api_settings
+    from benchmarks.load import run_api_server
+    from jobs.llm_batch import llm_batch_job
+
+    pl.DataFrame({"prompt": [f"prompt {i}" for i in range(args.rows)]}).write_csv(
+        datasets_dir.joinpath("prompts.csv")
+    )
+    print(
+        f"{args.rows} prompts, {args.chunks * args.delay:g} s per completion, "
+        f"upstream limit {args.max_concurrent or 'none'}"
+    )
+    with run_api_server(
+        env=mock_env, app="llm.mock_upstream:app", ready_path="/stats"
+    ) as upstream_url:
+        api_settings.openai_base_url = upstream_url
+        for concurrency in args.concurrency:
+            start = time.perf_counter()
+            result = llm_batch_job(
+                dataset="prompts.csv",
+                output=f"concurrency-{concurrency}",
+                concurrency=concurrency,
+            )
+            elapsed = time.perf_counter() - start
+            print(
+                f"concurrency {concurrency:>4}  {elapsed:7.2f} s  "
+                f"{result['done'] / elapsed:8.1f} rows/s  "
+                f"failed {result['failed']}  rate limits {result['rate_limits']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark logging overhead per request
+Each simulated request logs 2 INFO records, like the /v1/run/job route.
+Measures the time spent in the calling thread, which is the time a request waits on
+logging, for:
+0. no handler: the cost of creating the records, which every mode pays.
+1. rich: the dev RichHandler, which formats and writes in the calling thread.
+2. json sync: JSON lines written in the calling thread, without the queue.
+3. json queued: JSON lines handed to the background writer thread.
+4. json queued, sampled: as 3. with LOG_SAMPLE_RATE=0.1.
+5. filtered f-string vs lazy %-args: DEBUG records below the log level.
+Records are written to /dev/null, so real console or file I/O would only widen the gap.
+
+Usage:
+    $ python -m benchmarks.bench_logging --requests 20000
+"""
+
+import argparse
+import logging
+import os
+import time
+from typing import Callable
+
+from utils.log import (
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    build_json_handler,
+    build_logger,
+)
+
+
+def time_requests(log_request: Callable[[int], None], requests: int) -> float:
+    """Returns the mean microseconds per request."""
+    for i in range(min(requests, 1000)):
+        log_request(i)
+    start = time.perf_counter()
+    for i in range(requests):
+        log_request(i)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def info_request(logger: logging.Logger) -> Callable[[int], None]:
+    def log_request(i: int) -> None:
+        logger.info("Received request to run %s", "test")
+        logger.info("Queued %s: %s", "test", i)
+
+    return log_request
+
+
+def main(requests: int) -> None:
+    devnull = open(os.devnull, "w")
+    results = {}
+
+    null_logger = logging.getLogger("bench.null")
+    null_logger.addHandler(logging.NullHandler())
+    null_logger.setLevel(logging.INFO)
+    null_logger.propagate = False
+    results["no handler"] = time_requests(info_request(null_logger), requests)
+
+    rich_logger = build_logger("bench.rich", log_format="rich", stream=devnull)
+    results["rich"] = time_requests(info_request(rich_logger), requests)
+
+    sync_logger = logging.getLogger("bench.json_sync")
+    sync_handler = logging.StreamHandler(devnull)
+    sync_handler.setFormatter(JsonFormatter())
+    sync_logger.addHandler(sync_handler)
+    sync_logger.setLevel(logging.INFO)
+    sync_logger.propagate = False
+    results["json sync"] = time_requests(info_request(sync_logger), requests)
+
+    # The queue holds every record, so none are dropped during the benchmark
+    for name, sample_rate in (("json queued", 1.0), ("json queued, sampled", 0.1)):
+        queued_logger = logging.getLogger(f"bench.{name}")
+        queue_handler = build_json_handler(
+            stream=devnull, sample_rate=sample_rate, queue_size=requests * 3
+        )
+        queued_logger.addHandler(queue_handler)
+        queued_logger.setLevel(logging.INFO)
+        queued_logger.propagate = False
+        results[name] = time_requests(info_request(queued_logger), requests)
+        assert isinstance(queue_handler, NonBlockingQueueHandler)
+        assert queue_handler.dropped == 0
+        # Let the writer thread drain, so it does not slow down the next run
+        queue_handler.queue.join()
+
+    payload = {"job_name": "test", "job_params": {"seconds": 1}}
+
+    def filtered_fstring(i: int) -> None:
+        sync_logger.debug(f"Request {i}: {payload}")
+
+    def filtered_lazy(i: int) -> None:
+        sync_logger.debug("Request %s: %s", i, payload)
+
+    results["filtered debug, f-string"] = time_requests(filtered_fstring, requests)
+    results["filtered debug, lazy"] = time_requests(filtered_lazy, requests)
+
+    print(f"{'mode':<28}{'us/request':>12}")
+    for name, us_per_request in results.items():
+        print(f"{name:<28}{us_per_request:>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.requests)
@@ -0,0 +1,100 @@
+"""Benchmark the overhead of RequestMetricsMiddleware
+Calls ASGI apps directly, without a server or http client, so the difference between
+runs is the cost of the middleware. Measures:
+1. a bare ASGI app with and without the middleware, which isolates the recording cost.
+2. the api's /v1/ping route with and without the middleware.
+
+Usage:
+    $ python -m benchmarks.bench_metrics_middleware --requests 100000
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict
+
+from fastapi import FastAPI
+from starlette.types import Receive, Scope, Send
+
+from api.metrics import RequestMetrics, RequestMetricsMiddleware
+from api.routes.health_checks import health_checks_router
+
+
+async def bare_app(scope: Scope, receive: Receive, send: Send) -> None:
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def build_api_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(health_checks_router, prefix="/v1")
+    return app
+
+
+async def call_app(app: Any, scope: Dict[str, Any], requests: int) -> float:
+    """Returns the mean seconds per request."""
+
+    async def receive() -> Dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Dict[str, Any]) -> None:
+        pass
+
+    # Warm up
+    for _ in range(min(requests, 1000)):
+        await app(dict(scope), receive, send)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests
+
+
+def get_scope(app: Any, path: str) -> Dict[str, Any]:
+    return {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 9090),
+        # Set by Starlette before the middleware stack runs
+        "app": app,
+    }
+
+
+async def main(requests: int) -> None:
+    api_app = build_api_app()
+    scope = get_scope(api_app, "/v1/ping")
+
+    bare = await call_app(bare_app, scope, requests)
+    bare_instrumented = await call_app(
+        RequestMetricsMiddleware(bare_app, metrics=RequestMetrics()), scope, requests
+    )
+    api = await call_app(api_app.router, scope, requests)
+    api_instrumented = await call_app(
+        RequestMetricsMiddleware(api_app.router, metrics=RequestMetrics()),
+        scope,
+        requests,
+    )
+
+    print(f"{'app':<24}{'plain us/req':>14}{'metrics us/req':>16}{'overhead us':>14}")
+    for name, plain, instrumented in (
+        ("bare asgi", bare, bare_instrumented),
+        ("/v1/ping", api, api_instrumented),
+    ):
+        print(
+            f"{name:<24}{plain * 1e6:>14.2f}{instrumented * 1e6:>16.2f}"
+            f"{(instrumented - plain) * 1e6:>14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
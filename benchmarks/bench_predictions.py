@@ -0,0 +1,130 @@
+"""Benchmark prediction micro-batching
+Trains a model, then sends concurrent single-row requests to /v1/predict with batching
+off (a window of 0 ms) and on, and reports throughput, latency and rows per batch.
+The Api runs under uvicorn in a subprocess or in-process over ASGI.
+
+Usage:
+    $ python -m benchmarks.bench_predictions --concurrency 64 --duration 10
+    $ python -m benchmarks.bench_predictions --server inprocess --window-ms 1
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import httpx
+
+from benchmarks.load import LoadResult, run_api_server, run_load
+
+
+def get_batch_stats(metrics: str) -> Dict[str, float]:
+    stats = {}
+    for line in metrics.splitlines():
+        if line.startswith("prediction_"):
+            name, value = line.split()
+            stats[name] = float(value)
+    return stats
+
+
+def run_uvicorn(
+    env: Dict[str, str], path: str, body: Dict[str, Any], args: argparse.Namespace
+) -> Tuple[LoadResult, Dict[str, float]]:
+    with run_api_server(env=env) as base_url:
+        result = asyncio.run(
+            run_load(
+                base_url,
+                path,
+                method="POST",
+                json=body,
+                concurrency=args.concurrency,
+                duration=args.duration,
+            )
+        )
+        metrics = httpx.get(f"{base_url}/v1/metrics").text
+    return result, get_batch_stats(metrics)
+
+
+async def run_inprocess(
+    window_ms: float, path: str, body: Dict[str, Any], args: argparse.Namespace
+) -> Tuple[LoadResult, Dict[str, float]]:
+    from api.app import app
+    from api.predictions import prediction_batcher
+
+    prediction_batcher.window = window_ms / 1000
+    start_stats = prediction_batcher.stats()
+    # httpx.ASGITransport does not send lifespan events
+    await app.router.startup()
+    try:
+        result = await run_load(
+            "http://api",
+            path,
+            method="POST",
+            json=body,
+            concurrency=args.concurrency,
+            duration=args.duration,
+            transport=httpx.ASGITransport(app=app),
+        )
+    finally:
+        await app.router.shutdown()
+    stats = {
+        f"prediction_{name}_total": value - start_stats[name]
+        for name, value in prediction_batcher.stats().items()
+    }
+    return result, stats
+
+
+def print_result(window_ms: float, result: LoadResult, stats: Dict[str, float]) -> None:
+    batches = stats.get("prediction_batches_total") or 1
+    rows_per_batch = stats.get("prediction_rows_total", 0) / batches
+    mode = f"batching {'on ' if window_ms else 'off'} ({window_ms:g} ms)"
+    print(f"{mode:<24}{result.summary()} rows/batch {rows_per_batch:.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--server", choices=["uvicorn", "inprocess"], default="uvicorn")
+    parser.add_argument("--estimator", default="random_forest_classifier")
+    parser.add_argument("--dataset", default="sklearn:digits")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--window-ms", type=float, default=2)
+    args = parser.parse_args()
+
+    tmp_dir = Path(tempfile.mkdtemp())
+    env = {
+        "ARTIFACTS_URI": str(tmp_dir.joinpath("artifacts")),
+        "DB_SQLITE_PATH": str(tmp_dir.joinpath("bench.db")),
+        "SCHEDULER_ENABLED": "false",
+        "LOG_LEVEL": "WARNING",
+    }
+    # Settings are read on import, so configure them before importing jobs
+    os.environ.update(env)
+
+    from jobs.training import TrainSpec, get_dataset_hash, load_dataset, train_model
+
+    spec = TrainSpec(dataset=args.dataset, estimator=args.estimator)
+    model_id = spec.get_model_id(get_dataset_hash(spec.dataset))
+    train_model(asdict(spec), model_id, threads=1)
+    X, _ = load_dataset(spec.dataset)
+    body = {"features": X[0].tolist()}
+
+    print(
+        f"{args.estimator} on {args.dataset}, {args.concurrency} concurrent clients, "
+        f"{args.server}"
+    )
+    path = f"/v1/predict/model/{model_id}"
+    for window_ms in (0, args.window_ms):
+        if args.server == "uvicorn":
+            mode_env = {**env, "PREDICT_BATCH_WINDOW_MS": str(window_ms)}
+            result, stats = run_uvicorn(mode_env, path, body, args)
+        else:
+            result, stats = asyncio.run(run_inprocess(window_ms, path, body, args))
+        print_result(window_ms, result, stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark single vs batched job submission
+Submits jobs one at a time to /v1/run/job and in batches to /v1/run/jobs,
+against a sqlite database, and reports submissions per second.
+
+Usage:
+    $ python -m benchmarks.bench_run_jobs_batch --jobs 10000 --batch-size 1000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    # Settings are read on import, so configure them before importing the app
+    os.environ["DB_SQLITE_PATH"] = str(Path(tmp_dir).joinpath("bench.db"))
+    os.environ["JOB_QUEUE_DEPTH"] = str(2 * args.jobs)
+    os.environ["JOB_POOL_SIZE"] = "1"
+    os.environ["SCHEDULER_ENABLED"] = "false"
+
+    from fastapi.testclient import TestClient
+
+    from api.app import app
+
+    job = {"job_name": "test", "job_params": {"seconds": 0}}
+    with TestClient(app) as client:
+        start = time.perf_counter()
+        for _ in range(args.jobs):
+            client.post("/v1/run/job", json=job).raise_for_status()
+        single_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for batch_start in range(0, args.jobs, args.batch_size):
+            batch_size = min(args.batch_size, args.jobs - batch_start)
+            response = client.post("/v1/run/jobs", json={"jobs": [job] * batch_size})
+            response.raise_for_status()
+        batch_elapsed = time.perf_counter() - start
+
+    print(
+        f"single:  {args.jobs} jobs in {single_elapsed:.2f}s, {args.jobs / single_elapsed:.0f} jobs/s"
+    )
+    print(
+        f"batched: {args.jobs} jobs in {batch_elapsed:.2f}s, {args.jobs / batch_elapsed:.0f} jobs/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Benchmark Api cold start
+Measures, for `api start` (the cli) and `app start` (uvicorn api.app:app):
+1. import time, from `python -X importtime`, with the slowest imports.
+2. time from launching the process to the first successful /v1/ping.
+Exits with status 1 if the median of any measurement is over its budget,
+so it can be used as a check in CI.
+
+Usage:
+    $ python -m benchmarks.bench_startup --runs 5
+    $ python -m benchmarks.bench_startup --import-budget-ms 600 --ready-budget-ms 2500
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+
+from benchmarks.load import REPO_ROOT, get_free_port
+
+# Code run by each command before it can serve requests
+STARTUP_IMPORTS = {
+    # The cli imports uvicorn and the settings, then uvicorn imports the app
+    "api start": "import uvicorn, api.cli, api.settings, api.app",
+    "app start": "import uvicorn, api.app",
+}
+
+
+def get_server_cmd(name: str, port: int) -> List[str]:
+    if name == "api start":
+        return [sys.executable, "-c", "from api.cli import cli; cli()", "start"]
+    return [sys.executable, "-m", "uvicorn", "api.app:app", "--port", str(port)]
+
+
+def get_env(port: int) -> Dict[str, str]:
+    return {
+        **os.environ,
+        "PYTHONPATH": str(REPO_ROOT),
+        "PORT": str(port),
+        "SCHEDULER_ENABLED": "false",
+    }
+
+
+def measure_imports(code: str) -> Tuple[float, List[Tuple[float, str]]]:
+    """Returns the import time in ms and the (cumulative ms, module) of each import."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT,
+        env=get_env(0),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total_ms = 0.0
+    imports: List[Tuple[float, str]] = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, module = line.split("|")
+        imports.append((int(cumulative_us) / 1000, module.strip()))
+        # Top level imports are indented by 1 space
+        if not module.startswith("  "):
+            total_ms += int(cumulative_us) / 1000
+    return total_ms, imports
+
+
+def measure_ready(name: str, timeout: float = 60) -> float:
+    """Returns the ms from starting the server process to its first response."""
+    port = get_free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        get_server_cmd(name, port),
+        cwd=REPO_ROOT,
+        env=get_env(port),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/v1/ping", timeout=1)
+                return (time.perf_counter() - start) * 1000
+            except httpx.TransportError:
+                if proc.poll() is not None or time.perf_counter() - start > timeout:
+                    raise RuntimeError(f"{name} failed to start")
+                time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports shown")
+    parser.add_argument("--import-budget-ms", type=float, default=1000)
+    parser.add_argument("--ready-budget-ms", type=float, default=3000)
+    args = parser.parse_args()
+
+    over_budget = []
+    for name, code in STARTUP_IMPORTS.items():
+        import_runs = [measure_imports(code) for _ in range(args.runs)]
+        import_ms = statistics.median(total for total, _ in import_runs)
+        ready_ms = statistics.median(measure_ready(name) for _ in range(args.runs))
+
+        print(f"{name}")
+        print(f"  imports     {import_ms:8.0f} ms (budget {args.import_budget_ms:.0f})")
+        print(f"  first ping  {ready_ms:8.0f} ms (budget {args.ready_budget_ms:.0f})")
+        print("  slowest imports (cumulative ms):")
+        _, imports = import_runs[-1]
+        for cumulative_ms, module in sorted(imports, reverse=True)[: args.top]:
+            print(f"    {cumulative_ms:8.1f}  {module}")
+
+        if import_ms > args.import_budget_ms:
+            over_budget.append(f"{name} imports")
+        if ready_ms > args.ready_budget_ms:
+            over_budget.append(f"{name} first ping")
+
+    if over_budget:
+        print(f"Over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
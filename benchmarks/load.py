@@ -0,0 +1,144 @@
+"""Helpers for load testing the Api
+Starts the Api under uvicorn in a subprocess and drives it with concurrent clients.
+"""
+
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+
+REPO_ROOT = Path(__file__).parent.parent.resolve()
+
+
+@dataclass
+class LoadResult:
+    requests: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+
+    @property
+    def rps(self) -> float:
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, pct: float) -> float:
+        """Returns the latency percentile in milliseconds."""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[idx] * 1000
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "rps": round(self.rps, 1),
+            "p50_ms": round(self.percentile(50), 2),
+            "p90_ms": round(self.percentile(90), 2),
+            "p99_ms": round(self.percentile(99), 2),
+        }
+
+
+def get_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def run_api_server(
+    env: Optional[Dict[str, str]] = None,
+    startup_timeout: float = 30,
+    app: str = "api.app:app",
+    ready_path: str = "/v1/ping",
+) -> Iterator[str]:
+    """Runs app under uvicorn in a subprocess and yields its base url
+    once ready_path responds."""
+    port = get_free_port()
+    server_env = {**os.environ, "PYTHONPATH": str(REPO_ROOT), **(env or {})}
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            app,
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        cwd=REPO_ROOT,
+        env=server_env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            try:
+                httpx.get(f"{base_url}{ready_path}", timeout=1)
+                break
+            except httpx.TransportError:
+                if proc.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("Api server failed to start")
+                time.sleep(0.1)
+        yield base_url
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            # An overloaded server can take longer to drain its requests
+            proc.kill()
+            proc.wait()
+
+
+async def run_load(
+    base_url: str,
+    path: str,
+    method: str = "GET",
+    json: Optional[Any] = None,
+    concurrency: int = 50,
+    duration: float = 10,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> LoadResult:
+    """Sends requests from `concurrency` clients for `duration` seconds.
+
+    Pass an httpx.ASGITransport as `transport` to call an app in-process.
+    """
+    result = LoadResult()
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60, transport=transport
+    ) as client:
+        start = time.perf_counter()
+        stop_at = start + duration
+
+        async def worker() -> None:
+            while time.perf_counter() < stop_at:
+                req_start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=json)
+                    if response.status_code >= 400:
+                        result.errors += 1
+                except httpx.HTTPError:
+                    result.errors += 1
+                result.latencies.append(time.perf_counter() - req_start)
+                result.requests += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        result.elapsed = time.perf_counter() - start
+    return result
@@ -0,0 +1,44 @@
+"""Load test the sync and async database modes
+Runs /v1/status/job, which reads from job_runs, against the Api with
+DB_ASYNC=false and DB_ASYNC=true and reports throughput and latency percentiles.
+
+Usage:
+    $ python -m benchmarks.load_db_async --concurrency 500 --duration 20
+"""
+
+import argparse
+import asyncio
+import tempfile
+from pathlib import Path
+
+from benchmarks.load import run_api_server, run_load
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for db_async in ("false", "true"):
+            env = {
+                "DB_ASYNC": db_async,
+                "DB_SQLITE_PATH": str(Path(tmp_dir).joinpath(f"async_{db_async}.db")),
+            }
+            with run_api_server(env=env) as base_url:
+                result = asyncio.run(
+                    run_load(
+                        base_url,
+                        "/v1/status/job",
+                        method="POST",
+                        json={"job_name": "test"},
+                        concurrency=args.concurrency,
+                        duration=args.duration,
+                    )
+                )
+            print(f"DB_ASYNC={db_async:<5} {result.summary()}")
+
+
+if __name__ == "__main__":
+    main()
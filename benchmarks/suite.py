@@ -0,0 +1,187 @@
+"""Api benchmark suite
+Drives the ping, run, train and status endpoints at a fixed concurrency and reports
+throughput and latency percentiles for each. The Api runs against the sqlite fallback,
+either under uvicorn in a subprocess or in-process over ASGI (no network or server).
+
+Results are saved as JSON with the git commit they were run on, so runs on two commits
+can be compared.
+
+Usage:
+    $ python -m benchmarks.suite --concurrency 50 --duration 10
+    $ python -m benchmarks.suite --server inprocess --scenarios ping status
+    $ python -m benchmarks.suite --compare data/benchmarks/<old commit>-uvicorn.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.load import REPO_ROOT, LoadResult, run_api_server, run_load
+
+
+@dataclass
+class Scenario:
+    path: str
+    method: str = "GET"
+    json: Optional[Dict[str, Any]] = None
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "ping": Scenario("/v1/ping"),
+    "run": Scenario(
+        "/v1/run/job",
+        method="POST",
+        json={"job_name": "test", "job_params": {"seconds": 0}},
+    ),
+    "train": Scenario("/v1/train/job", method="POST", json={"job_name": "test"}),
+    "status": Scenario("/v1/status/job", method="POST", json={"job_name": "test"}),
+}
+
+# Results are written here by default, data/ is not committed
+RESULTS_DIR = REPO_ROOT.joinpath("data", "benchmarks")
+
+
+def get_env(db_path: Path) -> Dict[str, str]:
+    return {
+        "DB_SQLITE_PATH": str(db_path),
+        # The run scenario should measure the api, not the job queue filling up
+        "JOB_QUEUE_DEPTH": "1000000",
+        "SCHEDULER_ENABLED": "false",
+        "LOG_LEVEL": "WARNING",
+    }
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run_scenarios(
+    base_url: str,
+    scenarios: List[str],
+    concurrency: int,
+    duration: float,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> Dict[str, LoadResult]:
+    results = {}
+    for name in scenarios:
+        scenario = SCENARIOS[name]
+        results[name] = await run_load(
+            base_url,
+            scenario.path,
+            method=scenario.method,
+            json=scenario.json,
+            concurrency=concurrency,
+            duration=duration,
+            transport=transport,
+        )
+    return results
+
+
+async def run_inprocess(
+    env: Dict[str, str], scenarios: List[str], concurrency: int, duration: float
+) -> Dict[str, LoadResult]:
+    # Settings are read when api.app is first imported
+    os.environ.update(env)
+    from api.app import app
+
+    # httpx.ASGITransport does not send lifespan events
+    await app.router.startup()
+    try:
+        return await run_scenarios(
+            "http://api",
+            scenarios,
+            concurrency,
+            duration,
+            transport=httpx.ASGITransport(app=app),
+        )
+    finally:
+        await app.router.shutdown()
+
+
+def print_comparison(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    print(
+        f"\nCompared to {baseline['commit']} ({baseline['server']}, "
+        f"concurrency {baseline['concurrency']}):"
+    )
+    print(f"{'scenario':<10}{'rps':>22}{'p50 ms':>22}{'p99 ms':>22}")
+    for name, summary in results["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if old is None:
+            continue
+        row = f"{name:<10}"
+        for key in ("rps", "p50_ms", "p99_ms"):
+            change = (summary[key] / old[key] - 1) * 100 if old[key] else 0.0
+            row += f"{old[key]:>9.1f} -> {summary[key]:>7.1f} {change:+4.0f}%"
+        print(row)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--server", choices=["uvicorn", "inprocess"], default="uvicorn")
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--output", type=Path, help="Defaults to data/benchmarks/")
+    parser.add_argument("--compare", type=Path, help="Results of an earlier run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = get_env(Path(tmp_dir).joinpath("benchmark.db"))
+        if args.server == "uvicorn":
+            with run_api_server(env=env) as base_url:
+                load_results = asyncio.run(
+                    run_scenarios(
+                        base_url, args.scenarios, args.concurrency, args.duration
+                    )
+                )
+        else:
+            load_results = asyncio.run(
+                run_inprocess(env, args.scenarios, args.concurrency, args.duration)
+            )
+
+    commit = get_commit()
+    results = {
+        "commit": commit,
+        "utc": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "server": args.server,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "scenarios": {name: r.summary() for name, r in load_results.items()},
+    }
+    for name, summary in results["scenarios"].items():
+        print(f"{name:<10}{summary}")
+
+    output = args.output or RESULTS_DIR.joinpath(f"{commit}-{args.server}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Saved results to {output}")
+
+    if args.compare is not None:
+        print_comparison(results, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from db.tables.job_leases import JobLeases
+from utils.dttm import current_utc
+
+
+def acquire_lease(db: Session, lease_name: str, owner: str, ttl: float) -> bool:
+    """Acquires or renews a lease for `ttl` seconds.
+
+    Returns True if `owner` holds the lease. The lease is taken over if it has
+    expired; the update and insert are atomic, so only one owner can win.
+    """
+    now = current_utc().replace(tzinfo=None)
+    expires_ts = now + timedelta(seconds=ttl)
+    result = db.execute(
+        update(JobLeases)
+        .where(JobLeases.lease_name == lease_name)
+        .where(or_(JobLeases.owner == owner, JobLeases.expires_ts < now))
+        .values(owner=owner, expires_ts=expires_ts)
+    )
+    if result.rowcount == 1:
+        db.commit()
+        return True
+
+    try:
+        db.add(JobLeases(lease_name=lease_name, owner=owner, expires_ts=expires_ts))
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+    # The lease exists. MySQL reports 0 updated rows when the renewed expiry is
+    # unchanged (DATETIME has second precision), so check who holds it.
+    current_owner = db.execute(
+        select(JobLeases.owner).where(JobLeases.lease_name == lease_name)
+    ).scalar()
+    return current_owner == owner
+
+
+def release_lease(db: Session, lease_name: str, owner: str) -> None:
+    """Releases a lease held by `owner` so another owner can take it right away."""
+    db.execute(
+        update(JobLeases)
+        .where(JobLeases.lease_name == lease_name)
+        .where(JobLeases.owner == owner)
+        .values(expires_ts=current_utc().replace(tzinfo=None))
+    )
+    db.commit()
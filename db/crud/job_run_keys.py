@@ -0,0 +1,129 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from db.tables.job_run_keys import JobRunKeys
+from db.tables.job_runs import JobRuns
+from jobs.status import job_run_status
+from utils.dttm import current_utc
+
+# Statuses of runs that coalesce keys attach requests to
+ACTIVE_STATUSES = {job_run_status.QUEUED, job_run_status.RUNNING}
+
+
+@dataclass
+class JobRunClaim:
+    id_job_run: int
+    status: str
+    # True if the run was created for this claim, False if it already held the key
+    created: bool
+    # params_hash stored with the key
+    params_hash: Optional[str] = None
+
+
+def _can_take_over(
+    kind: str, status: Optional[str], expires_ts: datetime, now: datetime
+) -> bool:
+    # Runs moved to the archive are no longer in job_runs and have no status
+    if status is None or expires_ts < now:
+        return True
+    return kind == "coalesce" and status not in ACTIVE_STATUSES
+
+
+def claim_job_run(
+    db: Session,
+    run_key: str,
+    kind: str,
+    job_name: str,
+    ttl: float,
+    params_hash: Optional[str] = None,
+    attempts: int = 3,
+) -> JobRunClaim:
+    """Creates a queued run for job_name that holds run_key, or returns the run
+    that already holds it.
+
+    The run and its key are inserted in one transaction, and the primary key of
+    job_run_keys rejects a second run for the same key, also from other replicas.
+    A key is taken over, using a compare-and-set on its run, once it expires, or
+    for "coalesce" keys once its run ends.
+    """
+    for _ in range(attempts):
+        now = current_utc().replace(tzinfo=None)
+        expires_ts = now + timedelta(seconds=ttl)
+        job_run = JobRuns(job_name=job_name, status=job_run_status.QUEUED)
+        db.add(job_run)
+        db.flush()
+        db.add(JobRunKeys(run_key, job_run.id_job_run, kind, expires_ts, params_hash))
+        try:
+            db.commit()
+            return JobRunClaim(
+                job_run.id_job_run, job_run_status.QUEUED, True, params_hash
+            )
+        except IntegrityError:
+            db.rollback()
+
+        existing = db.execute(
+            select(
+                JobRunKeys.id_job_run,
+                JobRunKeys.kind,
+                JobRunKeys.expires_ts,
+                JobRunKeys.params_hash,
+                JobRuns.status,
+            )
+            .outerjoin(JobRuns, JobRuns.id_job_run == JobRunKeys.id_job_run)
+            .where(JobRunKeys.run_key == run_key)
+        ).first()
+        if existing is None:
+            # The key was deleted since the insert, try again
+            continue
+        if not _can_take_over(existing.kind, existing.status, existing.expires_ts, now):
+            db.commit()
+            return JobRunClaim(
+                existing.id_job_run, existing.status, False, existing.params_hash
+            )
+
+        job_run = JobRuns(job_name=job_name, status=job_run_status.QUEUED)
+        db.add(job_run)
+        db.flush()
+        result = db.execute(
+            update(JobRunKeys)
+            .where(JobRunKeys.run_key == run_key)
+            .where(JobRunKeys.id_job_run == existing.id_job_run)
+            .values(
+                id_job_run=job_run.id_job_run,
+                kind=kind,
+                expires_ts=expires_ts,
+                params_hash=params_hash,
+            )
+        )
+        if result.rowcount == 1:
+            db.commit()
+            return JobRunClaim(
+                job_run.id_job_run, job_run_status.QUEUED, True, params_hash
+            )
+        # Another request took the key over first, the next attempt attaches to
+        # its run
+        db.rollback()
+    raise RuntimeError(f"Could not claim job run key {run_key}")
+
+
+def release_job_run_key(db: Session, run_key: str, id_job_run: int) -> None:
+    """Deletes run_key if id_job_run still holds it, e.g. when the run could not
+    be started, so the next request creates a new run."""
+    db.execute(
+        delete(JobRunKeys)
+        .where(JobRunKeys.run_key == run_key)
+        .where(JobRunKeys.id_job_run == id_job_run)
+    )
+    db.commit()
+
+
+def delete_expired_job_run_keys(db: Session, before: datetime) -> int:
+    """Deletes keys that expired before `before`. Returns the number deleted."""
+    result = db.execute(delete(JobRunKeys).where(JobRunKeys.expires_ts < before))
+    db.commit()
+    return result.rowcount
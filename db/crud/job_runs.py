@@ -0,0 +1,232 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from db.tables.job_runs import JobRuns
+from jobs.status import job_run_status
+from utils.dttm import as_naive_utc, current_utc
+
+
+def get_latest_job_run(db: Session, job_name: str) -> Optional[JobRuns]:
+    """Returns the most recent run for job_name, or None if the job has never run."""
+    stmt = (
+        select(JobRuns)
+        .where(JobRuns.job_name == job_name)
+        .order_by(JobRuns.start_ts.desc(), JobRuns.id_job_run.desc())
+        .limit(1)
+    )
+    return db.execute(stmt).scalars().first()
+
+
+def get_last_scheduled_ts(db: Session, job_name: str) -> Optional[datetime]:
+    """Returns the latest time job_name was scheduled for, or None."""
+    return db.execute(
+        select(func.max(JobRuns.scheduled_ts)).where(JobRuns.job_name == job_name)
+    ).scalar()
+
+
+def create_job_run(
+    db: Session,
+    job_name: str,
+    status: str,
+    scheduled_ts: Optional[datetime] = None,
+    id_parent_job_run: Optional[int] = None,
+) -> int:
+    """Inserts a run for job_name and returns its id_job_run."""
+    job_run = JobRuns(
+        job_name=job_name,
+        status=status,
+        scheduled_ts=scheduled_ts,
+        id_parent_job_run=id_parent_job_run,
+    )
+    db.add(job_run)
+    db.commit()
+    return job_run.id_job_run
+
+
+def create_job_runs(
+    db: Session,
+    job_names: List[str],
+    status: str,
+    id_parent_job_run: Optional[int] = None,
+) -> List[int]:
+    """Inserts a run for each job name using one multi-row insert.
+
+    Returns the id_job_run of each run, in the order of job_names.
+    MySQL cannot return the ids of a multi-row insert, so the rows are tagged
+    with a batch_id and read back.
+    """
+    if not job_names:
+        return []
+    batch_id = uuid4().hex
+    now = current_utc()
+    db.execute(
+        insert(JobRuns.__table__),
+        [
+            {
+                "job_name": job_name,
+                "status": status,
+                "start_ts": now,
+                "update_ts": now,
+                "batch_id": batch_id,
+                "id_parent_job_run": id_parent_job_run,
+            }
+            for job_name in job_names
+        ],
+    )
+    ids = (
+        db.execute(
+            select(JobRuns.id_job_run)
+            .where(JobRuns.batch_id == batch_id)
+            .order_by(JobRuns.id_job_run)
+        )
+        .scalars()
+        .all()
+    )
+    db.commit()
+    return list(ids)
+
+
+def update_job_run_status(
+    db: Session, id_job_run: int, status: str, ended: bool = False
+) -> None:
+    """Sets the status of a run. If ended is True, also sets its end_ts."""
+    update_job_runs_status(db, [id_job_run], status, ended=ended)
+
+
+def update_job_runs_status(
+    db: Session, ids: List[int], status: str, ended: bool = False
+) -> None:
+    """Sets the status of several runs using one update. Runs set to running
+    also get their run_ts."""
+    now = current_utc()
+    values: Dict[str, Any] = {"status": status, "update_ts": now}
+    if status == job_run_status.RUNNING:
+        values["run_ts"] = now
+    if ended:
+        values["end_ts"] = now
+    db.execute(update(JobRuns).where(JobRuns.id_job_run.in_(ids)).values(**values))
+    db.commit()
+
+
+def update_job_run_progress(
+    db: Session, id_job_run: int, done: int, total: Optional[int] = None
+) -> None:
+    """Records the items a run has processed, out of total."""
+    db.execute(
+        update(JobRuns)
+        .where(JobRuns.id_job_run == id_job_run)
+        .values(progress_done=done, progress_total=total, update_ts=current_utc())
+    )
+    db.commit()
+
+
+def get_finished_job_runs_before(
+    db: Session, cutoff: datetime, limit: int
+) -> List[Dict[str, Any]]:
+    """Returns up to `limit` finished runs that started before cutoff, as dicts."""
+    stmt = (
+        select(JobRuns.__table__)
+        .where(JobRuns.start_ts < cutoff)
+        .where(
+            JobRuns.status.in_(
+                [job_run_status.SUCCESS, job_run_status.FAILED, job_run_status.PRUNED]
+            )
+        )
+        .order_by(JobRuns.id_job_run)
+        .limit(limit)
+    )
+    return [dict(row) for row in db.execute(stmt).mappings()]
+
+
+def get_child_job_runs(db: Session, id_parent_job_run: int) -> List[JobRuns]:
+    """Returns the runs started by a run, in the order they were created."""
+    stmt = (
+        select(JobRuns)
+        .where(JobRuns.id_parent_job_run == id_parent_job_run)
+        .order_by(JobRuns.id_job_run)
+    )
+    return list(db.execute(stmt).scalars().all())
+
+
+def get_job_run_states(db: Session, ids: List[int]) -> List[Dict[str, Any]]:
+    """Returns the status and progress of runs, as dicts."""
+    stmt = select(
+        JobRuns.id_job_run,
+        JobRuns.job_name,
+        JobRuns.status,
+        JobRuns.progress_done,
+        JobRuns.progress_total,
+    ).where(JobRuns.id_job_run.in_(ids))
+    return [dict(row) for row in db.execute(stmt).mappings()]
+
+
+def delete_job_runs(db: Session, ids: List[int]) -> None:
+    db.execute(delete(JobRuns).where(JobRuns.id_job_run.in_(ids)))
+    db.commit()
+
+
+def get_job_runs_updated_since(
+    db: Session,
+    columns: List[str],
+    since: Optional[datetime],
+    after_id: int,
+    limit: int,
+) -> List[Dict[str, Any]]:
+    """Returns up to `limit` runs ordered by (update_ts, id_job_run), as dicts.
+
+    Rows are read after the keyset (since, after_id); if since is None, from the start.
+    """
+    table = JobRuns.__table__
+    stmt = select(*(table.c[name] for name in columns))
+    if since is not None:
+        since = as_naive_utc(since)
+        stmt = stmt.where(
+            or_(
+                JobRuns.update_ts > since,
+                and_(JobRuns.update_ts == since, JobRuns.id_job_run > after_id),
+            )
+        )
+    stmt = stmt.order_by(JobRuns.update_ts, JobRuns.id_job_run).limit(limit)
+    return [dict(row) for row in db.execute(stmt).mappings()]
+
+
+def list_job_runs(
+    db: Session,
+    columns: List[str],
+    limit: int,
+    job_name: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    before: Optional[Tuple[datetime, int]] = None,
+) -> List[Dict[str, Any]]:
+    """Returns up to `limit` runs started in [since, until), newest first, as dicts.
+
+    Runs are ordered by (start_ts, id_job_run) descending and read after the keyset
+    `before`, so each page is an index range scan however deep it is. Timestamps
+    with a timezone are converted to UTC, the timezone of the stored ones.
+    """
+    table = JobRuns.__table__
+    stmt = select(*(table.c[name] for name in columns))
+    if job_name is not None:
+        stmt = stmt.where(JobRuns.job_name == job_name)
+    if status is not None:
+        stmt = stmt.where(JobRuns.status == status)
+    if since is not None:
+        stmt = stmt.where(JobRuns.start_ts >= as_naive_utc(since))
+    if until is not None:
+        stmt = stmt.where(JobRuns.start_ts < as_naive_utc(until))
+    if before is not None:
+        before_ts, before_id = as_naive_utc(before[0]), before[1]
+        # The first condition bounds the index range, the second skips the runs
+        # already returned that share before_ts
+        stmt = stmt.where(
+            JobRuns.start_ts <= before_ts,
+            or_(JobRuns.start_ts < before_ts, JobRuns.id_job_run < before_id),
+        )
+    stmt = stmt.order_by(JobRuns.start_ts.desc(), JobRuns.id_job_run.desc())
+    return [dict(row) for row in db.execute(stmt.limit(limit)).mappings()]
@@ -0,0 +1,34 @@
+"""Add job_runs id_parent_job_run
+
+Revision ID: 3b7e9c1d5a28
+Revises: e81b3f5c2a96
+Create Date: 2026-10-18 20:11:52.408316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "3b7e9c1d5a28"
+down_revision = "e81b3f5c2a96"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "job_runs",
+        sa.Column("id_parent_job_run", sa.BigInteger(), nullable=True),
+    )
+    op.create_index(
+        op.f("ix_job_runs_id_parent_job_run"),
+        "job_runs",
+        ["id_parent_job_run"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_job_runs_id_parent_job_run"), table_name="job_runs")
+    op.drop_column("job_runs", "id_parent_job_run")
@@ -0,0 +1,30 @@
+"""Add job_runs job_name, start_ts index
+
+Revision ID: 433a692c13b8
+Revises: 886779e081d2
+Create Date: 2026-10-18 10:03:17.552830
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "433a692c13b8"
+down_revision = "886779e081d2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # job_name is a TEXT column, so MySQL needs a prefix length to index it
+    op.create_index(
+        "ix_job_runs_job_name_start_ts",
+        "job_runs",
+        ["job_name", "start_ts"],
+        unique=False,
+        mysql_length={"job_name": 255},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_job_runs_job_name_start_ts", table_name="job_runs")
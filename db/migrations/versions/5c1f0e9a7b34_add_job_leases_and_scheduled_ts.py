@@ -0,0 +1,32 @@
+"""Add job_leases and job_runs scheduled_ts
+
+Revision ID: 5c1f0e9a7b34
+Revises: 433a692c13b8
+Create Date: 2026-10-18 11:24:50.918204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5c1f0e9a7b34"
+down_revision = "433a692c13b8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "job_leases",
+        sa.Column("lease_name", sa.String(length=128), nullable=False),
+        sa.Column("owner", sa.String(length=255), nullable=False),
+        sa.Column("expires_ts", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("lease_name", name=op.f("pk_job_leases")),
+    )
+    op.add_column("job_runs", sa.Column("scheduled_ts", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("job_runs", "scheduled_ts")
+    op.drop_table("job_leases")
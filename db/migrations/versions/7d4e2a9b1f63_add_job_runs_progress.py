@@ -0,0 +1,26 @@
+"""Add job_runs progress
+
+Revision ID: 7d4e2a9b1f63
+Revises: 3b7e9c1d5a28
+Create Date: 2026-10-18 21:32:05.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "7d4e2a9b1f63"
+down_revision = "3b7e9c1d5a28"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("job_runs", sa.Column("progress_done", sa.Integer(), nullable=True))
+    op.add_column("job_runs", sa.Column("progress_total", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("job_runs", "progress_total")
+    op.drop_column("job_runs", "progress_done")
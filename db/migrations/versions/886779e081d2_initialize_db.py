@@ -0,0 +1,47 @@
+"""Initialize DB
+
+Revision ID: 886779e081d2
+Revises:
+Create Date: 2026-10-18 09:12:41.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "886779e081d2"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "job_runs",
+        sa.Column(
+            "id_job_run",
+            sa.BigInteger().with_variant(sa.Integer(), "sqlite"),
+            autoincrement=True,
+            nullable=False,
+        ),
+        sa.Column("job_name", sa.Text(), nullable=False),
+        sa.Column("status", sa.String(length=128), nullable=False),
+        sa.Column("start_ts", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("update_ts", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("end_ts", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id_job_run", name=op.f("pk_job_runs")),
+    )
+    op.create_index(
+        op.f("ix_job_runs_id_job_run"),
+        "job_runs",
+        ["id_job_run"],
+        unique=False,
+    )
+    op.create_index(op.f("ix_job_runs_status"), "job_runs", ["status"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_job_runs_status"), table_name="job_runs")
+    op.drop_index(op.f("ix_job_runs_id_job_run"), table_name="job_runs")
+    op.drop_table("job_runs")
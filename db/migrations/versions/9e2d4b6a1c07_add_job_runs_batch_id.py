@@ -0,0 +1,30 @@
+"""Add job_runs batch_id
+
+Revision ID: 9e2d4b6a1c07
+Revises: 5c1f0e9a7b34
+Create Date: 2026-10-18 13:02:11.337120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9e2d4b6a1c07"
+down_revision = "5c1f0e9a7b34"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "job_runs", sa.Column("batch_id", sa.String(length=32), nullable=True)
+    )
+    op.create_index(
+        op.f("ix_job_runs_batch_id"), "job_runs", ["batch_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_job_runs_batch_id"), table_name="job_runs")
+    op.drop_column("job_runs", "batch_id")
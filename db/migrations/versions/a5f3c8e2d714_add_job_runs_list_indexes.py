@@ -0,0 +1,35 @@
+"""Add job_runs start_ts, id_job_run and status, start_ts, id_job_run indexes
+
+Revision ID: a5f3c8e2d714
+Revises: 7d4e2a9b1f63
+Create Date: 2026-10-18 23:12:40.381562
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "a5f3c8e2d714"
+down_revision = "7d4e2a9b1f63"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_job_runs_start_ts_id_job_run",
+        "job_runs",
+        ["start_ts", "id_job_run"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_job_runs_status_start_ts_id_job_run",
+        "job_runs",
+        ["status", "start_ts", "id_job_run"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_job_runs_status_start_ts_id_job_run", table_name="job_runs")
+    op.drop_index("ix_job_runs_start_ts_id_job_run", table_name="job_runs")
@@ -0,0 +1,26 @@
+"""Add job_run_keys params_hash
+
+Revision ID: b6d2e8f4a193
+Revises: f3a7c1e9b482
+Create Date: 2026-10-18 23:31:12.640385
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b6d2e8f4a193"
+down_revision = "f3a7c1e9b482"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "job_run_keys", sa.Column("params_hash", sa.String(length=64), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("job_run_keys", "params_hash")
@@ -0,0 +1,71 @@
+"""Partition job_runs by start_ts
+
+Revision ID: c47a1d2e8f90
+Revises: 9e2d4b6a1c07
+Create Date: 2026-10-18 14:40:02.105937
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+from db.partitions import FUTURE_PARTITION, add_months, monthly_partition_name
+
+
+# revision identifiers, used by Alembic.
+revision = "c47a1d2e8f90"
+down_revision = "9e2d4b6a1c07"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The partitioning column must be NOT NULL and part of the primary key
+    with op.batch_alter_table("job_runs") as batch_op:
+        batch_op.alter_column(
+            "start_ts",
+            existing_type=sa.DateTime(timezone=True),
+            nullable=False,
+        )
+
+    # sqlite has no partitioning. Archived runs are sharded by date instead.
+    if op.get_context().dialect.name != "mysql":
+        return
+
+    op.execute(
+        "ALTER TABLE job_runs DROP PRIMARY KEY, "
+        "ADD PRIMARY KEY (id_job_run, start_ts)"
+    )
+    # Rows before this month go into p_history, later months get a partition each.
+    # New monthly partitions are split off p_future by the archive job.
+    this_month = add_months(date.today(), 0)
+    partitions = [
+        f"PARTITION p_history VALUES LESS THAN (TO_DAYS('{this_month:%Y-%m-%d}'))"
+    ]
+    for offset in range(2):
+        month_start = add_months(this_month, offset)
+        partitions.append(
+            f"PARTITION {monthly_partition_name(month_start)} VALUES LESS THAN "
+            f"(TO_DAYS('{add_months(month_start, 1):%Y-%m-%d}'))"
+        )
+    partitions.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE")
+    op.execute(
+        "ALTER TABLE job_runs PARTITION BY RANGE (TO_DAYS(start_ts)) "
+        f"({', '.join(partitions)})"
+    )
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name == "mysql":
+        op.execute("ALTER TABLE job_runs REMOVE PARTITIONING")
+        op.execute(
+            "ALTER TABLE job_runs DROP PRIMARY KEY, " "ADD PRIMARY KEY (id_job_run)"
+        )
+
+    with op.batch_alter_table("job_runs") as batch_op:
+        batch_op.alter_column(
+            "start_ts",
+            existing_type=sa.DateTime(timezone=True),
+            nullable=True,
+        )
@@ -0,0 +1,38 @@
+"""Add job_run_keys
+
+Revision ID: d92b6f4a0c35
+Revises: a5f3c8e2d714
+Create Date: 2026-10-18 23:58:21.604317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d92b6f4a0c35"
+down_revision = "a5f3c8e2d714"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "job_run_keys",
+        sa.Column("run_key", sa.String(length=64), nullable=False),
+        sa.Column("id_job_run", sa.BigInteger(), nullable=False),
+        sa.Column("kind", sa.String(length=16), nullable=False),
+        sa.Column("expires_ts", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("run_key", name=op.f("pk_job_run_keys")),
+    )
+    op.create_index(
+        op.f("ix_job_run_keys_expires_ts"),
+        "job_run_keys",
+        ["expires_ts"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_job_run_keys_expires_ts"), table_name="job_run_keys")
+    op.drop_table("job_run_keys")
@@ -0,0 +1,28 @@
+"""Add job_runs update_ts, id_job_run index
+
+Revision ID: e81b3f5c2a96
+Revises: c47a1d2e8f90
+Create Date: 2026-10-18 15:31:44.672019
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "e81b3f5c2a96"
+down_revision = "c47a1d2e8f90"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_job_runs_update_ts_id_job_run",
+        "job_runs",
+        ["update_ts", "id_job_run"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_job_runs_update_ts_id_job_run", table_name="job_runs")
@@ -0,0 +1,24 @@
+"""Add job_runs run_ts
+
+Revision ID: f3a7c1e9b482
+Revises: d92b6f4a0c35
+Create Date: 2026-10-18 23:05:41.372916
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "f3a7c1e9b482"
+down_revision = "d92b6f4a0c35"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("job_runs", sa.Column("run_ts", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("job_runs", "run_ts")
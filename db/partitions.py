@@ -0,0 +1,102 @@
+from datetime import date
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from utils.log import logger
+
+# Tables partitioned by month using RANGE (TO_DAYS(<column>)) on MySQL.
+# The last partition is always p_future, which holds everything after the monthly partitions.
+FUTURE_PARTITION = "p_future"
+
+
+def add_months(day: date, months: int) -> date:
+    month_index = day.month - 1 + months
+    return date(day.year + month_index // 12, month_index % 12 + 1, 1)
+
+
+def monthly_partition_name(month_start: date) -> str:
+    return f"p{month_start:%Y%m}"
+
+
+def get_partition_names(db: Session, table_name: str) -> List[str]:
+    """Returns the partitions of a table in order. Empty if it is not partitioned."""
+    if db.get_bind().dialect.name != "mysql":
+        return []
+    rows = db.execute(
+        text(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name "
+            "AND PARTITION_NAME IS NOT NULL ORDER BY PARTITION_ORDINAL_POSITION"
+        ),
+        {"table_name": table_name},
+    )
+    return [row[0] for row in rows]
+
+
+def ensure_monthly_partitions(
+    db: Session, table_name: str, today: date, months_ahead: int
+) -> List[str]:
+    """Splits p_future so there is a partition for each month up to `months_ahead`.
+
+    Only runs on MySQL. Returns the names of the partitions created.
+    """
+    partitions = get_partition_names(db, table_name)
+    if FUTURE_PARTITION not in partitions:
+        return []
+
+    new_partitions: List[str] = []
+    partition_defs: List[str] = []
+    for offset in range(months_ahead + 1):
+        month_start = add_months(today, offset)
+        name = monthly_partition_name(month_start)
+        if name in partitions:
+            continue
+        new_partitions.append(name)
+        partition_defs.append(
+            f"PARTITION {name} VALUES LESS THAN "
+            f"(TO_DAYS('{add_months(month_start, 1):%Y-%m-%d}'))"
+        )
+    if not partition_defs:
+        return []
+
+    partition_defs.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE")
+    db.execute(
+        text(
+            f"ALTER TABLE {table_name} REORGANIZE PARTITION {FUTURE_PARTITION} "
+            f"INTO ({', '.join(partition_defs)})"
+        )
+    )
+    logger.info(f"Added partitions to {table_name}: {new_partitions}")
+    return new_partitions
+
+
+def drop_empty_partitions_before(
+    db: Session, table_name: str, cutoff: date
+) -> List[str]:
+    """Drops empty monthly partitions that end on or before `cutoff`.
+
+    Only runs on MySQL. Dropping a partition is a metadata change, unlike
+    deleting its rows. Returns the names of the partitions dropped.
+    """
+    dropped: List[str] = []
+    for name in get_partition_names(db, table_name):
+        if name == FUTURE_PARTITION or not name[1:].isdigit():
+            continue
+        month_start = date(int(name[1:5]), int(name[5:7]), 1)
+        if add_months(month_start, 1) > cutoff:
+            continue
+        # Partitions can still hold unfinished runs
+        is_empty = (
+            db.execute(
+                text(f"SELECT 1 FROM {table_name} PARTITION ({name}) LIMIT 1")
+            ).first()
+            is None
+        )
+        if is_empty:
+            db.execute(text(f"ALTER TABLE {table_name} DROP PARTITION {name}"))
+            dropped.append(name)
+    if dropped:
+        logger.info(f"Dropped partitions from {table_name}: {dropped}")
+    return dropped
@@ -0,0 +1,157 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Number of recent checkout wait times kept to compute percentiles
+WAIT_TIME_SAMPLES = 1000
+
+
+class PoolMetrics:
+    """Counters for a connection pool, gathered from SQLAlchemy pool events.
+
+    Checkout wait times and timeouts are recorded by the TimedQueuePool, because
+    pool events only fire once a connection has been handed out.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.connections_created = 0
+        self.connections_invalidated = 0
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self._wait_times: Deque[float] = deque(maxlen=WAIT_TIME_SAMPLES)
+        self._lock = threading.Lock()
+
+    def record_wait(self, wait_time: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.checkout_timeouts += 1
+            self.wait_time_total += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+            self._wait_times.append(wait_time)
+
+    def on_connect(self, dbapi_connection: Any, connection_record: Any) -> None:
+        with self._lock:
+            self.connections_created += 1
+
+    def on_checkout(
+        self, dbapi_connection: Any, connection_record: Any, connection_proxy: Any
+    ) -> None:
+        with self._lock:
+            self.checkouts += 1
+
+    def on_invalidate(
+        self, dbapi_connection: Any, connection_record: Any, exception: Any
+    ) -> None:
+        with self._lock:
+            self.connections_invalidated += 1
+
+    def wait_time_percentile(self, percentile: float) -> Optional[float]:
+        with self._lock:
+            wait_times = sorted(self._wait_times)
+        if not wait_times:
+            return None
+        index = min(len(wait_times) - 1, int(len(wait_times) * percentile / 100))
+        return wait_times[index]
+
+    def snapshot(self, engine: Engine) -> Dict[str, Any]:
+        """Returns the counters and the current state of the engine's pool."""
+        pool = engine.pool
+        stats: Dict[str, Any] = {
+            "name": self.name,
+            "pool_class": type(pool).__name__,
+            "connections_created": self.connections_created,
+            "connections_invalidated": self.connections_invalidated,
+            "checkouts": self.checkouts,
+            "checkout_timeouts": self.checkout_timeouts,
+            "wait_time_total_s": self.wait_time_total,
+            "wait_time_max_s": self.wait_time_max,
+            "wait_time_p50_s": self.wait_time_percentile(50),
+            "wait_time_p99_s": self.wait_time_percentile(99),
+        }
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=max(pool.overflow(), 0),
+                max_overflow=pool._max_overflow,
+            )
+        return stats
+
+
+class TimedPoolMixin:
+    """Records how long each checkout waits for a connection."""
+
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self) -> Any:
+        if self.metrics is None:
+            return super()._do_get()  # type: ignore
+        start = time.perf_counter()
+        try:
+            connection_record = super()._do_get()  # type: ignore
+        except exc.TimeoutError:
+            self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - start)
+        return connection_record
+
+    def recreate(self) -> Any:
+        # Engine.dispose() replaces the pool, keep recording to the same metrics
+        pool = super().recreate()  # type: ignore
+        pool.metrics = self.metrics
+        return pool
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def track_pool_metrics(engine: Engine, name: str) -> PoolMetrics:
+    """Starts gathering PoolMetrics for a sync engine, or an AsyncEngine.sync_engine."""
+    metrics = PoolMetrics(name)
+    if isinstance(engine.pool, TimedPoolMixin):
+        engine.pool.metrics = metrics
+    event.listen(engine, "connect", metrics.on_connect)
+    event.listen(engine, "checkout", metrics.on_checkout)
+    event.listen(engine, "invalidate", metrics.on_invalidate)
+    return metrics
+
+
+def ping_idle_connections(engine: Engine, idle_seconds: float) -> None:
+    """Pings connections that were idle in the pool for longer than idle_seconds.
+
+    This is a cheaper alternative to pool_pre_ping, which pings on every checkout.
+    A failed ping discards the connection and the pool retries with a new one.
+    """
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection: Any, connection_record: Any) -> None:
+        connection_record.info["checkin_time"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(
+        dbapi_connection: Any, connection_record: Any, connection_proxy: Any
+    ) -> None:
+        checkin_time = connection_record.info.get("checkin_time")
+        if checkin_time is None or time.monotonic() - checkin_time < idle_seconds:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception as e:
+            raise exc.DisconnectionError(f"Idle connection failed ping: {e}")
+        finally:
+            cursor.close()
@@ -0,0 +1,257 @@
+import threading
+from typing import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from sqlalchemy.engine import Engine, create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.concurrency import run_in_threadpool
+
+from api.settings import api_settings
+from db.pool import (
+    PoolMetrics,
+    TimedAsyncAdaptedQueuePool,
+    TimedQueuePool,
+    ping_idle_connections,
+    track_pool_metrics,
+)
+from db.tables import BaseTable
+from utils.log import logger
+
+T = TypeVar("T")
+
+
+def is_sqlite_memory_uri(uri: str) -> bool:
+    return uri in ("sqlite://", "sqlite+aiosqlite://")
+
+
+def get_pool_options(pool_size: int, max_overflow: int) -> Dict[str, Any]:
+    """Returns the create_engine() pool arguments from ApiSettings."""
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": api_settings.db_pool_timeout,
+        "pool_recycle": api_settings.db_pool_recycle,
+        "pool_pre_ping": api_settings.db_pool_pre_ping == "always",
+    }
+
+
+def create_db_engine(uri: str, pool_size: int, max_overflow: int) -> Engine:
+    if is_sqlite_memory_uri(uri):
+        # The in-memory sqlite database only lives as long as its connection,
+        # so share a single connection across threads.
+        return create_engine(
+            uri,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+
+    connect_args = {}
+    if uri.startswith("sqlite"):
+        # Sessions may be used and closed on different threadpool threads
+        connect_args["check_same_thread"] = False
+    engine = create_engine(
+        uri,
+        connect_args=connect_args,
+        poolclass=TimedQueuePool,
+        **get_pool_options(pool_size, max_overflow),
+    )
+    if api_settings.db_pool_pre_ping == "idle":
+        ping_idle_connections(engine, api_settings.db_pool_ping_idle_seconds)
+    return engine
+
+
+# Create 2 types of database sessions:
+# 1. db_session: used for background tasks
+# 2. SessionLocal: used to create a session for each request that needs one
+# db_session is a scoped session which means it is created on first access per thread
+# This is used by background tasks and long-running processes
+# Both are bound to their engines by init_db_engines().
+db_session: Session = scoped_session(
+    sessionmaker(autocommit=False, autoflush=False)
+)  # type: ignore # noqa
+
+# SessionLocal creates a new session for each request that depends on get_db()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+# AsyncSessionLocal creates AsyncSessions for requests when db_async is True
+AsyncSessionLocal = sessionmaker(
+    class_=AsyncSession,
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# SQLAlchemy Engines, created by init_db_engines()
+# 1. db_engine: used for api requests
+# 2. db_background_engine: used for background tasks, with its own pool
+# 3. async_db_engine: used for api requests when db_async is True
+db_engine: Optional[Engine] = None
+db_background_engine: Optional[Engine] = None
+async_db_engine: Optional[AsyncEngine] = None
+
+# Pool metrics for each engine, reported by the /v1/health/db endpoint
+db_pool_metrics: Dict[str, Tuple[Engine, PoolMetrics]] = {}
+_init_lock = threading.Lock()
+
+
+def init_db_engines() -> None:
+    """Creates the engines and binds the session factories to them.
+
+    Engines are created on app startup rather than on import, so importing the app
+    (e.g. when a new replica starts) does not pay for them. Scripts and job worker
+    processes call this before using db_session. Safe to call more than once.
+    """
+    global db_engine, db_background_engine, async_db_engine
+
+    if db_engine is not None:
+        return
+    with _init_lock:
+        if db_engine is not None:
+            return
+
+        db_uri = api_settings.get_db_uri()
+        engine = create_db_engine(
+            db_uri, api_settings.db_pool_size, api_settings.db_max_overflow
+        )
+        db_pool_metrics["api"] = (engine, track_pool_metrics(engine, "api"))
+        if is_sqlite_memory_uri(db_uri):
+            # Each in-memory sqlite connection is a separate database
+            background_engine = engine
+        else:
+            background_engine = create_db_engine(
+                db_uri,
+                api_settings.db_background_pool_size,
+                api_settings.db_background_max_overflow,
+            )
+            db_pool_metrics["background"] = (
+                background_engine,
+                track_pool_metrics(background_engine, "background"),
+            )
+        db_session.session_factory.configure(bind=background_engine)  # type: ignore
+        SessionLocal.configure(bind=engine)
+
+        if api_settings.db_async:
+            async_db_engine = create_async_db_engine(
+                api_settings.get_db_uri(use_async=True)
+            )
+            db_pool_metrics["api_async"] = (
+                async_db_engine.sync_engine,
+                track_pool_metrics(async_db_engine.sync_engine, "api_async"),
+            )
+            AsyncSessionLocal.configure(bind=async_db_engine)
+
+        db_background_engine = background_engine
+        db_engine = engine
+
+
+def create_async_db_engine(uri: str) -> AsyncEngine:
+    if is_sqlite_memory_uri(uri):
+        logger.warning(
+            "The async engine uses a separate in-memory sqlite database, "
+            "set DB_SQLITE_PATH to share data with background tasks"
+        )
+        return create_async_engine(uri, poolclass=StaticPool)
+
+    engine = create_async_engine(
+        uri,
+        poolclass=TimedAsyncAdaptedQueuePool,
+        **get_pool_options(api_settings.db_pool_size, api_settings.db_max_overflow),
+    )
+    if api_settings.db_pool_pre_ping == "idle":
+        ping_idle_connections(
+            engine.sync_engine, api_settings.db_pool_ping_idle_seconds
+        )
+    return engine
+
+
+def get_pool_stats() -> List[Dict[str, Any]]:
+    """Returns the PoolMetrics and current pool state for each engine."""
+    return [metrics.snapshot(engine) for engine, metrics in db_pool_metrics.values()]
+
+
+def get_db() -> Generator[Session, None, None]:
+    """FastAPI dependency that provides a database session for a request.
+
+    The session is only created when a route handler depends on it, so routes
+    that do not touch the database (health checks, docs) never pay for it.
+    The session is closed once the response has been sent.
+    """
+    init_db_engines()
+    db: Session = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class RequestDb:
+    """Database handle for async route handlers.
+
+    Database functions are written once as sync functions that take a Session
+    as their first argument. RequestDb.run() calls them:
+    - using AsyncSession.run_sync() when db_async is True, so the request does not
+      hold a threadpool worker while waiting on the database.
+    - on the threadpool with a sync Session otherwise.
+    The session is created on the first call to run().
+    """
+
+    def __init__(self) -> None:
+        self._session: Optional[Session] = None
+        self._async_session: Optional[AsyncSession] = None
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        init_db_engines()
+        if async_db_engine is not None:
+            if self._async_session is None:
+                self._async_session = AsyncSessionLocal()
+            return await self._async_session.run_sync(fn, *args, **kwargs)
+
+        if self._session is None:
+            self._session = SessionLocal()
+        return await run_in_threadpool(fn, self._session, *args, **kwargs)
+
+    async def close(self) -> None:
+        if self._async_session is not None:
+            await self._async_session.close()
+        if self._session is not None:
+            await run_in_threadpool(self._session.close)
+
+
+async def get_request_db() -> AsyncGenerator[RequestDb, None]:
+    """FastAPI dependency that provides a RequestDb for async route handlers."""
+    db = RequestDb()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def create_sqlite_tables() -> None:
+    """Create tables when using the sqlite fallback, which is not managed by alembic."""
+    init_db_engines()
+    assert db_engine is not None
+    if db_engine.dialect.name == "sqlite":
+        BaseTable.metadata.create_all(db_engine)
+    if async_db_engine is not None and async_db_engine.dialect.name == "sqlite":
+        async with async_db_engine.begin() as conn:
+            await conn.run_sync(BaseTable.metadata.create_all)
+
+
+async def dispose_db_engines() -> None:
+    """Close pooled connections on shutdown."""
+    if async_db_engine is not None:
+        await async_db_engine.dispose()
+    for engine, _ in db_pool_metrics.values():
+        if engine is not getattr(async_db_engine, "sync_engine", None):
+            await run_in_threadpool(engine.dispose)
@@ -1,2 +1,4 @@
 from db.tables.base import BaseTable
 from db.tables.job_runs import JobRuns
+from db.tables.job_leases import JobLeases
+from db.tables.job_run_keys import JobRunKeys
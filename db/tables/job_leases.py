@@ -0,0 +1,24 @@
+import datetime
+
+from sqlalchemy.schema import Column
+from sqlalchemy.types import DateTime, String
+
+from db.tables import BaseTable
+
+
+class JobLeases(BaseTable):
+    """
+    Table for storing leases that coordinate work across api replicas.
+    A lease is held by `owner` until `expires_ts`.
+    """
+
+    __tablename__ = "job_leases"
+
+    lease_name = Column(String(128), primary_key=True, nullable=False)
+    owner = Column(String(255), nullable=False)
+    expires_ts = Column(DateTime, nullable=False)
+
+    def __init__(self, lease_name: str, owner: str, expires_ts: datetime.datetime):
+        self.lease_name = lease_name
+        self.owner = owner
+        self.expires_ts = expires_ts
@@ -0,0 +1,41 @@
+import datetime
+from typing import Optional
+
+from sqlalchemy.schema import Column
+from sqlalchemy.types import BigInteger, DateTime, Integer, String
+
+from db.tables import BaseTable
+
+
+class JobRunKeys(BaseTable):
+    """
+    Table for storing the keys of job runs that requests are deduplicated by.
+    The primary key on run_key lets only one run hold a key, across api replicas.
+    """
+
+    __tablename__ = "job_run_keys"
+
+    # sha256 of the idempotency key or the job and its params
+    run_key = Column(String(64), primary_key=True, nullable=False)
+    id_job_run = Column(BigInteger().with_variant(Integer, "sqlite"), nullable=False)
+    # "idempotency" keys return their run until they expire,
+    # "coalesce" keys only while their run is queued or running
+    kind = Column(String(16), nullable=False)
+    expires_ts = Column(DateTime, nullable=False, index=True)
+    # sha256 of the job name and params of the request that created the run,
+    # requests that send an idempotency key again must match it
+    params_hash = Column(String(64))
+
+    def __init__(
+        self,
+        run_key: str,
+        id_job_run: int,
+        kind: str,
+        expires_ts: datetime.datetime,
+        params_hash: Optional[str] = None,
+    ):
+        self.run_key = run_key
+        self.id_job_run = id_job_run
+        self.kind = kind
+        self.expires_ts = expires_ts
+        self.params_hash = params_hash
@@ -1,8 +1,8 @@
 import datetime
 from typing import Optional
 
-from sqlalchemy.schema import Column
-from sqlalchemy.types import BigInteger, DateTime, String, Text
+from sqlalchemy.schema import Column, Index
+from sqlalchemy.types import BigInteger, DateTime, Integer, String, Text
 
 from db.tables import BaseTable
 from utils.dttm import current_utc
@@ -14,22 +14,67 @@ class JobRuns(BaseTable):
     """
 
     __tablename__ = "job_runs"
+    __table_args__ = (
+        # Used to look up the latest run for a job.
+        # job_name is a TEXT column, so MySQL needs a prefix length to index it.
+        Index(
+            "ix_job_runs_job_name_start_ts",
+            "job_name",
+            "start_ts",
+            mysql_length={"job_name": 255},
+        ),
+        # Used to read runs changed since a point in time
+        Index("ix_job_runs_update_ts_id_job_run", "update_ts", "id_job_run"),
+        # Used to list runs, newest first, with keyset pagination.
+        # Runs filtered by job_name use ix_job_runs_job_name_start_ts.
+        Index("ix_job_runs_start_ts_id_job_run", "start_ts", "id_job_run"),
+        Index(
+            "ix_job_runs_status_start_ts_id_job_run",
+            "status",
+            "start_ts",
+            "id_job_run",
+        ),
+    )
 
+    # sqlite only autoincrements INTEGER primary keys
     id_job_run = Column(
-        BigInteger, primary_key=True, autoincrement=True, nullable=False, index=True
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+        nullable=False,
+        index=True,
     )
     job_name = Column(Text, nullable=False)
     status = Column(String(128), nullable=False, index=True)
-    start_ts = Column(DateTime(timezone=True), default=current_utc)
+    # On MySQL, job_runs is partitioned by month on start_ts (see db/partitions.py),
+    # so the primary key in the database is (id_job_run, start_ts).
+    start_ts = Column(DateTime(timezone=True), default=current_utc, nullable=False)
     update_ts = Column(DateTime(timezone=True), default=current_utc)
     end_ts = Column(DateTime)
+    # Time a worker started the run, start_ts to run_ts is the time it was queued
+    run_ts = Column(DateTime)
+    # Time the run was scheduled for, set for runs started by the scheduler
+    scheduled_ts = Column(DateTime)
+    # Set for runs created together using /v1/run/jobs
+    batch_id = Column(String(32), index=True)
+    # Set for runs started by another run, e.g. the trials of a training sweep
+    id_parent_job_run = Column(
+        BigInteger().with_variant(Integer, "sqlite"), nullable=True, index=True
+    )
+    # Items processed so far and in total, set by jobs that report progress
+    progress_done = Column(Integer)
+    progress_total = Column(Integer)
 
     def __init__(
         self,
         job_name: str,
         status: Optional[str] = None,
-        start_ts: Optional[datetime.datetime] = current_utc(),
+        start_ts: Optional[datetime.datetime] = None,
+        scheduled_ts: Optional[datetime.datetime] = None,
+        id_parent_job_run: Optional[int] = None,
     ):
         self.job_name = job_name
         self.status = status
-        self.start_ts = start_ts
+        self.start_ts = start_ts or current_utc()
+        self.scheduled_ts = scheduled_ts
+        self.id_parent_job_run = id_parent_job_run
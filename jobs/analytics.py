@@ -0,0 +1,220 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import duckdb
+import polars as pl
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+from api.settings import api_settings
+from db.crud.job_runs import get_job_runs_updated_since
+from db.session import db_session
+from jobs.archive import DATE_PARTITION, get_archive_filesystem, get_archive_schema
+from utils.dttm import as_utc, current_utc
+from utils.log import logger
+
+# Columns of job_runs used for analytics
+SNAPSHOT_SCHEMA = {
+    "id_job_run": pl.Int64,
+    "job_name": pl.Utf8,
+    "status": pl.Utf8,
+    "start_ts": pl.Datetime("us"),
+    "update_ts": pl.Datetime("us"),
+    "end_ts": pl.Datetime("us"),
+    "run_ts": pl.Datetime("us"),
+}
+
+# Time windows the stats can be grouped by, and their length in seconds
+WINDOW_SECONDS = {"minute": 60, "hour": 3600, "day": 86400}
+
+JOB_RUN_STATS_SQL = """
+SELECT
+    job_name,
+    date_trunc('{window}', start_ts) AS window_start,
+    count(*) AS runs,
+    count(*) / {window_seconds} AS throughput_per_s,
+    count(*) FILTER (WHERE status = 'success') AS succeeded,
+    count(*) FILTER (WHERE status = 'failed') AS failed,
+    count(*) FILTER (WHERE status = 'failed') / count(*) AS failure_rate,
+    quantile_cont(duration_s, 0.50) AS p50_duration_s,
+    quantile_cont(duration_s, 0.95) AS p95_duration_s,
+    quantile_cont(duration_s, 0.99) AS p99_duration_s
+FROM (
+    SELECT
+        *,
+        -- From the start of the run on a worker, the time queued is not included
+        date_diff('millisecond', run_ts, end_ts) / 1000.0 AS duration_s
+    FROM job_runs
+    WHERE start_ts >= ? AND start_ts < ? {job_name_filter}
+)
+GROUP BY 1, 2
+ORDER BY 1, 2
+"""
+
+
+class JobRunsSnapshot:
+    """A columnar copy of the runs started in the last window_days, from job_runs
+    and the job run archive, used for analytics.
+
+    The job_runs part is refreshed incrementally: only rows with an update_ts after
+    the last refresh are read and merged in by id_job_run. The archive is reloaded
+    when its files change, reading only the date shards in the window. Aggregations
+    run in DuckDB, so the OLTP database only serves the incremental reads.
+    """
+
+    def __init__(
+        self, refresh_interval: float, window_days: int, refresh_overlap: float = 5.0
+    ):
+        self.refresh_interval = refresh_interval
+        self.window_days = window_days
+        # Rows committed late can have an update_ts slightly before the watermark,
+        # so each refresh re-reads `refresh_overlap` seconds before it.
+        self.refresh_overlap = timedelta(seconds=refresh_overlap)
+
+        self._live = pl.DataFrame(schema=SNAPSHOT_SCHEMA)
+        self._watermark: Optional[datetime] = None
+        self._refreshed_at = 0.0
+        self._archive = pl.DataFrame(schema=SNAPSHOT_SCHEMA)
+        self._archive_key: Tuple[Tuple[str, ...], str] = ((), "")
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False, batch_size: int = 10000) -> int:
+        """Merges in rows updated since the last refresh. Returns the number read."""
+        with self._lock:
+            if (
+                not force
+                and time.monotonic() - self._refreshed_at < self.refresh_interval
+            ):
+                return 0
+            read = 0
+            cutoff = (current_utc() - timedelta(days=self.window_days)).replace(
+                tzinfo=None
+            )
+            try:
+                # Runs started in the window were updated in it, so the first
+                # refresh only reads from the start of the window
+                since = (
+                    self._watermark - self.refresh_overlap
+                    if self._watermark is not None
+                    else cutoff
+                )
+                after_id = 0
+                while True:
+                    rows = get_job_runs_updated_since(
+                        db_session,
+                        list(SNAPSHOT_SCHEMA),
+                        since=since,
+                        after_id=after_id,
+                        limit=batch_size,
+                    )
+                    if not rows:
+                        break
+                    self._merge(rows)
+                    read += len(rows)
+                    since, after_id = rows[-1]["update_ts"], rows[-1]["id_job_run"]
+            finally:
+                db_session.remove()
+            self._live = self._live.filter(pl.col("start_ts") >= cutoff)
+            self._refresh_archive(cutoff)
+            self._refreshed_at = time.monotonic()
+            return read
+
+    def _merge(self, rows: List[Dict[str, Any]]) -> None:
+        updates = pl.DataFrame(rows, schema=SNAPSHOT_SCHEMA)
+        self._live = pl.concat(
+            [
+                self._live.filter(~pl.col("id_job_run").is_in(updates["id_job_run"])),
+                updates,
+            ]
+        )
+        watermark = updates["update_ts"].max()
+        if watermark is not None and (
+            self._watermark is None or watermark > self._watermark
+        ):
+            self._watermark = watermark
+
+    def _refresh_archive(self, cutoff: datetime) -> None:
+        filesystem, base_path = get_archive_filesystem()
+        if filesystem.get_file_info(base_path).type != pafs.FileType.Directory:
+            return
+        archive = ds.dataset(
+            base_path,
+            filesystem=filesystem,
+            format="parquet",
+            schema=get_archive_schema().append(pa.field(DATE_PARTITION, pa.string())),
+            partitioning=ds.partitioning(
+                pa.schema([(DATE_PARTITION, pa.string())]), flavor="hive"
+            ),
+        )
+        # Reload when files are archived or the window moves to another date shard
+        cutoff_date = f"{cutoff:%Y-%m-%d}"
+        archive_key = (tuple(sorted(archive.files)), cutoff_date)
+        if archive_key != self._archive_key:
+            table = archive.to_table(
+                columns=list(SNAPSHOT_SCHEMA),
+                filter=ds.field(DATE_PARTITION) >= cutoff_date,
+            )
+            self._archive = pl.from_arrow(table).cast(SNAPSHOT_SCHEMA)  # type: ignore
+            self._archive_key = archive_key
+            logger.info(f"Loaded {self._archive.height} archived job runs")
+        self._archive = self._archive.filter(pl.col("start_ts") >= cutoff)
+
+    def to_arrow(self) -> pa.Table:
+        """Returns live and archived runs, keeping the latest copy of each run."""
+        with self._lock:
+            live, archive = self._live, self._archive
+        runs = pl.concat(
+            [live, archive.filter(~pl.col("id_job_run").is_in(live["id_job_run"]))]
+        )
+        return runs.to_arrow()
+
+    def job_run_stats(
+        self,
+        since: datetime,
+        until: datetime,
+        window: str = "hour",
+        job_name: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Returns run counts, failure rate and duration percentiles per job and window.
+
+        Only runs started in the last window_days are counted.
+        """
+        if window not in WINDOW_SECONDS:
+            raise ValueError(f"Invalid window: {window}")
+        self.refresh()
+
+        # Timestamps in the snapshot are naive UTC
+        params: List[Any] = [
+            as_utc(since).replace(tzinfo=None),
+            as_utc(until).replace(tzinfo=None),
+        ]
+        job_name_filter = ""
+        if job_name is not None:
+            job_name_filter = "AND job_name = ?"
+            params.append(job_name)
+
+        # DuckDB connections are not thread-safe, use one per query
+        con = duckdb.connect()
+        try:
+            con.register("job_runs", self.to_arrow())
+            result = con.execute(
+                JOB_RUN_STATS_SQL.format(
+                    window=window,
+                    window_seconds=WINDOW_SECONDS[window],
+                    job_name_filter=job_name_filter,
+                ),
+                params,
+            ).fetch_arrow_table()
+        finally:
+            con.close()
+        return result.to_pylist()
+
+
+# Create JobRunsSnapshot object
+job_runs_snapshot = JobRunsSnapshot(
+    refresh_interval=api_settings.analytics_refresh_interval,
+    window_days=api_settings.analytics_window_days,
+)
@@ -0,0 +1,229 @@
+import posixpath
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+from uuid import uuid4
+
+from sqlalchemy.types import DateTime, Float, Integer, TypeDecorator
+
+from api.settings import api_settings
+from db.crud.job_run_keys import delete_expired_job_run_keys
+from db.crud.job_runs import delete_job_runs, get_finished_job_runs_before
+from db.partitions import drop_empty_partitions_before, ensure_monthly_partitions
+from db.session import db_session
+from db.tables.job_runs import JobRuns
+from utils.dttm import current_utc
+from utils.filesystem import get_filesystem
+from utils.log import logger
+
+# pyarrow is imported when it is used, importing it adds ~0.5s to api startup
+if TYPE_CHECKING:
+    import pyarrow as pa
+    import pyarrow.fs as pafs
+
+# Archived runs are sharded by the date of their start_ts: <archive_uri>/date=YYYY-MM-DD/
+DATE_PARTITION = "date"
+
+
+def get_archive_filesystem(
+    archive_uri: Optional[str] = None,
+) -> Tuple["pafs.FileSystem", str]:
+    """Returns the filesystem and base path for an archive uri, which defaults to
+    job_runs_archive_uri."""
+    return get_filesystem(archive_uri or api_settings.job_runs_archive_uri)
+
+
+def get_archive_schema() -> "pa.Schema":
+    """Builds the parquet schema from the job_runs table."""
+    import pyarrow as pa
+
+    fields = []
+    for column in JobRuns.__table__.columns:
+        # Types with dialect variants wrap the default type
+        column_type = column.type
+        if isinstance(column_type, TypeDecorator):
+            column_type = column_type.impl
+        if isinstance(column_type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column_type, Float):
+            arrow_type = pa.float64()
+        elif isinstance(column_type, DateTime):
+            # Timestamps are stored in UTC
+            arrow_type = pa.timestamp("us")
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+
+def _naive_utc(dttm: Optional[datetime]) -> Optional[datetime]:
+    if dttm is None or dttm.tzinfo is None:
+        return dttm
+    return dttm.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def write_archive(
+    rows: List[Dict[str, Any]], archive_uri: Optional[str] = None
+) -> None:
+    """Writes job runs to zstd compressed parquet files, sharded by start date."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    filesystem, base_path = get_archive_filesystem(archive_uri)
+    schema = get_archive_schema()
+    datetime_columns = [f.name for f in schema if pa.types.is_timestamp(f.type)]
+    records = []
+    for row in rows:
+        record = {name: row.get(name) for name in schema.names}
+        for name in datetime_columns:
+            record[name] = _naive_utc(record[name])
+        record[DATE_PARTITION] = f"{record['start_ts']:%Y-%m-%d}"
+        records.append(record)
+
+    table = pa.Table.from_pylist(
+        records, schema=schema.append(pa.field(DATE_PARTITION, pa.string()))
+    )
+    ds.write_dataset(
+        table,
+        base_dir=base_path,
+        filesystem=filesystem,
+        format="parquet",
+        partitioning=ds.partitioning(
+            pa.schema([(DATE_PARTITION, pa.string())]), flavor="hive"
+        ),
+        basename_template=f"part-{uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+    )
+
+
+class ArchiveIndex:
+    """The newest archive date of each job name in an archive.
+
+    Each parquet file is read once, and only its job_name column. Files written
+    since the last lookup are found with one listing of the archive, so looking up
+    a job name that was never archived does not read any shard.
+    """
+
+    def __init__(self, archive_uri: Optional[str] = None):
+        self.archive_uri = archive_uri
+        self._files: Set[str] = set()
+        self._latest_dates: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        import pyarrow.compute as pc
+        import pyarrow.fs as pafs
+        import pyarrow.parquet as pq
+
+        filesystem, base_path = get_archive_filesystem(self.archive_uri)
+        if filesystem.get_file_info(base_path).type != pafs.FileType.Directory:
+            self._files, self._latest_dates = set(), {}
+            return
+        prefix = f"{DATE_PARTITION}="
+        files = {
+            info.path: posixpath.basename(posixpath.dirname(info.path))[len(prefix) :]
+            for info in filesystem.get_file_info(
+                pafs.FileSelector(base_path, recursive=True)
+            )
+            if info.type == pafs.FileType.File
+            and info.path.endswith(".parquet")
+            and posixpath.basename(posixpath.dirname(info.path)).startswith(prefix)
+        }
+        if not self._files <= files.keys():
+            # Files were removed, the dates indexed from them may be gone
+            self._files, self._latest_dates = set(), {}
+        for path, archive_date in files.items():
+            if path in self._files:
+                continue
+            job_names = pq.read_table(
+                path, columns=["job_name"], filesystem=filesystem
+            ).column("job_name")
+            for job_name in pc.unique(job_names).to_pylist():
+                if archive_date > self._latest_dates.get(job_name, ""):
+                    self._latest_dates[job_name] = archive_date
+            self._files.add(path)
+
+    def get_latest_date(self, job_name: str) -> Optional[str]:
+        """Returns the newest date with an archived run of job_name, or None."""
+        with self._lock:
+            self._refresh()
+            return self._latest_dates.get(job_name)
+
+
+# ArchiveIndex of each archive uri, created on first use
+_archive_indexes: Dict[str, ArchiveIndex] = {}
+
+
+def get_latest_archived_job_run(
+    job_name: str, archive_uri: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """Returns the most recent archived run for job_name, or None.
+
+    Only the newest date shard with a run for job_name is read, found with the
+    archive's ArchiveIndex.
+    """
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    archive_uri = archive_uri or api_settings.job_runs_archive_uri
+    archive_index = _archive_indexes.setdefault(archive_uri, ArchiveIndex(archive_uri))
+    archive_date = archive_index.get_latest_date(job_name)
+    if archive_date is None:
+        return None
+    filesystem, base_path = get_archive_filesystem(archive_uri)
+    shard = ds.dataset(
+        f"{base_path}/{DATE_PARTITION}={archive_date}",
+        filesystem=filesystem,
+        format="parquet",
+        schema=get_archive_schema(),
+    )
+    runs = shard.to_table(filter=ds.field("job_name") == job_name)
+    if runs.num_rows == 0:
+        return None
+    latest = pc.sort_indices(
+        runs,
+        sort_keys=[("start_ts", "descending"), ("id_job_run", "descending")],
+    )[0]
+    return runs.slice(latest.as_py(), 1).to_pylist()[0]
+
+
+def archive_job_runs(
+    retention_days: Optional[int] = None, batch_size: int = 5000
+) -> int:
+    """Moves finished runs older than retention_days from job_runs to the archive.
+
+    On MySQL, this also creates upcoming monthly partitions and drops
+    old partitions once they are empty. Expired job run keys are deleted.
+    Returns the number of runs archived.
+    """
+    if retention_days is None:
+        retention_days = api_settings.job_runs_retention_days
+    now = current_utc()
+    cutoff = (now - timedelta(days=retention_days)).replace(tzinfo=None)
+
+    archived = 0
+    try:
+        ensure_monthly_partitions(
+            db_session,
+            JobRuns.__tablename__,
+            now.date(),
+            api_settings.job_runs_partition_months_ahead,
+        )
+        while True:
+            rows = get_finished_job_runs_before(db_session, cutoff, limit=batch_size)
+            if not rows:
+                break
+            # Rows are deleted only after they are written. If the delete fails, the
+            # runs can be archived twice, so readers use the latest copy of a run.
+            write_archive(rows)
+            delete_job_runs(db_session, [row["id_job_run"] for row in rows])
+            archived += len(rows)
+        drop_empty_partitions_before(db_session, JobRuns.__tablename__, cutoff.date())
+        delete_expired_job_run_keys(db_session, now.replace(tzinfo=None))
+        db_session.commit()
+    finally:
+        db_session.remove()
+
+    logger.info(f"Archived {archived} job runs that started before {cutoff:%Y-%m-%d}")
+    return archived
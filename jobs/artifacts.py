@@ -0,0 +1,83 @@
+import hashlib
+import json
+import posixpath
+from typing import Any, Dict, Optional
+from uuid import uuid4
+
+from api.settings import api_settings
+from utils.filesystem import get_filesystem
+
+# Layout under the artifacts uri:
+#   blobs/<sha256[:2]>/<sha256>   artifact contents, addressed by their hash
+#   models/<model_id>.json        model records, pointing to the blob of a model
+BLOBS_DIR = "blobs"
+MODELS_DIR = "models"
+
+
+class ArtifactStore:
+    """A content-addressed store for model artifacts.
+
+    Artifacts are stored once per sha256 of their contents, so retraining a model
+    that produces the same bytes does not store it again. Model records map a
+    model id (derived from the training spec and data) to an artifact hash.
+    The uri can be a local directory or a uri supported by pyarrow, e.g. s3://bucket/prefix
+    """
+
+    def __init__(self, uri: str):
+        self.uri = uri
+
+    def _write(self, path: str, data: bytes) -> None:
+        filesystem, base_path = get_filesystem(self.uri)
+        full_path = posixpath.join(base_path, path)
+        filesystem.create_dir(posixpath.dirname(full_path), recursive=True)
+        # Write to a temporary file and move it into place, so readers
+        # never see a partially written file
+        tmp_path = f"{full_path}.{uuid4().hex}.tmp"
+        with filesystem.open_output_stream(tmp_path) as f:
+            f.write(data)
+        filesystem.move(tmp_path, full_path)
+
+    def _exists(self, path: str) -> bool:
+        import pyarrow.fs as pafs
+
+        filesystem, base_path = get_filesystem(self.uri)
+        full_path = posixpath.join(base_path, path)
+        return filesystem.get_file_info(full_path).type == pafs.FileType.File
+
+    def _read(self, path: str) -> Optional[bytes]:
+        import pyarrow.fs as pafs
+
+        filesystem, base_path = get_filesystem(self.uri)
+        full_path = posixpath.join(base_path, path)
+        if filesystem.get_file_info(full_path).type != pafs.FileType.File:
+            return None
+        with filesystem.open_input_stream(full_path) as f:
+            return f.read()
+
+    def put(self, data: bytes) -> str:
+        """Stores data and returns its sha256."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = posixpath.join(BLOBS_DIR, digest[:2], digest)
+        if not self._exists(path):
+            self._write(path, data)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        data = self._read(posixpath.join(BLOBS_DIR, digest[:2], digest))
+        if data is None:
+            raise KeyError(f"Artifact not found: {digest}")
+        return data
+
+    def put_model_record(self, model_id: str, record: Dict[str, Any]) -> None:
+        self._write(
+            posixpath.join(MODELS_DIR, f"{model_id}.json"),
+            json.dumps(record, sort_keys=True).encode(),
+        )
+
+    def get_model_record(self, model_id: str) -> Optional[Dict[str, Any]]:
+        data = self._read(posixpath.join(MODELS_DIR, f"{model_id}.json"))
+        return json.loads(data) if data is not None else None
+
+
+# Create ArtifactStore object
+artifact_store = ArtifactStore(uri=api_settings.artifacts_uri)
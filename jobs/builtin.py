@@ -0,0 +1,18 @@
+import time
+
+
+def sleep_job(seconds: float = 1.0) -> None:
+    """Waits for `seconds`. Used to test the job engine without using cpu."""
+    time.sleep(seconds)
+
+
+def cpu_job(n: int = 1_000_000) -> int:
+    """Counts the primes below n. Used to test cpu-bound jobs."""
+    if n < 3:
+        return 0
+    sieve = bytearray([1]) * n
+    sieve[0:2] = b"\x00\x00"
+    for i in range(2, int(n**0.5) + 1):
+        if sieve[i]:
+            sieve[i * i :: i] = bytearray(len(range(i * i, n, i)))
+    return sum(sieve)
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+from typing import FrozenSet, List, Optional
+
+# (name, min, max) for the 5 cron fields
+CRON_FIELDS = (
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day", 1, 31),
+    ("month", 1, 12),
+    ("weekday", 0, 7),
+)
+
+
+def parse_cron_field(field: str, min_value: int, max_value: int) -> FrozenSet[int]:
+    """Parses one cron field, e.g. "*", "*/15", "1-5", "0,30" or "10-50/10"."""
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_str = part.split("/", 1)
+            step = int(step_str)
+            if step < 1:
+                raise ValueError(f"Invalid cron step: {field}")
+        if part == "*":
+            start, end = min_value, max_value
+        elif "-" in part:
+            start_str, end_str = part.split("-", 1)
+            start, end = int(start_str), int(end_str)
+        else:
+            start = int(part)
+            end = max_value if step > 1 else start
+        if start < min_value or end > max_value or start > end:
+            raise ValueError(f"Invalid cron field: {field}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronSchedule:
+    """A 5 field cron schedule: minute hour day-of-month month day-of-week.
+
+    Day-of-week uses 0 (or 7) for Sunday. As in cron, when both day-of-month and
+    day-of-week are restricted, a day matches if either of them matches.
+    Times are evaluated in the timezone of the datetimes passed in (UTC for the scheduler).
+    """
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression must have 5 fields: {expression}")
+        self.expression = expression
+        (
+            self.minutes,
+            self.hours,
+            self.days,
+            self.months,
+            weekdays,
+        ) = (
+            parse_cron_field(field, min_value, max_value)
+            for field, (_, min_value, max_value) in zip(fields, CRON_FIELDS)
+        )
+        # Both 0 and 7 are Sunday
+        self.weekdays = frozenset(weekday % 7 for weekday in weekdays)
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, dt: datetime) -> bool:
+        day_match = dt.day in self.days
+        # datetime.weekday() is 0 for Monday, cron uses 0 for Sunday
+        weekday_match = (dt.weekday() + 1) % 7 in self.weekdays
+        if self._any_day:
+            return weekday_match
+        if self._any_weekday:
+            return day_match
+        return day_match or weekday_match
+
+    def next_after(self, dt: datetime) -> datetime:
+        """Returns the first time matching the schedule strictly after dt."""
+        next_dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Every schedule matches at least once in 5 years (e.g. Feb 29)
+        limit = next_dt + timedelta(days=366 * 5)
+        while next_dt < limit:
+            if next_dt.month not in self.months:
+                year = next_dt.year + next_dt.month // 12
+                month = next_dt.month % 12 + 1
+                next_dt = next_dt.replace(
+                    year=year, month=month, day=1, hour=0, minute=0
+                )
+                continue
+            if not self._day_matches(next_dt):
+                next_dt = next_dt.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if next_dt.hour not in self.hours:
+                next_dt = next_dt.replace(minute=0) + timedelta(hours=1)
+                continue
+            if next_dt.minute not in self.minutes:
+                next_dt = next_dt + timedelta(minutes=1)
+                continue
+            return next_dt
+        raise ValueError(f"Cron expression never matches: {self.expression}")
+
+    def times_between(
+        self, start: datetime, end: datetime, limit: Optional[int] = None
+    ) -> List[datetime]:
+        """Returns the times matching the schedule in (start, end].
+
+        If limit is set, only the latest `limit` times are returned.
+        """
+        times: List[datetime] = []
+        next_dt = self.next_after(start)
+        while next_dt <= end:
+            times.append(next_dt)
+            if limit is not None and len(times) > limit:
+                times.pop(0)
+            next_dt = self.next_after(next_dt)
+        return times
@@ -0,0 +1,169 @@
+import inspect
+import multiprocessing
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from api.settings import api_settings
+from db.crud.job_runs import update_job_run_status
+from db.session import db_session, init_db_engines
+from jobs.status import job_run_status
+from utils.log import logger
+
+# Called with (id_job_run, job_name, status)
+StatusListener = Callable[[int, str, str], None]
+
+
+def accepts_job_run_id(job_fn: Callable[..., Any]) -> bool:
+    """Returns True if a job function takes an `id_job_run` argument."""
+    try:
+        return "id_job_run" in inspect.signature(job_fn).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the engine has no free slots."""
+
+
+class JobEngine:
+    """Runs jobs on a bounded worker pool and records their status in job_runs.
+
+    Each job moves through queued -> running -> success | failed.
+    At most pool_size jobs run at the same time and at most queue_depth jobs
+    wait for a worker; callers reserve a slot before creating the job run and
+    new jobs are rejected once all slots are taken.
+
+    With the "thread" executor, jobs run on the engine's worker threads.
+    With the "process" executor, the worker threads hand each job to a process
+    pool and wait for it, so cpu-bound jobs run outside the api process while
+    status updates still happen here.
+    """
+
+    def __init__(self, pool_size: int, queue_depth: int, executor_type: str = "thread"):
+        self.pool_size = pool_size
+        self.queue_depth = queue_depth
+        self.executor_type = executor_type
+
+        self._slots = threading.BoundedSemaphore(pool_size + queue_depth)
+        self._workers: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[Executor] = None
+        self._status_listeners: List[StatusListener] = []
+
+    def start(self) -> None:
+        if self._workers is not None:
+            return
+        logger.info(
+            f"Starting job engine: {self.executor_type} x {self.pool_size}, "
+            f"queue depth {self.queue_depth}"
+        )
+        self._workers = ThreadPoolExecutor(
+            max_workers=self.pool_size, thread_name_prefix="job-worker"
+        )
+        if self.executor_type == "process":
+            # Use spawn so child processes do not inherit the api's threads and connections
+            self._processes = ProcessPoolExecutor(
+                max_workers=self.pool_size,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_db_engines,
+            )
+
+    def shutdown(self, wait: bool = False) -> None:
+        if self._workers is not None:
+            self._workers.shutdown(wait=wait)
+            self._workers = None
+        if self._processes is not None:
+            self._processes.shutdown(wait=wait)
+            self._processes = None
+
+    def reserve(self) -> None:
+        """Reserves a slot for a job. Raises JobQueueFull if there are none left."""
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFull(
+                f"Job queue is full: {self.pool_size} running, {self.queue_depth} queued"
+            )
+
+    def reserve_many(self, count: int) -> int:
+        """Reserves up to `count` slots and returns the number reserved."""
+        reserved = 0
+        while reserved < count and self._slots.acquire(blocking=False):
+            reserved += 1
+        return reserved
+
+    def release(self, count: int = 1) -> None:
+        """Releases slots reserved for jobs that were not submitted."""
+        for _ in range(count):
+            self._slots.release()
+
+    def submit(
+        self,
+        id_job_run: int,
+        job_name: str,
+        job_fn: Callable[..., Any],
+        job_params: Optional[Dict[str, Any]] = None,
+    ) -> Future:
+        """Runs a queued job run on the pool.
+
+        Jobs that take an `id_job_run` argument are passed the id of their run,
+        e.g. to record progress. A slot must be reserved before calling submit.
+        """
+        if self._workers is None:
+            raise RuntimeError("Job engine is not running")
+        job_params = dict(job_params or {})
+        if accepts_job_run_id(job_fn):
+            job_params["id_job_run"] = id_job_run
+        self._notify(id_job_run, job_name, job_run_status.QUEUED)
+        return self._workers.submit(
+            self._execute, id_job_run, job_name, job_fn, job_params
+        )
+
+    def add_status_listener(self, listener: StatusListener) -> None:
+        """Registers a function that is called on each status change."""
+        self._status_listeners.append(listener)
+
+    def _notify(self, id_job_run: int, job_name: str, status: str) -> None:
+        for listener in self._status_listeners:
+            try:
+                listener(id_job_run, job_name, status)
+            except Exception as e:
+                logger.error(f"Job status listener failed: {e}")
+
+    def _set_status(
+        self, id_job_run: int, job_name: str, status: str, ended: bool = False
+    ) -> None:
+        try:
+            update_job_run_status(db_session, id_job_run, status, ended=ended)
+        except Exception as e:
+            db_session.rollback()
+            logger.error(f"Failed to set status of job run {id_job_run}: {e}")
+        self._notify(id_job_run, job_name, status)
+
+    def _execute(
+        self,
+        id_job_run: int,
+        job_name: str,
+        job_fn: Callable[..., Any],
+        job_params: Dict[str, Any],
+    ) -> Any:
+        try:
+            self._set_status(id_job_run, job_name, job_run_status.RUNNING)
+            if self._processes is not None:
+                result = self._processes.submit(job_fn, **job_params).result()
+            else:
+                result = job_fn(**job_params)
+            self._set_status(id_job_run, job_name, job_run_status.SUCCESS, ended=True)
+            return result
+        except Exception as e:
+            logger.error(f"Job run {id_job_run} failed: {e}")
+            self._set_status(id_job_run, job_name, job_run_status.FAILED, ended=True)
+        finally:
+            db_session.remove()
+            self._slots.release()
+
+
+# Create JobEngine object
+job_engine = JobEngine(
+    pool_size=api_settings.job_pool_size,
+    queue_depth=api_settings.job_queue_depth,
+    executor_type=api_settings.job_executor,
+)
@@ -0,0 +1,447 @@
+import asyncio
+import hashlib
+import json
+import posixpath
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from uuid import uuid4
+
+import httpx
+
+from api.settings import api_settings
+from db.crud.job_runs import update_job_run_progress
+from db.session import db_session
+from jobs.training import get_dataset_hash, get_dataset_path
+from llm.client import CompletionClient, UpstreamError
+from utils.filesystem import get_filesystem
+from utils.log import logger
+
+# Layout under <llm_batch_output_uri>/<output>/:
+#   spec.json                    the spec of the batch, checked when the batch resumes
+#   part-<ms>-<uuid>.parquet     results, written every checkpoint
+# Parts sort in the order they were written. Rows that failed are run again when
+# the batch resumes, so a row can have several results, the last one is current.
+SPEC_FILE = "spec.json"
+PART_PREFIX = "part-"
+
+# Called with (rows done, total rows) after each checkpoint
+ProgressCallback = Callable[[int, int], None]
+
+
+@dataclass
+class LLMBatchSpec:
+    """Runs a chat completion for each row of a csv or parquet file.
+
+    dataset is a file under datasets_dir. The prompt of a row is prompt_template
+    formatted with the row's columns, e.g. "Classify this review: {review}".
+    Results are written as parquet files under llm_batch_output_uri in the
+    `output` directory, which defaults to an id derived from the spec and data,
+    so running the same batch again resumes it.
+    """
+
+    dataset: str
+    prompt_template: str = "{prompt}"
+    system_prompt: Optional[str] = None
+    # Column copied to the results to join them back to the dataset
+    id_column: Optional[str] = None
+    # Defaults to openai_model
+    model: Optional[str] = None
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    output: Optional[str] = None
+
+    def get_batch_id(self, data_hash: str) -> str:
+        """Returns an id that is the same for the same spec and data."""
+        key = json.dumps({**asdict(self), "output": None, "data": data_hash})
+        return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+    def get_payload(self, prompt: str) -> Dict[str, Any]:
+        messages = [{"role": "user", "content": prompt}]
+        if self.system_prompt is not None:
+            messages.insert(0, {"role": "system", "content": self.system_prompt})
+        payload = {
+            "model": self.model or api_settings.openai_model,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+        }
+        return {key: value for key, value in payload.items() if value is not None}
+
+
+def load_prompts(spec: LLMBatchSpec) -> List[Tuple[int, str, Any]]:
+    """Returns the (row, prompt, id) of each row of the dataset."""
+    import polars as pl
+
+    path = get_dataset_path(spec.dataset)
+    if path.suffix == ".parquet":
+        df = pl.read_parquet(path)
+    else:
+        df = pl.read_csv(path)
+    prompts = []
+    for row, values in enumerate(df.iter_rows(named=True)):
+        try:
+            prompt = spec.prompt_template.format(**values)
+        except KeyError as e:
+            raise ValueError(f"prompt_template uses an unknown column: {e}")
+        row_id = values[spec.id_column] if spec.id_column is not None else None
+        prompts.append((row, prompt, row_id))
+    return prompts
+
+
+class BatchOutput:
+    """Parquet files of the results of a batch, which are also its checkpoint.
+
+    Each checkpoint writes the results since the last one to a new file, which is
+    moved into place once written, so a batch that stops leaves whole files behind.
+    The rows in those files that succeeded are skipped when the batch runs again.
+    """
+
+    def __init__(self, uri: str, id_column: Optional[str] = None):
+        self.uri = uri
+        self.id_column = id_column
+        self.filesystem, self.base_path = get_filesystem(uri)
+
+    def _path(self, name: str) -> str:
+        return posixpath.join(self.base_path, name)
+
+    def check_spec(self, spec: Dict[str, Any]) -> None:
+        """Records the spec of the batch, or checks it matches the recorded spec."""
+        import pyarrow.fs as pafs
+
+        path = self._path(SPEC_FILE)
+        if self.filesystem.get_file_info(path).type == pafs.FileType.File:
+            with self.filesystem.open_input_stream(path) as f:
+                if json.loads(f.read()) != spec:
+                    raise ValueError(
+                        f"{self.uri} holds the results of a different batch"
+                    )
+            return
+        self.filesystem.create_dir(self.base_path, recursive=True)
+        with self.filesystem.open_output_stream(path) as f:
+            f.write(json.dumps(spec, sort_keys=True).encode())
+
+    def get_part_paths(self) -> List[str]:
+        import pyarrow.fs as pafs
+
+        selector = pafs.FileSelector(self.base_path, allow_not_found=True)
+        return sorted(
+            info.path
+            for info in self.filesystem.get_file_info(selector)
+            if info.base_name.startswith(PART_PREFIX)
+            and info.base_name.endswith(".parquet")
+        )
+
+    def get_done_rows(self) -> Set[int]:
+        """Returns the rows that have a result without an error.
+
+        Rows that succeeded are not run again, so this is also the rows whose
+        latest result succeeded.
+        """
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        done: Set[int] = set()
+        for path in self.get_part_paths():
+            table = pq.read_table(
+                path, columns=["row", "error"], filesystem=self.filesystem
+            )
+            table = table.filter(pc.is_null(table.column("error")))
+            done.update(table.column("row").to_pylist())
+        return done
+
+    def write_part(self, results: List[Dict[str, Any]]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns = {
+            "row": pa.array([r["row"] for r in results], type=pa.int64()),
+            "prompt": pa.array([r["prompt"] for r in results], type=pa.string()),
+            "content": pa.array([r["content"] for r in results], type=pa.string()),
+            "error": pa.array([r["error"] for r in results], type=pa.string()),
+            "attempts": pa.array([r["attempts"] for r in results], type=pa.int32()),
+        }
+        if self.id_column is not None:
+            columns[self.id_column] = pa.array([r["id"] for r in results])
+        table = pa.table(columns)
+
+        # Prefixed with the time, so the latest result of a row is in the last part
+        name = f"{PART_PREFIX}{int(time.time() * 1000):013d}-{uuid4().hex}.parquet"
+        path = self._path(name)
+        tmp_path = f"{path}.tmp"
+        with self.filesystem.open_output_stream(tmp_path) as f:
+            pq.write_table(table, f, compression="zstd")
+        self.filesystem.move(tmp_path, path)
+
+
+class AdaptiveLimiter:
+    """Limits concurrent requests, adapting the limit to upstream rate limits.
+
+    The limit halves when a request is rate limited, and all requests pause for
+    the Retry-After of the response. After `limit` requests in a row succeed,
+    the limit grows by one, up to max_limit. Rate limits that arrive while
+    requests are paused are counted once, as they come from the same burst.
+    """
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self.active = 0
+        self.rate_limits = 0
+        self._successes = 0
+        self._paused_until = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            while self.active >= self.limit:
+                await self._condition.wait()
+            self.active += 1
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def release(self, rate_limited: bool = False, pause: float = 0) -> None:
+        async with self._condition:
+            self.active -= 1
+            if rate_limited:
+                self.rate_limits += 1
+                now = time.monotonic()
+                if now >= self._paused_until:
+                    self.limit = max(1, self.limit // 2)
+                    self._successes = 0
+                self._paused_until = max(self._paused_until, now + pause)
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+
+def get_backoff(attempt: int, base: float = 0.5, max_backoff: float = 30) -> float:
+    """Returns the seconds to wait before retry number `attempt`, with jitter."""
+    return min(max_backoff, base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+
+
+async def complete_row(
+    client: CompletionClient,
+    limiter: AdaptiveLimiter,
+    payload: Dict[str, Any],
+    max_retries: int,
+) -> Tuple[Optional[str], Optional[str], int]:
+    """Returns the (content, error, attempts) of one completion, retrying rate
+    limits, server errors and connection errors."""
+    attempt = 0
+    while True:
+        attempt += 1
+        await limiter.acquire()
+        error: Optional[str] = None
+        retry: bool = False
+        rate_limited = False
+        pause = 0.0
+        try:
+            content = await client.create_chat_completion(payload)
+            return content, None, attempt
+        except UpstreamError as e:
+            error = e.detail
+            retry = e.status_code == 429 or e.status_code >= 500
+            if e.status_code == 429:
+                rate_limited = True
+                pause = e.retry_after or get_backoff(attempt)
+        except httpx.HTTPError as e:
+            error = str(e) or type(e).__name__
+            retry = True
+        except (KeyError, IndexError, ValueError) as e:
+            error = f"Malformed completion response: {e}"
+        finally:
+            await limiter.release(rate_limited=rate_limited, pause=pause)
+        if not retry or attempt > max_retries:
+            return None, error, attempt
+        if not rate_limited:
+            await asyncio.sleep(get_backoff(attempt))
+
+
+async def run_llm_batch(
+    spec: LLMBatchSpec,
+    client: CompletionClient,
+    output: BatchOutput,
+    concurrency: int,
+    max_retries: int,
+    checkpoint_rows: int,
+    checkpoint_interval: float,
+    on_progress: Optional[ProgressCallback] = None,
+) -> Dict[str, Any]:
+    """Runs the completions of the rows that have not succeeded yet.
+
+    Requests run on `concurrency` tasks, limited by an AdaptiveLimiter. Results
+    are collected by a writer task that writes a parquet file and reports progress
+    every checkpoint. Files and progress are written on a separate thread, so
+    they do not hold up requests.
+    """
+    io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-batch-io")
+    loop = asyncio.get_event_loop()
+    try:
+        prompts = await loop.run_in_executor(io, load_prompts, spec)
+        done_rows = await loop.run_in_executor(io, output.get_done_rows)
+        pending: "asyncio.Queue[Tuple[int, str, Any]]" = asyncio.Queue()
+        for prompt in prompts:
+            if prompt[0] not in done_rows:
+                pending.put_nowait(prompt)
+        total = len(prompts)
+        done = len(done_rows)
+        failed = 0
+        logger.info(f"Batch {output.uri}: {pending.qsize()} of {total} rows to run")
+
+        def checkpoint(results: List[Dict[str, Any]], done: int) -> None:
+            if results:
+                output.write_part(results)
+            if on_progress is not None:
+                on_progress(done, total)
+
+        await loop.run_in_executor(io, checkpoint, [], done)
+
+        limiter = AdaptiveLimiter(concurrency)
+        results: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+
+        async def worker() -> None:
+            while not pending.empty():
+                row, prompt, row_id = pending.get_nowait()
+                content, error, attempts = await complete_row(
+                    client, limiter, spec.get_payload(prompt), max_retries
+                )
+                await results.put(
+                    {
+                        "row": row,
+                        "id": row_id,
+                        "prompt": prompt,
+                        "content": content,
+                        "error": error,
+                        "attempts": attempts,
+                    }
+                )
+
+        async def writer() -> None:
+            nonlocal done, failed
+            buffer: List[Dict[str, Any]] = []
+            last_checkpoint = time.monotonic()
+            finished = False
+            while not finished:
+                timeout = max(
+                    0, last_checkpoint + checkpoint_interval - time.monotonic()
+                )
+                try:
+                    result = await asyncio.wait_for(results.get(), timeout)
+                except asyncio.TimeoutError:
+                    result = None
+                else:
+                    if result is None:
+                        finished = True
+                    else:
+                        buffer.append(result)
+                        failed += result["error"] is not None
+                due = time.monotonic() >= last_checkpoint + checkpoint_interval
+                if buffer and (finished or due or len(buffer) >= checkpoint_rows):
+                    done += len(buffer)
+                    await loop.run_in_executor(io, checkpoint, buffer, done)
+                    buffer = []
+                    last_checkpoint = time.monotonic()
+                elif due:
+                    last_checkpoint = time.monotonic()
+
+        writer_task = asyncio.ensure_future(writer())
+        try:
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        finally:
+            # Write the results collected so far, also if a worker failed
+            await results.put(None)
+            await writer_task
+            await client.aclose()
+        return {
+            "output": output.uri,
+            "rows": total,
+            "done": done,
+            "failed": failed,
+            "rate_limits": limiter.rate_limits,
+        }
+    finally:
+        # db_session is scoped to the thread, so close it on the thread that used it
+        await loop.run_in_executor(io, db_session.remove)
+        io.shutdown()
+
+
+def get_output_uri(output: str) -> str:
+    """Returns the uri of an output directory under llm_batch_output_uri."""
+    path = posixpath.normpath(output.replace("\\", "/"))
+    if posixpath.isabs(path) or path in (".", "..") or path.startswith("../"):
+        raise ValueError(f"Output must be under llm_batch_output_uri: {output}")
+    return posixpath.join(api_settings.llm_batch_output_uri, path)
+
+
+def llm_batch_job(
+    dataset: str,
+    prompt_template: str = "{prompt}",
+    system_prompt: Optional[str] = None,
+    id_column: Optional[str] = None,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    output: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    id_job_run: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Runs a chat completion for each row of a dataset, see LLMBatchSpec.
+
+    Resumes from the results of an earlier run of the same batch. Progress is
+    recorded on the job run every checkpoint.
+    """
+    if not api_settings.openai_api_key:
+        raise ValueError("Completions are not configured: OPENAI_API_KEY is not set")
+    spec = LLMBatchSpec(
+        dataset=dataset,
+        prompt_template=prompt_template,
+        system_prompt=system_prompt,
+        id_column=id_column,
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        output=output,
+    )
+    data_hash = get_dataset_hash(dataset)
+    batch_output = BatchOutput(
+        get_output_uri(output or spec.get_batch_id(data_hash)), id_column=id_column
+    )
+    batch_output.check_spec({**asdict(spec), "output": None, "data": data_hash})
+    concurrency = concurrency or api_settings.llm_batch_concurrency
+    client = CompletionClient(
+        base_url=api_settings.openai_base_url,
+        api_key=api_settings.openai_api_key,
+        max_streams=concurrency,
+        queue_timeout=api_settings.openai_timeout,
+        max_connections=concurrency,
+        timeout=api_settings.openai_timeout,
+    )
+
+    def record_progress(done: int, total: int) -> None:
+        if id_job_run is None:
+            return
+        try:
+            update_job_run_progress(db_session, id_job_run, done, total)
+        except Exception as e:
+            db_session.rollback()
+            logger.error(f"Failed to record progress of job run {id_job_run}: {e}")
+
+    return asyncio.run(
+        run_llm_batch(
+            spec,
+            client,
+            batch_output,
+            concurrency=concurrency,
+            max_retries=api_settings.llm_batch_max_retries,
+            checkpoint_rows=api_settings.llm_batch_checkpoint_rows,
+            checkpoint_interval=api_settings.llm_batch_checkpoint_interval,
+            on_progress=record_progress,
+        )
+    )
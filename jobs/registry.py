@@ -0,0 +1,16 @@
+from typing import Any, Callable, Dict
+
+from jobs.archive import archive_job_runs
+from jobs.builtin import cpu_job, sleep_job
+from jobs.llm_batch import llm_batch_job
+
+# -*- Jobs that can be run using /v1/run/job
+# Job functions must be defined at the module level so they can be
+# sent to a process pool. Jobs that take an `id_job_run` argument are
+# passed the id of their run.
+job_registry: Dict[str, Callable[..., Any]] = {
+    "test": sleep_job,
+    "cpu": cpu_job,
+    "archive_job_runs": archive_job_runs,
+    "llm_batch": llm_batch_job,
+}
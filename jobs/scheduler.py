@@ -0,0 +1,150 @@
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import List, Optional
+from uuid import uuid4
+
+from starlette.concurrency import run_in_threadpool
+
+from api.settings import api_settings
+from db.crud.job_leases import acquire_lease, release_lease
+from db.crud.job_runs import create_job_run, get_last_scheduled_ts
+from db.session import db_session
+from jobs.cron import CronSchedule
+from jobs.engine import JobEngine, JobQueueFull, job_engine
+from jobs.registry import job_registry
+from jobs.schedules import ScheduledJob, scheduled_jobs
+from jobs.status import job_run_status
+from utils.dttm import as_utc, current_utc
+from utils.log import logger
+
+SCHEDULER_LEASE = "scheduler"
+
+
+class JobScheduler:
+    """Runs ScheduledJobs on the job engine.
+
+    Every `interval` seconds, each replica tries to acquire the scheduler lease.
+    The replica holding it dispatches the runs that are due since each job's last
+    scheduled run, catching up on at most max_catchup missed runs per job.
+    Each run is recorded in job_runs with its scheduled_ts, so the lag between
+    scheduled_ts and start_ts can be measured.
+    """
+
+    def __init__(
+        self,
+        schedules: List[ScheduledJob],
+        engine: JobEngine,
+        interval: float,
+        lease_ttl: float,
+    ):
+        for scheduled_job in schedules:
+            if scheduled_job.job_name not in job_registry:
+                raise ValueError(f"Unknown scheduled job: {scheduled_job.job_name}")
+        self.schedules = [(s, CronSchedule(s.cron)) for s in schedules]
+        self.engine = engine
+        self.interval = interval
+        self.lease_ttl = lease_ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            logger.info(f"Starting scheduler: {self.owner}")
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        try:
+            await run_in_threadpool(
+                release_lease, db_session, SCHEDULER_LEASE, self.owner
+            )
+        finally:
+            await run_in_threadpool(db_session.remove)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                # The tick uses the sync db_session, run it on the threadpool
+                await run_in_threadpool(self.tick)
+            except Exception as e:
+                logger.error(f"Scheduler tick failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def tick(self, now: Optional[datetime] = None) -> int:
+        """Dispatches the runs that are due if this replica holds the lease.
+
+        Returns the number of runs dispatched.
+        """
+        if not self.schedules:
+            return 0
+        now = now or current_utc()
+        try:
+            if not acquire_lease(
+                db_session, SCHEDULER_LEASE, self.owner, self.lease_ttl
+            ):
+                return 0
+            dispatched = 0
+            for scheduled_job, cron_schedule in self.schedules:
+                dispatched += self._dispatch_due(scheduled_job, cron_schedule, now)
+            return dispatched
+        finally:
+            db_session.remove()
+
+    def _dispatch_due(
+        self, scheduled_job: ScheduledJob, cron_schedule: CronSchedule, now: datetime
+    ) -> int:
+        run_name = scheduled_job.get_run_name()
+        last_scheduled_ts = get_last_scheduled_ts(db_session, run_name)
+        if last_scheduled_ts is not None:
+            since = as_utc(last_scheduled_ts)
+        else:
+            # Never scheduled before, only run times since the previous tick
+            since = now - timedelta(seconds=self.interval)
+
+        due_times = cron_schedule.times_between(
+            since, now, limit=scheduled_job.max_catchup
+        )
+        dispatched = 0
+        for scheduled_ts in due_times:
+            try:
+                self.engine.reserve()
+            except JobQueueFull:
+                # Due runs are retried on the next tick
+                logger.warning(f"Job queue is full, delaying scheduled {run_name}")
+                break
+            try:
+                id_job_run = create_job_run(
+                    db_session,
+                    run_name,
+                    job_run_status.QUEUED,
+                    scheduled_ts=scheduled_ts.replace(tzinfo=None),
+                )
+                self.engine.submit(
+                    id_job_run,
+                    run_name,
+                    job_registry[scheduled_job.job_name],
+                    scheduled_job.job_params,
+                )
+            except Exception:
+                self.engine.release()
+                raise
+            logger.info(
+                f"Scheduled {run_name} for {scheduled_ts:%Y-%m-%dT%H:%M}: {id_job_run}, "
+                f"lag {(now - scheduled_ts).total_seconds():.1f}s"
+            )
+            dispatched += 1
+        return dispatched
+
+
+# Create JobScheduler object
+job_scheduler = JobScheduler(
+    schedules=scheduled_jobs,
+    engine=job_engine,
+    interval=api_settings.scheduler_interval,
+    lease_ttl=api_settings.scheduler_lease_ttl,
+)
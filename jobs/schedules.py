@@ -0,0 +1,27 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class ScheduledJob:
+    # Name of the job in jobs.registry.job_registry
+    job_name: str
+    # 5 field cron expression, evaluated in UTC
+    cron: str
+    job_params: Dict[str, Any] = field(default_factory=dict)
+    # Name the runs are recorded under in job_runs. Defaults to job_name.
+    run_name: Optional[str] = None
+    # Number of missed runs to catch up on after downtime.
+    # Older missed runs are skipped.
+    max_catchup: int = 1
+
+    def get_run_name(self) -> str:
+        return self.run_name or self.job_name
+
+
+# -*- Jobs run by the scheduler
+scheduled_jobs: List[ScheduledJob] = [
+    # Move finished runs older than job_runs_retention_days to the archive
+    ScheduledJob(job_name="archive_job_runs", cron="0 3 * * *"),
+    # ScheduledJob(job_name="test", cron="*/5 * * * *", job_params={"seconds": 1}),
+]
@@ -0,0 +1,14 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class JobRunStatus:
+    QUEUED: str = "queued"
+    RUNNING: str = "running"
+    SUCCESS: str = "success"
+    FAILED: str = "failed"
+    # Sweep trials stopped early because other trials scored better
+    PRUNED: str = "pruned"
+
+
+job_run_status = JobRunStatus()
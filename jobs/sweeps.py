@@ -0,0 +1,343 @@
+import hashlib
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import threading
+from concurrent.futures import (
+    BrokenExecutor,
+    Executor,
+    ProcessPoolExecutor,
+    as_completed,
+)
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from api.settings import api_settings
+from db.crud.job_runs import create_job_runs, update_job_runs_status
+from db.session import db_session, init_db_engines
+from jobs.engine import JobEngine
+from jobs.status import job_run_status
+from jobs.training import TrainSpec, fit_estimator, load_dataset, train_model
+from utils.log import logger
+
+# Called with (candidate indices, status) when trials change status
+TrialStatusCallback = Callable[[List[int], str], None]
+
+
+@dataclass
+class SweepSpec:
+    """A hyperparameter sweep over the estimator params of a TrainSpec.
+
+    Candidates are every combination of param_grid ("grid") or n_candidates
+    combinations sampled from it ("random"). They are compared using successive
+    halving: all candidates are trained on a few rows, the best 1/factor are kept
+    and trained on factor times more rows, and so on until the last round, which
+    uses all training rows. Rounds use at least min_samples rows.
+    """
+
+    param_grid: Dict[str, List[Any]]
+    search: str = "grid"
+    n_candidates: int = 16
+    factor: int = 3
+    min_samples: Optional[int] = None
+    random_state: int = 0
+    # Fraction of the training rows held out to score the candidates
+    validation_size: float = 0.2
+
+    def get_grid_size(self) -> int:
+        """Returns the number of combinations in param_grid."""
+        n_grid = 1
+        for values in self.param_grid.values():
+            n_grid *= len(values)
+        return n_grid
+
+    def get_n_candidates(self) -> int:
+        """Returns the number of candidates without listing them."""
+        n_grid = self.get_grid_size()
+        if self.search == "random":
+            return min(n_grid, self.n_candidates)
+        return n_grid
+
+    def get_candidates(
+        self, max_candidates: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Returns the candidates. Raises ValueError if there are more than
+        max_candidates.
+
+        Random candidates are drawn as indices into the grid, which are then
+        decoded one param at a time, so large grids are never listed.
+        """
+        n_candidates = self.get_n_candidates()
+        if max_candidates is not None and n_candidates > max_candidates:
+            raise ValueError(
+                f"Sweep has {n_candidates} candidates, the limit is {max_candidates}"
+            )
+        names = sorted(self.param_grid)
+        if self.search != "random" or n_candidates == self.get_grid_size():
+            return [
+                dict(zip(names, values))
+                for values in itertools.product(*(self.param_grid[n] for n in names))
+            ]
+        candidates = []
+        rng = random.Random(self.random_state)
+        for index in rng.sample(range(self.get_grid_size()), n_candidates):
+            candidate = {}
+            # The last param changes fastest, as in itertools.product
+            for name in reversed(names):
+                index, position = divmod(index, len(self.param_grid[name]))
+                candidate[name] = self.param_grid[name][position]
+            candidates.append({name: candidate[name] for name in names})
+        return candidates
+
+    def get_rung_samples(self, n_candidates: int, max_samples: int) -> List[int]:
+        """Returns the number of training rows used in each round.
+
+        The last round, between the final candidates, uses all max_samples rows.
+        """
+        n_rungs = 1
+        while n_candidates > self.factor:
+            n_candidates = math.ceil(n_candidates / self.factor)
+            n_rungs += 1
+        samples = [max_samples // self.factor**rung for rung in range(n_rungs)]
+        if self.min_samples is not None:
+            samples = [max(self.min_samples, n) for n in samples]
+        return [min(max_samples, n) for n in reversed(samples)]
+
+
+def get_sweep_model_id(spec: TrainSpec, sweep: SweepSpec, data_hash: str) -> str:
+    """Returns an id that is the same for the same sweep, spec and data."""
+    key = json.dumps(
+        {"model_id": spec.get_model_id(data_hash), "sweep": asdict(sweep)},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+@lru_cache(maxsize=4)
+def _load_sweep_split(
+    dataset: str,
+    target: Optional[str],
+    test_size: float,
+    validation_size: float,
+    random_state: int,
+) -> Tuple[Any, Any, Any, Any]:
+    # Cached so each worker process loads and splits a dataset once per sweep
+    from sklearn.model_selection import train_test_split
+
+    X, y = load_dataset(dataset, target)
+    # The test rows are left out, they are used to score the final model
+    X_train, _, y_train, _ = train_test_split(
+        X, y, test_size=test_size, random_state=random_state
+    )
+    return train_test_split(
+        X_train, y_train, test_size=validation_size, random_state=random_state
+    )
+
+
+def get_sweep_train_size(spec: Dict[str, Any], validation_size: float) -> int:
+    train_spec = TrainSpec(**spec)
+    X_train, _, _, _ = _load_sweep_split(
+        train_spec.dataset,
+        train_spec.target,
+        train_spec.test_size,
+        validation_size,
+        train_spec.random_state,
+    )
+    return len(X_train)
+
+
+def evaluate_trial(
+    spec: Dict[str, Any],
+    params: Dict[str, Any],
+    n_samples: int,
+    validation_size: float,
+    threads: int,
+) -> float:
+    """Trains a candidate on the first n_samples training rows and returns its
+    validation score. Runs in a worker process."""
+    train_spec = TrainSpec(**spec)
+    X_train, X_val, y_train, y_val = _load_sweep_split(
+        train_spec.dataset,
+        train_spec.target,
+        train_spec.test_size,
+        validation_size,
+        train_spec.random_state,
+    )
+    estimator = fit_estimator(
+        train_spec, X_train[:n_samples], y_train[:n_samples], threads, **params
+    )
+    return float(estimator.score(X_val, y_val))
+
+
+def run_successive_halving(
+    spec: Dict[str, Any],
+    sweep: SweepSpec,
+    candidates: List[Dict[str, Any]],
+    executor: Executor,
+    threads: int = 1,
+    on_status: Optional[TrialStatusCallback] = None,
+) -> Tuple[int, List[List[Tuple[int, float]]]]:
+    """Runs each round's trials in parallel on executor and prunes the weakest.
+
+    Returns the index of the best candidate and, for each candidate,
+    the (n_samples, score) of each round it was trained in.
+    """
+    ended: Set[int] = set()
+
+    def set_status(indices: List[int], status: str) -> None:
+        if status != job_run_status.RUNNING:
+            ended.update(indices)
+        if on_status is not None and indices:
+            on_status(indices, status)
+
+    history: List[List[Tuple[int, float]]] = [[] for _ in candidates]
+    alive = list(range(len(candidates)))
+    try:
+        max_samples = executor.submit(
+            get_sweep_train_size, spec, sweep.validation_size
+        ).result()
+        set_status(alive, job_run_status.RUNNING)
+        for n_samples in sweep.get_rung_samples(len(candidates), max_samples):
+            futures = {
+                executor.submit(
+                    evaluate_trial,
+                    spec,
+                    candidates[i],
+                    n_samples,
+                    sweep.validation_size,
+                    threads,
+                ): i
+                for i in alive
+            }
+            scores: Dict[int, float] = {}
+            failed: List[int] = []
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    scores[index] = future.result()
+                    history[index].append((n_samples, scores[index]))
+                except Exception as e:
+                    logger.warning(f"Trial {candidates[index]} failed: {e}")
+                    failed.append(index)
+            set_status(failed, job_run_status.FAILED)
+            if not scores:
+                raise RuntimeError("All trials failed")
+
+            ranked = sorted(scores, key=lambda i: scores[i], reverse=True)
+            keep = ranked[: max(1, math.ceil(len(alive) / sweep.factor))]
+            set_status([i for i in ranked if i not in keep], job_run_status.PRUNED)
+            alive = keep
+            if len(alive) == 1:
+                break
+    except BaseException:
+        # The executor broke or the sweep was stopped, the trials left never finish
+        set_status([i for i in alive if i not in ended], job_run_status.FAILED)
+        raise
+
+    set_status(alive[1:], job_run_status.PRUNED)
+    set_status(alive[:1], job_run_status.SUCCESS)
+    return alive[0], history
+
+
+class TrialPool:
+    """The worker processes that sweep trials run on, one per core by default.
+
+    Trials are single threaded, so a sweep uses every core by running
+    one trial per process.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=init_db_engines,
+                )
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+def run_sweep(
+    id_job_run: int,
+    job_name: str,
+    spec: Dict[str, Any],
+    sweep: Dict[str, Any],
+    model_id: str,
+) -> Dict[str, Any]:
+    """Runs a sweep and trains the best candidate on all training rows.
+
+    Runs on a sweep_engine thread. Each candidate is recorded as a child run of
+    id_job_run, which ends as success (the best), pruned or failed.
+    Returns the model record of the best candidate.
+    """
+    sweep_spec = SweepSpec(**sweep)
+    candidates = sweep_spec.get_candidates(api_settings.sweep_max_candidates)
+    try:
+        trial_ids = create_job_runs(
+            db_session,
+            [f"{job_name}.trial" for _ in candidates],
+            job_run_status.QUEUED,
+            id_parent_job_run=id_job_run,
+        )
+
+        def set_trial_status(indices: List[int], status: str) -> None:
+            update_job_runs_status(
+                db_session,
+                [trial_ids[i] for i in indices],
+                status,
+                ended=status != job_run_status.RUNNING,
+            )
+
+        executor = trial_pool.get_executor()
+        best, history = run_successive_halving(
+            spec, sweep_spec, candidates, executor, on_status=set_trial_status
+        )
+    except BrokenExecutor:
+        # A worker died, start a new pool for the next sweep
+        trial_pool.shutdown()
+        raise
+    finally:
+        db_session.remove()
+
+    logger.info(f"Sweep {id_job_run} picked {candidates[best]}")
+    best_spec = {**spec, "params": {**spec["params"], **candidates[best]}}
+    sweep_record = {
+        **asdict(sweep_spec),
+        "trials": [
+            {"id_job_run": trial_ids[i], "params": candidates[i], "scores": history[i]}
+            for i in range(len(candidates))
+        ],
+    }
+    # The pool is idle once the trials are done, so the final fit can use more threads
+    threads = max(1, (os.cpu_count() or 1) // sweep_engine.pool_size)
+    return executor.submit(
+        train_model, best_spec, model_id, threads, sweep=sweep_record
+    ).result()
+
+
+# Create TrialPool object
+trial_pool = TrialPool(max_workers=api_settings.sweep_pool_size)
+
+# Create JobEngine for sweeps
+# Sweeps run on threads that hand their trials to the trial_pool.
+sweep_engine = JobEngine(
+    pool_size=api_settings.sweep_concurrency,
+    queue_depth=api_settings.sweep_queue_depth,
+    executor_type="thread",
+)
@@ -0,0 +1,208 @@
+import hashlib
+import io
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from importlib import import_module
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from api.settings import api_settings
+from jobs.artifacts import artifact_store
+from jobs.engine import JobEngine
+from utils.dttm import current_utc_str
+from utils.log import logger
+
+# -*- Estimators that can be trained using /v1/train/job
+# Only these classes can be created from a training spec.
+ESTIMATORS: Dict[str, str] = {
+    "logistic_regression": "sklearn.linear_model.LogisticRegression",
+    "ridge": "sklearn.linear_model.Ridge",
+    "random_forest_classifier": "sklearn.ensemble.RandomForestClassifier",
+    "random_forest_regressor": "sklearn.ensemble.RandomForestRegressor",
+    "gradient_boosting_classifier": "sklearn.ensemble.HistGradientBoostingClassifier",
+    "gradient_boosting_regressor": "sklearn.ensemble.HistGradientBoostingRegressor",
+    "knn_classifier": "sklearn.neighbors.KNeighborsClassifier",
+    "svc": "sklearn.svm.SVC",
+}
+
+# Datasets bundled with scikit-learn, referenced as "sklearn:<name>"
+SKLEARN_DATASET_PREFIX = "sklearn:"
+SKLEARN_DATASETS = ("iris", "wine", "breast_cancer", "digits", "diabetes")
+
+
+@dataclass
+class TrainSpec:
+    """What to train: an estimator with params, fitted on a dataset.
+
+    dataset is either "sklearn:<name>" or the path of a csv or parquet file relative
+    to datasets_dir, in which case target is the label column and all other columns
+    are features.
+    """
+
+    dataset: str
+    estimator: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    target: Optional[str] = None
+    test_size: float = 0.2
+    random_state: int = 0
+
+    def get_model_id(self, data_hash: str) -> str:
+        """Returns an id that is the same for the same spec and data."""
+        key = json.dumps(
+            {"spec": asdict(self), "data_hash": data_hash},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_estimator_class(estimator: str) -> Any:
+    if estimator not in ESTIMATORS:
+        raise ValueError(f"Unknown estimator: {estimator}")
+    module_name, class_name = ESTIMATORS[estimator].rsplit(".", 1)
+    return getattr(import_module(module_name), class_name)
+
+
+def get_dataset_path(dataset: str) -> Path:
+    """Returns the path of a dataset file under datasets_dir."""
+    datasets_dir = Path(api_settings.datasets_dir).resolve()
+    path = datasets_dir.joinpath(dataset).resolve()
+    if datasets_dir not in path.parents:
+        raise FileNotFoundError(f"Dataset must be under datasets_dir: {dataset}")
+    return path
+
+
+# (path, size, mtime) -> sha256, so unchanged files are not hashed again
+_file_hashes: Dict[Tuple[str, int, float], str] = {}
+
+
+def get_dataset_hash(dataset: str) -> str:
+    """Returns the sha256 of a dataset file, or of the name of a bundled dataset."""
+    if dataset.startswith(SKLEARN_DATASET_PREFIX):
+        name = dataset[len(SKLEARN_DATASET_PREFIX) :]
+        if name not in SKLEARN_DATASETS:
+            raise FileNotFoundError(f"Unknown dataset: {dataset}")
+        import sklearn
+
+        # Bundled datasets only change with the scikit-learn version
+        return hashlib.sha256(f"{dataset}:{sklearn.__version__}".encode()).hexdigest()
+
+    path = get_dataset_path(dataset)
+    stat = path.stat()
+    key = (str(path), stat.st_size, stat.st_mtime)
+    if key not in _file_hashes:
+        digest = hashlib.sha256()
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        _file_hashes[key] = digest.hexdigest()
+    return _file_hashes[key]
+
+
+def load_dataset(dataset: str, target: Optional[str] = None) -> Tuple[Any, Any]:
+    """Returns the features and labels of a dataset as numpy arrays."""
+    if dataset.startswith(SKLEARN_DATASET_PREFIX):
+        from sklearn import datasets
+
+        name = dataset[len(SKLEARN_DATASET_PREFIX) :]
+        return getattr(datasets, f"load_{name}")(return_X_y=True)
+
+    import polars as pl
+
+    if target is None:
+        raise ValueError(f"A target column is required for {dataset}")
+    path = get_dataset_path(dataset)
+    if path.suffix == ".parquet":
+        df = pl.read_parquet(path)
+    else:
+        df = pl.read_csv(path)
+    return df.drop(target).to_numpy(), df[target].to_numpy()
+
+
+def get_threads_per_job(pool_size: int) -> int:
+    """Returns the BLAS/OpenMP threads for each training process.
+
+    Each of the pool_size processes gets an equal share of the cores, so processes
+    do not oversubscribe the cores with their own native thread pools.
+    """
+    if api_settings.train_threads_per_job is not None:
+        return api_settings.train_threads_per_job
+    return max(1, (os.cpu_count() or 1) // pool_size)
+
+
+def fit_estimator(
+    spec: TrainSpec, X_train: Any, y_train: Any, threads: int, **params: Any
+) -> Any:
+    """Fits an estimator with native and joblib threads limited to `threads`."""
+    from joblib import parallel_backend
+    from threadpoolctl import threadpool_limits
+
+    estimator = get_estimator_class(spec.estimator)(**{**spec.params, **params})
+    with threadpool_limits(limits=threads), parallel_backend(
+        "threading", n_jobs=threads
+    ):
+        estimator.fit(X_train, y_train)
+    return estimator
+
+
+def train_model(
+    spec: Dict[str, Any],
+    model_id: str,
+    threads: int,
+    sweep: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Trains a model and saves it to the artifact store. Runs in a worker process.
+
+    sweep is saved in the record of models picked by a sweep.
+    Returns the model record. If the model was trained since it was requested,
+    e.g. by another replica, the existing record is returned.
+    """
+    import joblib
+    from sklearn.model_selection import train_test_split
+
+    record = artifact_store.get_model_record(model_id)
+    if record is not None:
+        return record
+
+    train_spec = TrainSpec(**spec)
+    X, y = load_dataset(train_spec.dataset, train_spec.target)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=train_spec.test_size, random_state=train_spec.random_state
+    )
+    estimator = fit_estimator(train_spec, X_train, y_train, threads)
+
+    buffer = io.BytesIO()
+    joblib.dump(estimator, buffer)
+    record = {
+        "model_id": model_id,
+        "artifact": artifact_store.put(buffer.getvalue()),
+        "spec": spec,
+        "score": float(estimator.score(X_test, y_test)),
+        "n_features": int(X.shape[1]),
+        "trained_at": current_utc_str(),
+    }
+    if sweep is not None:
+        record["sweep"] = sweep
+    artifact_store.put_model_record(model_id, record)
+    logger.info(f"Trained model {model_id}: score {record['score']:.4f}")
+    return record
+
+
+def load_model(model_id: str) -> Any:
+    """Returns the fitted estimator for a model id. Raises KeyError if not trained."""
+    import joblib
+
+    record = artifact_store.get_model_record(model_id)
+    if record is None:
+        raise KeyError(f"Model not found: {model_id}")
+    return joblib.load(io.BytesIO(artifact_store.get(record["artifact"])))
+
+
+# Create JobEngine for training jobs
+# Training always runs in worker processes so it does not hold the api's GIL.
+train_engine = JobEngine(
+    pool_size=api_settings.train_pool_size,
+    queue_depth=api_settings.train_queue_depth,
+    executor_type="process",
+)
@@ -0,0 +1,521 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import anyio
+
+from api.settings import api_settings
+from llm.client import completion_client
+from utils.log import logger
+
+# numpy is imported when the semantic index is used, so api startup does not pay for it
+if TYPE_CHECKING:
+    import numpy as np
+
+# Request fields that do not change the completion
+IGNORED_FIELDS = {"stream", "user"}
+
+
+def normalize_text(text: str) -> str:
+    """Strips surrounding whitespace, line endings and trailing spaces on each line.
+    Indentation is kept, as it can change the meaning of a prompt."""
+    lines = str(text).replace("\r\n", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def normalize_request(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the fields of a chat completion request that change the completion,
+    in a canonical form."""
+    request = {
+        key: value
+        for key, value in payload.items()
+        if value is not None and key not in IGNORED_FIELDS
+    }
+    request["messages"] = [
+        {
+            "role": message.get("role", "user"),
+            "content": normalize_text(message.get("content", "")),
+        }
+        for message in payload.get("messages", [])
+    ]
+    for key in ("temperature", "top_p"):
+        if key in request:
+            request[key] = float(request[key])
+    return request
+
+
+def get_hash(value: Any) -> str:
+    data = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def get_request_key(payload: Dict[str, Any]) -> str:
+    """Returns the cache key of a chat completion request."""
+    return get_hash(normalize_request(payload))
+
+
+def get_request_scope(payload: Dict[str, Any]) -> str:
+    """Returns a hash of everything but the messages of a request. Semantic lookups
+    only match requests with the same model and parameters."""
+    request = normalize_request(payload)
+    request.pop("messages")
+    return get_hash(request)
+
+
+def get_request_text(payload: Dict[str, Any]) -> str:
+    """Returns the text of the messages of a request, which is embedded for
+    semantic lookups."""
+    return "\n".join(
+        f"{message['role']}: {message['content']}"
+        for message in normalize_request(payload)["messages"]
+    )
+
+
+class DiskCacheStore:
+    """Stores completions in a sqlite file on local disk.
+
+    Entries expire ttl seconds after they are stored. Past max_entries, the least
+    recently read entries are evicted. Expired and evicted entries are removed every
+    PURGE_INTERVAL writes, so the file can briefly hold more than max_entries.
+    Several api workers can share the file.
+    """
+
+    PURGE_INTERVAL = 100
+
+    def __init__(self, path: str, ttl: float, max_entries: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._writes = 0
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None, timeout=10
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS completion_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_completion_cache_accessed_at "
+                "ON completion_cache (accessed_at)"
+            )
+            self._connection = connection
+        return self._connection
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT value, expires_at FROM completion_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                connection.execute("DELETE FROM completion_cache WHERE key = ?", (key,))
+                return None
+            connection.execute(
+                "UPDATE completion_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO completion_cache VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now),
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_INTERVAL == 0:
+                self._purge(connection, now)
+
+    def _purge(self, connection: sqlite3.Connection, now: float) -> None:
+        connection.execute("DELETE FROM completion_cache WHERE expires_at < ?", (now,))
+        count = connection.execute("SELECT COUNT(*) FROM completion_cache").fetchone()
+        excess = count[0] - self.max_entries
+        if excess > 0:
+            connection.execute(
+                "DELETE FROM completion_cache WHERE key IN (SELECT key FROM "
+                "completion_cache ORDER BY accessed_at LIMIT ?)",
+                (excess,),
+            )
+            self.evictions += excess
+
+    def count(self) -> int:
+        with self._lock:
+            connection = self._connect()
+            return connection.execute(
+                "SELECT COUNT(*) FROM completion_cache"
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class RedisCacheStore:
+    """Stores completions in redis.
+
+    Entries are set with a ttl, so redis expires them. A sorted set of keys by last
+    read time tracks recency, and past max_entries the least recently read entries
+    are evicted.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        db: int,
+        password: Optional[str],
+        ttl: float,
+        max_entries: int,
+        prefix: str = "completion_cache",
+    ):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self.evictions = 0
+        self._client: Any = None
+
+    def _get_client(self) -> Any:
+        if self._client is None:
+            import redis
+
+            self._client = redis.Redis(
+                host=self.host,
+                port=self.port,
+                db=self.db,
+                password=self.password or None,
+                decode_responses=True,
+            )
+        return self._client
+
+    @property
+    def _lru_key(self) -> str:
+        return f"{self.prefix}:lru"
+
+    def _entry_key(self, key: str) -> str:
+        return f"{self.prefix}:entry:{key}"
+
+    def get(self, key: str) -> Optional[str]:
+        client = self._get_client()
+        value = client.get(self._entry_key(key))
+        if value is None:
+            client.zrem(self._lru_key, key)
+        else:
+            client.zadd(self._lru_key, {key: time.time()})
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        client = self._get_client()
+        pipeline = client.pipeline()
+        pipeline.set(self._entry_key(key), value, ex=int(self.ttl))
+        pipeline.zadd(self._lru_key, {key: time.time()})
+        pipeline.zcard(self._lru_key)
+        count = pipeline.execute()[-1]
+        excess = count - self.max_entries
+        if excess > 0:
+            evicted = [k for k, _ in client.zpopmin(self._lru_key, excess)]
+            if evicted:
+                client.delete(*(self._entry_key(k) for k in evicted))
+                self.evictions += len(evicted)
+
+    def count(self) -> int:
+        return self._get_client().zcard(self._lru_key)
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+class SemanticIndex:
+    """Embeddings of cached requests, searched for the most similar request.
+
+    Embeddings are normalized and kept as the rows of one float32 matrix, so a
+    lookup is a single matrix-vector product. Requests only match requests of the
+    same scope (model and parameters). Past max_entries, the least recently matched
+    row is replaced. The index is kept in memory and starts empty in each process.
+    """
+
+    def __init__(self, threshold: float, max_entries: int):
+        import numpy as np
+
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._matrix: Optional["np.ndarray"] = None
+        self._scopes = np.zeros(0, dtype=np.int64)
+        self._last_used = np.zeros(0, dtype=np.float64)
+        self._keys: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._scope_ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _grow(self, dim: int) -> None:
+        import numpy as np
+
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        new_capacity = min(max(2 * capacity, 64), self.max_entries)
+        matrix = np.zeros((new_capacity, dim), dtype=np.float32)
+        if self._matrix is not None:
+            matrix[:capacity] = self._matrix
+        self._matrix = matrix
+        self._scopes = np.resize(self._scopes, new_capacity)
+        self._last_used = np.resize(self._last_used, new_capacity)
+
+    def add(self, key: str, embedding: "np.ndarray", scope: str) -> None:
+        import numpy as np
+
+        vector = normalize_vector(embedding)
+        with self._lock:
+            if self._matrix is not None and self._matrix.shape[1] != vector.shape[0]:
+                raise ValueError(
+                    f"Embedding has {vector.shape[0]} dimensions, "
+                    f"expected {self._matrix.shape[1]}"
+                )
+            position = self._positions.get(key)
+            if position is None:
+                size = len(self._keys)
+                if size < self.max_entries:
+                    if self._matrix is None or size == self._matrix.shape[0]:
+                        self._grow(vector.shape[0])
+                    position = size
+                    self._keys.append(key)
+                else:
+                    position = int(np.argmin(self._last_used[:size]))
+                    del self._positions[self._keys[position]]
+                    self._keys[position] = key
+                self._positions[key] = position
+            scope_id = self._scope_ids.setdefault(scope, len(self._scope_ids))
+            assert self._matrix is not None
+            self._matrix[position] = vector
+            self._scopes[position] = scope_id
+            self._last_used[position] = time.monotonic()
+
+    def search(
+        self, embedding: "np.ndarray", scope: str
+    ) -> Optional[Tuple[str, float]]:
+        """Returns the key and cosine similarity of the most similar request in the
+        same scope, if it is at least threshold."""
+        import numpy as np
+
+        vector = normalize_vector(embedding)
+        with self._lock:
+            size = len(self._keys)
+            scope_id = self._scope_ids.get(scope)
+            if self._matrix is None or size == 0 or scope_id is None:
+                return None
+            similarities = self._matrix[:size] @ vector
+            similarities[self._scopes[:size] != scope_id] = -np.inf
+            position = int(np.argmax(similarities))
+            similarity = float(similarities[position])
+            if similarity < self.threshold:
+                return None
+            self._last_used[position] = time.monotonic()
+            return self._keys[position], similarity
+
+    def remove(self, key: str) -> None:
+        """Removes a key by moving the last row into its place."""
+        with self._lock:
+            position = self._positions.pop(key, None)
+            if position is None or self._matrix is None:
+                return
+            last = len(self._keys) - 1
+            last_key = self._keys.pop()
+            if position != last:
+                self._matrix[position] = self._matrix[last]
+                self._scopes[position] = self._scopes[last]
+                self._last_used[position] = self._last_used[last]
+                self._keys[position] = last_key
+                self._positions[last_key] = position
+
+
+def normalize_vector(embedding: Any) -> "np.ndarray":
+    import numpy as np
+
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+@dataclass
+class CacheLookup:
+    """The result of a cache lookup. content is set on a hit."""
+
+    key: str
+    scope: str
+    content: Optional[str] = None
+    # "exact" or "semantic" on a hit
+    kind: Optional[str] = None
+    similarity: Optional[float] = None
+    # Embedding of the request, if the semantic tier is enabled
+    embedding: Optional["np.ndarray"] = None
+
+
+class CompletionCache:
+    """Caches chat completions by request.
+
+    Requests are first looked up by the hash of their normalized form. If that
+    misses and a semantic index is set, the request's messages are embedded and
+    the completion of the most similar cached request is returned, if it is
+    similar enough.
+
+    Store errors are logged and treated as misses, so a cache outage does not fail
+    completions.
+    """
+
+    def __init__(
+        self,
+        store: Any,
+        semantic_index: Optional[SemanticIndex] = None,
+        embed: Optional[Callable[[str], Awaitable[List[float]]]] = None,
+    ):
+        self.store = store
+        self.semantic_index = semantic_index
+        self.embed = embed
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+
+    async def _get(self, key: str) -> Optional[str]:
+        value = await anyio.to_thread.run_sync(self.store.get, key)
+        return json.loads(value)["content"] if value is not None else None
+
+    async def lookup(self, payload: Dict[str, Any]) -> CacheLookup:
+        lookup = CacheLookup(
+            key=get_request_key(payload), scope=get_request_scope(payload)
+        )
+        if not self.enabled:
+            return lookup
+        try:
+            lookup.content = await self._get(lookup.key)
+            if lookup.content is not None:
+                lookup.kind = "exact"
+                self.exact_hits += 1
+                return lookup
+
+            if self.semantic_index is not None and self.embed is not None:
+                lookup.embedding = normalize_vector(
+                    await self.embed(get_request_text(payload))
+                )
+                match = await anyio.to_thread.run_sync(
+                    self.semantic_index.search, lookup.embedding, lookup.scope
+                )
+                if match is not None:
+                    key, similarity = match
+                    lookup.content = await self._get(key)
+                    if lookup.content is None:
+                        # The entry expired or was evicted from the store
+                        self.semantic_index.remove(key)
+                    else:
+                        lookup.kind = "semantic"
+                        lookup.similarity = similarity
+                        self.semantic_hits += 1
+                        return lookup
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Completion cache lookup failed: {e}")
+        self.misses += 1
+        return lookup
+
+    async def put(self, lookup: CacheLookup, content: str) -> None:
+        """Stores the completion of a request that missed the cache."""
+        if not self.enabled:
+            return
+        value = json.dumps({"content": content, "created_at": time.time()})
+        try:
+            await anyio.to_thread.run_sync(self.store.set, lookup.key, value)
+            if self.semantic_index is not None and lookup.embedding is not None:
+                self.semantic_index.add(lookup.key, lookup.embedding, lookup.scope)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Completion cache write failed: {e}")
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.close()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": (
+                round((self.exact_hits + self.semantic_hits) / lookups, 4)
+                if lookups
+                else 0.0
+            ),
+            "evictions": self.store.evictions if self.store is not None else 0,
+            "semantic_entries": (
+                len(self.semantic_index) if self.semantic_index is not None else 0
+            ),
+        }
+
+
+def create_completion_cache() -> CompletionCache:
+    """Creates the completion cache configured by api_settings."""
+    store: Any = None
+    if api_settings.completion_cache == "disk":
+        store = DiskCacheStore(
+            path=api_settings.completion_cache_path,
+            ttl=api_settings.completion_cache_ttl,
+            max_entries=api_settings.completion_cache_max_entries,
+        )
+    elif api_settings.completion_cache == "redis":
+        store = RedisCacheStore(
+            host=api_settings.redis_host or "localhost",
+            port=int(api_settings.redis_port or 6379),
+            db=int(api_settings.redis_schema or 0),
+            password=api_settings.redis_pass,
+            ttl=api_settings.completion_cache_ttl,
+            max_entries=api_settings.completion_cache_max_entries,
+        )
+
+    semantic_index = None
+    if api_settings.completion_cache_semantic:
+        semantic_index = SemanticIndex(
+            threshold=api_settings.completion_cache_similarity,
+            max_entries=api_settings.completion_cache_semantic_max_entries,
+        )
+    return CompletionCache(
+        store=store,
+        semantic_index=semantic_index,
+        embed=completion_client.create_embedding,
+    )
+
+
+# Create CompletionCache object
+completion_cache = create_completion_cache()
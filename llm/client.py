@@ -0,0 +1,251 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from api.settings import api_settings
+from utils.log import logger
+
+
+class UpstreamError(Exception):
+    """Raised when the completion api returns an error response.
+
+    retry_after is the seconds the api asked callers to wait, if it did.
+    """
+
+    def __init__(
+        self, status_code: int, detail: str, retry_after: Optional[float] = None
+    ):
+        super().__init__(f"Upstream returned {status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+def get_retry_after(response: httpx.Response) -> Optional[float]:
+    """Returns the Retry-After header of a response in seconds, if it is set."""
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+class CompletionsBusy(Exception):
+    """Raised when no upstream stream slot frees up within the queue timeout."""
+
+
+class StreamSlot:
+    """A reserved upstream stream. release() can be called more than once."""
+
+    def __init__(self, client: "CompletionClient"):
+        self._client = client
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._client._release()
+
+
+class CompletionClient:
+    """An async client for an OpenAI compatible chat completion api.
+
+    All requests share one pooled httpx.AsyncClient, so streams are served by the
+    event loop rather than by threadpool workers. At most max_streams requests run
+    upstream at a time; further requests wait up to queue_timeout seconds for a slot
+    and are then rejected, so a slow upstream pushes back on callers instead of
+    piling up open connections.
+
+    The http client and semaphore are created on first use, in the event loop
+    that uses them.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: Optional[str],
+        max_streams: int,
+        queue_timeout: float,
+        max_connections: int,
+        timeout: float,
+        embedding_model: str = "text-embedding-ada-002",
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.max_streams = max_streams
+        self.queue_timeout = queue_timeout
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.embedding_model = embedding_model
+        self.transport = transport
+
+        self.active = 0
+        self.waiting = 0
+        self.started = 0
+        self.rejected = 0
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def get_http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None:
+            headers = {}
+            if self.api_key is not None:
+                headers["Authorization"] = f"Bearer {self.api_key}"
+            self._http_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                # Streams can pause between tokens for longer than a normal read
+                timeout=httpx.Timeout(self.timeout, connect=10),
+                transport=self.transport,
+            )
+        return self._http_client
+
+    async def aclose(self) -> None:
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+        self._semaphore = None
+
+    async def acquire(self) -> StreamSlot:
+        """Reserves an upstream stream. Raises CompletionsBusy if none frees up
+        within queue_timeout seconds."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_streams)
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+        elif self.queue_timeout <= 0:
+            self.rejected += 1
+            raise CompletionsBusy(f"All {self.max_streams} completion streams are busy")
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise CompletionsBusy(
+                    f"All {self.max_streams} completion streams are busy "
+                    f"after waiting {self.queue_timeout}s"
+                )
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        self.started += 1
+        return StreamSlot(self)
+
+    def _release(self) -> None:
+        self.active -= 1
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    async def open_chat_stream(self, payload: Dict[str, Any]) -> httpx.Response:
+        """Sends a streaming chat completion request and returns the response once
+        its headers arrive. Raises UpstreamError for error responses.
+
+        The caller must close the response, which also stops the upstream stream.
+        """
+        client = self.get_http_client()
+        request = client.build_request(
+            "POST", "/chat/completions", json={**payload, "stream": True}
+        )
+        response = await client.send(request, stream=True)
+        if response.status_code != 200:
+            detail = (await response.aread()).decode(errors="replace")
+            await response.aclose()
+            raise UpstreamError(response.status_code, detail, get_retry_after(response))
+        return response
+
+    async def create_chat_completion(self, payload: Dict[str, Any]) -> str:
+        """Returns the content of a chat completion, without streaming.
+        Takes a stream slot while the request runs."""
+        slot = await self.acquire()
+        try:
+            response = await self.get_http_client().post(
+                "/chat/completions", json={**payload, "stream": False}
+            )
+        finally:
+            slot.release()
+        if response.status_code != 200:
+            raise UpstreamError(
+                response.status_code, response.text, get_retry_after(response)
+            )
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def stream_chat(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        """Yields the content of each streamed chat completion chunk.
+
+        Takes a stream slot for the duration of the stream. Closing the iterator
+        closes the upstream stream.
+        """
+        slot = await self.acquire()
+        try:
+            response = await self.open_chat_stream(payload)
+            try:
+                async for content in iter_chat_stream(response):
+                    yield content
+            finally:
+                await response.aclose()
+        finally:
+            slot.release()
+
+    async def create_embedding(self, text: str) -> List[float]:
+        """Returns the embedding of text. Raises UpstreamError for error responses.
+
+        Embeddings are short requests and do not take a stream slot.
+        """
+        response = await self.get_http_client().post(
+            "/embeddings", json={"model": self.embedding_model, "input": text}
+        )
+        if response.status_code != 200:
+            raise UpstreamError(
+                response.status_code, response.text, get_retry_after(response)
+            )
+        return response.json()["data"][0]["embedding"]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "started": self.started,
+            "rejected": self.rejected,
+        }
+
+
+async def iter_chat_stream(response: httpx.Response) -> AsyncIterator[str]:
+    """Yields the delta content of each server-sent event of a chat completion
+    stream, until the [DONE] event."""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:") :].strip()
+        if data == "[DONE]":
+            return
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            logger.warning(f"Skipping malformed completion chunk: {data[:100]}")
+            continue
+        # Chunks without a delta, such as usage chunks, are skipped
+        choices = chunk.get("choices") if isinstance(chunk, dict) else None
+        choice = choices[0] if isinstance(choices, list) and choices else None
+        delta = choice.get("delta") if isinstance(choice, dict) else None
+        content = delta.get("content") if isinstance(delta, dict) else None
+        if isinstance(content, str):
+            yield content
+
+
+# Create CompletionClient object
+completion_client = CompletionClient(
+    base_url=api_settings.openai_base_url,
+    api_key=api_settings.openai_api_key,
+    max_streams=api_settings.openai_max_streams,
+    queue_timeout=api_settings.openai_queue_timeout,
+    max_connections=api_settings.openai_max_connections,
+    timeout=api_settings.openai_timeout,
+    embedding_model=api_settings.openai_embedding_model,
+)
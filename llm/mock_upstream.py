@@ -0,0 +1,168 @@
+"""A local stand-in for the OpenAI chat completion api, for tests and benchmarks.
+
+Replies to POST /chat/completions with `chunks` tokens, sent `delay` seconds apart
+when streaming. Counts requests, open streams and streams the client closed early.
+With max_concurrent set, requests beyond that many in flight get a 429 with a
+Retry-After of retry_after seconds, like a rate limited api.
+POST /embeddings returns a hashed bag of words, so texts that share most of their
+words have similar embeddings.
+
+Usage:
+    $ MOCK_OPENAI_DELAY=0.05 uvicorn llm.mock_upstream:app --port 8100
+    $ OPENAI_BASE_URL=http://127.0.0.1:8100 OPENAI_API_KEY=test api start
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class MockStats:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.embedding_requests = 0
+        self.in_flight = 0
+        self.rate_limited = 0
+        self.streams_active = 0
+        self.streams_completed = 0
+        # Streams closed by the client before the last token was sent
+        self.streams_cancelled = 0
+
+
+def get_tokens(messages: List[Dict[str, Any]], chunks: int) -> List[str]:
+    prompt = str(messages[-1].get("content", "")) if messages else ""
+    return [f"{prompt[:8]}-{i} " for i in range(chunks)]
+
+
+def get_embedding(text: str, dim: int = 256) -> List[float]:
+    embedding = [0.0] * dim
+    for word in re.findall(r"\w+", text.lower()):
+        embedding[int(hashlib.md5(word.encode()).hexdigest(), 16) % dim] += 1.0
+    return embedding
+
+
+def create_mock_app(
+    chunks: int = 20,
+    delay: float = 0.0,
+    max_concurrent: int = 0,
+    retry_after: float = 0.1,
+) -> FastAPI:
+    app = FastAPI()
+    stats = MockStats()
+    app.state.stats = stats
+
+    def get_chunk(model: str, content: Any, finish_reason: Any = None) -> str:
+        chunk = {
+            "id": "chatcmpl-mock",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "delta": {} if content is None else {"content": content},
+                    "finish_reason": finish_reason,
+                }
+            ],
+        }
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        stats.requests += 1
+        if max_concurrent and stats.in_flight >= max_concurrent:
+            stats.rate_limited += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "requests"}},
+                status_code=429,
+                headers={"Retry-After": f"{retry_after:g}"},
+            )
+        body = await request.json()
+        model = body.get("model", "mock")
+        tokens = get_tokens(body.get("messages", []), chunks)
+
+        if not body.get("stream"):
+            stats.in_flight += 1
+            try:
+                await asyncio.sleep(delay * len(tokens))
+            finally:
+                stats.in_flight -= 1
+            return JSONResponse(
+                {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {
+                                "role": "assistant",
+                                "content": "".join(tokens),
+                            },
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {"completion_tokens": len(tokens)},
+                }
+            )
+
+        async def events() -> AsyncIterator[str]:
+            stats.streams_active += 1
+            stats.in_flight += 1
+            completed = False
+            try:
+                for token in tokens:
+                    if delay:
+                        await asyncio.sleep(delay)
+                    yield get_chunk(model, token)
+                yield get_chunk(model, None, finish_reason="stop")
+                yield "data: [DONE]\n\n"
+                completed = True
+            finally:
+                stats.streams_active -= 1
+                stats.in_flight -= 1
+                if completed:
+                    stats.streams_completed += 1
+                else:
+                    stats.streams_cancelled += 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/embeddings")
+    async def embeddings(request: Request):
+        stats.embedding_requests += 1
+        body = await request.json()
+        inputs = body.get("input", "")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        return {
+            "object": "list",
+            "model": body.get("model", "mock"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": get_embedding(text)}
+                for i, text in enumerate(inputs)
+            ],
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return vars(stats)
+
+    return app
+
+
+# Create mock app, configured using environment variables
+app = create_mock_app(
+    chunks=int(os.getenv("MOCK_OPENAI_CHUNKS", "20")),
+    delay=float(os.getenv("MOCK_OPENAI_DELAY", "0")),
+    max_concurrent=int(os.getenv("MOCK_OPENAI_MAX_CONCURRENT", "0")),
+    retry_after=float(os.getenv("MOCK_OPENAI_RETRY_AFTER", "0.1")),
+)
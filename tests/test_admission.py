@@ -0,0 +1,80 @@
+import asyncio
+from typing import List
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from api.admission import (
+    AdmissionController,
+    AdmissionLimiter,
+    AdmissionMiddleware,
+    AdmissionRejected,
+)
+
+
+def create_limiter(**kwargs) -> AdmissionLimiter:
+    settings = dict(
+        name="run",
+        rate=0,
+        burst=1,
+        client_rate=0,
+        client_burst=1,
+        max_concurrent=1,
+        max_queue=10,
+        queue_target=0.05,
+    )
+    settings.update(kwargs)
+    return AdmissionLimiter(**settings)
+
+
+def test_slow_requests_are_shed():
+    limiter = create_limiter()
+    # Each request takes longer than the queue target, so none can wait
+    limiter.service_time = 0.1
+
+    async def request(results: List[str]) -> None:
+        try:
+            await limiter.acquire()
+        except AdmissionRejected as e:
+            results.append(str(e.status_code))
+            return
+        await asyncio.sleep(0.1)
+        limiter.release(0.1)
+        results.append("ok")
+
+    async def run() -> List[str]:
+        results: List[str] = []
+        await asyncio.gather(*(request(results) for _ in range(5)))
+        return results
+
+    results = asyncio.run(run())
+    assert sorted(results) == ["503"] * 4 + ["ok"]
+    assert limiter.stats()["shed"] == 4 and limiter.active == 0
+
+
+def test_clients_are_rate_limited():
+    async def run_job(request):
+        return JSONResponse({"id_job_run": 1})
+
+    limiter = create_limiter(client_rate=1, client_burst=2, max_concurrent=8)
+    controller = AdmissionController(
+        {("POST", "/run"): limiter}, client_header="X-Client"
+    )
+    app = AdmissionMiddleware(
+        Starlette(routes=[Route("/run", run_job, methods=["POST"])]), controller
+    )
+
+    async def run() -> List[httpx.Response]:
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            responses = [
+                await client.post("/run", headers={"X-Client": "a"}) for _ in range(3)
+            ]
+            responses.append(await client.post("/run", headers={"X-Client": "b"}))
+            return responses
+
+    responses = asyncio.run(run())
+    assert [r.status_code for r in responses] == [200, 200, 429, 200]
+    assert responses[2].headers["retry-after"] == "1"
+    assert limiter.stats()["rate_limited"] == 1
@@ -0,0 +1,53 @@
+from datetime import datetime
+from typing import List
+
+import pyarrow.parquet as pq
+
+from jobs.archive import ArchiveIndex, get_latest_archived_job_run, write_archive
+
+
+def get_run(id_job_run: int, job_name: str, start_ts: datetime) -> dict:
+    return {
+        "id_job_run": id_job_run,
+        "job_name": job_name,
+        "status": "success",
+        "start_ts": start_ts,
+        "end_ts": start_ts,
+    }
+
+
+def test_latest_archived_run(tmp_path, monkeypatch):
+    archive_uri = str(tmp_path)
+    write_archive(
+        [
+            get_run(1, "a", datetime(2026, 10, 1, 3)),
+            get_run(2, "a", datetime(2026, 10, 2, 3)),
+            get_run(3, "b", datetime(2026, 10, 1, 4)),
+            get_run(4, "a", datetime(2026, 10, 2, 1)),
+        ],
+        archive_uri,
+    )
+    assert get_latest_archived_job_run("a", archive_uri)["id_job_run"] == 2
+    assert get_latest_archived_job_run("b", archive_uri)["id_job_run"] == 3
+
+    reads: List[str] = []
+    read_table = pq.read_table
+
+    def count_reads(path, *args, **kwargs):
+        reads.append(path)
+        return read_table(path, *args, **kwargs)
+
+    monkeypatch.setattr(pq, "read_table", count_reads)
+    # Unknown job names are answered from the index, without reading a shard
+    assert get_latest_archived_job_run("never-ran", archive_uri) is None
+    assert reads == []
+
+    # Files archived later are indexed on the next lookup
+    write_archive([get_run(5, "b", datetime(2026, 10, 3))], archive_uri)
+    assert get_latest_archived_job_run("b", archive_uri)["id_job_run"] == 5
+    assert len(reads) == 1
+
+
+def test_index_of_missing_archive(tmp_path):
+    archive_index = ArchiveIndex(str(tmp_path.joinpath("missing")))
+    assert archive_index.get_latest_date("a") is None
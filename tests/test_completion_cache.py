@@ -0,0 +1,110 @@
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from llm.cache import CompletionCache, DiskCacheStore, SemanticIndex
+from llm.mock_upstream import create_mock_app
+from tests.test_completions import get_api_app, get_client, run_server
+
+
+def get_payload(content: str, **params) -> dict:
+    return {
+        "model": "mock",
+        "messages": [{"role": "user", "content": content}],
+        **params,
+    }
+
+
+def test_exact_hits_skip_upstream(tmp_path):
+    mock_app = create_mock_app(chunks=5)
+    stats = mock_app.state.stats
+    store = DiskCacheStore(str(tmp_path.joinpath("cache.db")), ttl=60, max_entries=10)
+    cache = CompletionCache(store=store)
+    with run_server(mock_app) as upstream_url:
+        with TestClient(get_api_app(get_client(upstream_url), cache)) as api:
+            first = api.post("/v1/completions/chat", json=get_payload("hello"))
+            # Surrounding whitespace is normalized away
+            second = api.post("/v1/completions/chat", json=get_payload(" hello\r\n"))
+            skipped = api.post(
+                "/v1/completions/chat", json={**get_payload("hello"), "cache": False}
+            )
+
+    assert first.headers["x-cache"] == "miss"
+    assert second.headers["x-cache"] == "exact"
+    assert "x-cache" not in skipped.headers
+    assert second.text.split("\n\n")[0] == 'data: {"content": "hello-0 hello-1 ' + (
+        'hello-2 hello-3 hello-4 "}'
+    )
+    assert stats.requests == 2
+    assert cache.stats()["exact_hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_semantic_hits_match_similar_requests(tmp_path):
+    mock_app = create_mock_app(chunks=2)
+    stats = mock_app.state.stats
+    with run_server(mock_app) as upstream_url:
+        client = get_client(upstream_url)
+        cache = CompletionCache(
+            store=DiskCacheStore(
+                str(tmp_path.joinpath("c.db")), ttl=60, max_entries=10
+            ),
+            semantic_index=SemanticIndex(threshold=0.9, max_entries=10),
+            embed=client.create_embedding,
+        )
+        prompt = "what is the capital city of france and how many people live there"
+        with TestClient(get_api_app(client, cache)) as api:
+            api.post("/v1/completions/chat", json=get_payload(prompt))
+            similar_prompt = prompt.replace("france", "france today")
+            similar = api.post("/v1/completions/chat", json=get_payload(similar_prompt))
+            # Requests with other parameters are not matched
+            other_params = api.post(
+                "/v1/completions/chat", json=get_payload(similar_prompt, temperature=1)
+            )
+            unrelated = api.post("/v1/completions/chat", json=get_payload("hi there"))
+
+    assert similar.headers["x-cache"] == "semantic"
+    assert other_params.headers["x-cache"] == "miss"
+    assert unrelated.headers["x-cache"] == "miss"
+    assert stats.requests == 3
+    assert stats.embedding_requests == 4
+    assert cache.stats()["semantic_hits"] == 1
+    assert cache.stats()["semantic_entries"] == 3
+
+
+def test_disk_store_evicts_least_recently_read(tmp_path):
+    store = DiskCacheStore(str(tmp_path.joinpath("cache.db")), ttl=60, max_entries=2)
+    store.PURGE_INTERVAL = 1
+    store.set("a", "1")
+    store.set("b", "2")
+    assert store.get("a") == "1"
+    store.set("c", "3")
+    assert store.get("b") is None
+    assert store.get("a") == "1"
+    assert store.evictions == 1
+
+    store.ttl = -1
+    store.set("d", "4")
+    assert store.get("d") is None
+    store.close()
+
+
+def test_semantic_index_search_and_eviction():
+    index = SemanticIndex(threshold=0.9, max_entries=2)
+    index.add("x", np.array([1.0, 0.0]), scope="s")
+    index.add("y", np.array([0.0, 1.0]), scope="s")
+    assert index.search(np.array([0.99, 0.1]), scope="s")[0] == "x"
+    assert index.search(np.array([0.99, 0.1]), scope="other") is None
+    assert index.search(np.array([1.0, 1.0]), scope="s") is None
+
+    time.sleep(0.01)
+    # x was matched more recently than y, so y is replaced
+    index.search(np.array([1.0, 0.0]), scope="s")
+    index.add("z", np.array([-1.0, 0.0]), scope="s")
+    assert len(index) == 2
+    assert index.search(np.array([0.0, 1.0]), scope="s") is None
+
+    index.remove("x")
+    assert index.search(np.array([-1.0, 0.1]), scope="s")[0] == "z"
+    assert len(index) == 1
@@ -0,0 +1,227 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import httpx
+import pytest
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from api.routes.completions import (
+    completions_router,
+    get_completion_cache,
+    get_completion_client,
+)
+from llm.cache import CacheLookup, CompletionCache
+from llm.client import CompletionClient, CompletionsBusy
+from llm.mock_upstream import create_mock_app
+
+PAYLOAD = {"model": "mock", "messages": [{"role": "user", "content": "hello"}]}
+
+
+@contextmanager
+def run_server(app: FastAPI) -> Iterator[str]:
+    """Runs app under uvicorn on a background thread and yields its base url."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def get_client(base_url: str, max_streams: int = 10, queue_timeout: float = 1):
+    return CompletionClient(
+        base_url=base_url,
+        api_key="test",
+        max_streams=max_streams,
+        queue_timeout=queue_timeout,
+        max_connections=10,
+        timeout=10,
+    )
+
+
+def get_api_app(
+    client: CompletionClient, cache: Optional[CompletionCache] = None
+) -> FastAPI:
+    # Completions are not cached unless a cache is given
+    cache = cache or CompletionCache(store=None)
+    app = FastAPI()
+    app.include_router(completions_router, prefix="/v1")
+    app.dependency_overrides[get_completion_client] = lambda: client
+    app.dependency_overrides[get_completion_cache] = lambda: cache
+    app.add_event_handler("shutdown", client.aclose)
+    return app
+
+
+def wait_for(condition, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def test_chat_completion_streams_events():
+    mock_app = create_mock_app(chunks=5)
+    with run_server(mock_app) as upstream_url:
+        client = get_client(upstream_url)
+        with TestClient(get_api_app(client)) as api:
+            response = api.post("/v1/completions/chat", json=PAYLOAD)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [line for line in response.text.split("\n\n") if line]
+    assert len(events) == 6
+    assert events[0] == 'data: {"content": "hello-0 "}'
+    assert events[-1] == "data: [DONE]"
+    assert client.active == 0
+
+
+def create_malformed_app() -> FastAPI:
+    """An upstream that mixes chunks of the wrong shape in with valid ones."""
+    app = FastAPI()
+    chunks = [
+        {"choices": [{"delta": {"content": "a"}}]},
+        {"choices": [None]},
+        {"choices": [{"delta": None}]},
+        {"choices": "a"},
+        ["a"],
+        {"choices": [{"delta": {"content": 1}}]},
+        {"choices": []},
+        {"choices": [{"delta": {"content": "b"}}]},
+    ]
+
+    @app.post("/chat/completions")
+    async def chat_completions():
+        async def events():
+            for chunk in chunks:
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def test_malformed_chunks_are_skipped():
+    with run_server(create_malformed_app()) as upstream_url:
+        client = get_client(upstream_url)
+        with TestClient(get_api_app(client)) as api:
+            response = api.post("/v1/completions/chat", json=PAYLOAD)
+
+    events = [line for line in response.text.split("\n\n") if line]
+    assert events == [
+        'data: {"content": "a"}',
+        'data: {"content": "b"}',
+        "data: [DONE]",
+    ]
+    assert client.active == 0
+
+
+class FailingCache(CompletionCache):
+    """Misses every lookup and fails to store completions."""
+
+    def __init__(self) -> None:
+        super().__init__(store=object())
+
+    async def lookup(self, payload):
+        return CacheLookup(key="key", scope="scope")
+
+    async def put(self, lookup, content):
+        raise RuntimeError("cache is broken")
+
+
+def test_stream_errors_end_the_stream():
+    mock_app = create_mock_app(chunks=2)
+    with run_server(mock_app) as upstream_url:
+        client = get_client(upstream_url)
+        with TestClient(get_api_app(client, FailingCache())) as api:
+            response = api.post("/v1/completions/chat", json=PAYLOAD)
+
+    events = [line for line in response.text.split("\n\n") if line]
+    assert len(events) == 3
+    assert events[-1] == 'event: error\ndata: {"detail": "Completion stream failed"}'
+    assert client.active == 0
+
+
+def test_chat_completion_without_api_key():
+    client = get_client("http://127.0.0.1:1")
+    client.api_key = None
+    with TestClient(get_api_app(client)) as api:
+        response = api.post("/v1/completions/chat", json=PAYLOAD)
+    assert response.status_code == 503
+
+
+def test_client_disconnect_stops_upstream_stream():
+    mock_app = create_mock_app(chunks=100, delay=0.05)
+    stats = mock_app.state.stats
+    client = get_client("")
+
+    async def read_first_event(api_url: str) -> str:
+        async with httpx.AsyncClient(base_url=api_url) as http:
+            async with http.stream("POST", "/v1/completions/chat", json=PAYLOAD) as r:
+                async for line in r.aiter_lines():
+                    if line:
+                        return line
+        return ""
+
+    with run_server(mock_app) as upstream_url:
+        client.base_url = upstream_url
+        with run_server(get_api_app(client)) as api_url:
+            assert asyncio.run(read_first_event(api_url)).startswith("data:")
+            wait_for(lambda: stats.streams_cancelled == 1)
+            wait_for(lambda: client.active == 0)
+    assert stats.streams_completed == 0
+
+
+def test_closing_stream_stops_upstream_stream():
+    mock_app = create_mock_app(chunks=100, delay=0.05)
+    stats = mock_app.state.stats
+
+    async def read_first_chunk(client: CompletionClient) -> str:
+        stream = client.stream_chat(PAYLOAD)
+        content = await stream.__anext__()
+        await stream.aclose()
+        await client.aclose()
+        return content
+
+    with run_server(mock_app) as upstream_url:
+        client = get_client(upstream_url)
+        assert asyncio.run(read_first_chunk(client)) == "hello-0 "
+        wait_for(lambda: stats.streams_cancelled == 1)
+    assert client.active == 0
+
+
+def test_stream_slots_are_capped():
+    async def acquire_slots() -> None:
+        client = get_client("http://127.0.0.1:1", max_streams=1, queue_timeout=0)
+        slot = await client.acquire()
+        with pytest.raises(CompletionsBusy):
+            await client.acquire()
+        slot.release()
+        # Releasing twice does not free a second slot
+        slot.release()
+        slot = await client.acquire()
+        with pytest.raises(CompletionsBusy):
+            await client.acquire()
+        assert client.stats() == {
+            "active": 1,
+            "waiting": 0,
+            "started": 2,
+            "rejected": 2,
+        }
+
+    asyncio.run(acquire_slots())
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from jobs.cron import CronSchedule, parse_cron_field
+
+
+def test_parse_cron_field():
+    assert parse_cron_field("*", 0, 6) == set(range(7))
+    assert parse_cron_field("1-5", 0, 7) == {1, 2, 3, 4, 5}
+    assert parse_cron_field("0,30", 0, 59) == {0, 30}
+    assert parse_cron_field("*/15", 0, 59) == {0, 15, 30, 45}
+    assert parse_cron_field("10-50/10", 0, 59) == {10, 20, 30, 40, 50}
+    # A single value with a step runs from the value to the end of the range
+    assert parse_cron_field("5/20", 0, 59) == {5, 25, 45}
+    assert parse_cron_field("1-3,20-21", 1, 31) == {1, 2, 3, 20, 21}
+
+
+@pytest.mark.parametrize(
+    "field", ["60", "5-1", "*/0", "0-60", "a", "-1"], ids=lambda field: field
+)
+def test_invalid_cron_fields(field):
+    with pytest.raises(ValueError):
+        parse_cron_field(field, 0, 59)
+
+
+def test_cron_expression_needs_5_fields():
+    with pytest.raises(ValueError):
+        CronSchedule("* * * *")
+
+
+@pytest.mark.parametrize(
+    "expression, after, expected",
+    [
+        (
+            "*/15 * * * *",
+            datetime(2026, 10, 18, 10, 7, 30),
+            datetime(2026, 10, 18, 10, 15),
+        ),
+        # Strictly after, so a matching time moves on to the next one
+        ("*/15 * * * *", datetime(2026, 10, 18, 10, 45), datetime(2026, 10, 18, 11, 0)),
+        ("30 9 * * 1-5", datetime(2026, 10, 16, 10, 0), datetime(2026, 10, 19, 9, 30)),
+        # 7 is Sunday, as is 0
+        ("0 12 * * 7", datetime(2026, 10, 17, 12, 0), datetime(2026, 10, 18, 12, 0)),
+        ("0 12 * * 0", datetime(2026, 10, 17, 12, 0), datetime(2026, 10, 18, 12, 0)),
+        # Months without a 31st are skipped
+        ("0 0 31 * *", datetime(2026, 4, 1), datetime(2026, 5, 31)),
+        ("0 0 29 2 *", datetime(2026, 3, 1), datetime(2028, 2, 29)),
+        ("0 0 1 1 *", datetime(2026, 12, 15), datetime(2027, 1, 1)),
+        (
+            "59 23 31 12 *",
+            datetime(2026, 12, 31, 23, 59),
+            datetime(2027, 12, 31, 23, 59),
+        ),
+    ],
+)
+def test_next_after(expression, after, expected):
+    assert CronSchedule(expression).next_after(after) == expected
+
+
+def test_day_of_month_or_day_of_week():
+    # Both restricted: the 13th of the month and every Friday
+    either = CronSchedule("0 0 13 * 5")
+    times = either.times_between(datetime(2026, 10, 31), datetime(2026, 12, 31))
+    days = [datetime(2026, 11, 1) + timedelta(days=i) for i in range(61)]
+    assert times == [d for d in days if d.day == 13 or d.weekday() == 4]
+    # Only one restricted: only that one counts
+    thirteenths = CronSchedule("0 0 13 * *").times_between(
+        datetime(2026, 1, 1), datetime(2026, 12, 31)
+    )
+    assert thirteenths == [datetime(2026, month, 13) for month in range(1, 13)]
+    fridays = CronSchedule("0 0 * * 5").times_between(
+        datetime(2026, 10, 31), datetime(2026, 12, 31)
+    )
+    assert fridays == [d for d in days if d.weekday() == 4]
+
+
+def test_times_between_keeps_the_latest():
+    hourly = CronSchedule("0 * * * *")
+    start, end = datetime(2026, 10, 18), datetime(2026, 10, 18, 5)
+    assert len(hourly.times_between(start, end)) == 5
+    assert hourly.times_between(start, end, limit=2) == [
+        datetime(2026, 10, 18, 4),
+        datetime(2026, 10, 18, 5),
+    ]
+    assert hourly.times_between(end, end) == []
+
+
+def test_never_matching_expression():
+    with pytest.raises(ValueError, match="never matches"):
+        CronSchedule("0 0 30 2 *").next_after(datetime(2026, 1, 1))
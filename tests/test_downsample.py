@@ -0,0 +1,80 @@
+import math
+
+import numpy as np
+import pytest
+
+from utils.downsample import downsample, lttb_indices, minmax_indices
+
+
+def reference_lttb(x, y, n_out):
+    """LTTB as in Steinarsson (2013), one point at a time."""
+    n = len(x)
+    every = (n - 2) / (n_out - 2)
+    a = 0
+    sampled = [0]
+    for i in range(n_out - 2):
+        if i == n_out - 3:
+            next_x, next_y = x[n - 1], y[n - 1]
+        else:
+            start = int(math.floor((i + 1) * every)) + 1
+            end = min(int(math.floor((i + 2) * every)) + 1, n)
+            next_x = sum(x[start:end]) / (end - start)
+            next_y = sum(y[start:end]) / (end - start)
+        best_area = -1.0
+        for j in range(
+            int(math.floor(i * every)) + 1, int(math.floor((i + 1) * every)) + 1
+        ):
+            area = abs(
+                (x[a] - next_x) * (y[j] - y[a]) - (x[a] - x[j]) * (next_y - y[a])
+            )
+            if area > best_area:
+                best_area = area
+                best = j
+        sampled.append(best)
+        a = best
+    sampled.append(n - 1)
+    return sampled
+
+
+def test_lttb_matches_reference():
+    rng = np.random.default_rng(0)
+    for n, n_out in [(1000, 50), (997, 100), (500, 3)]:
+        x = np.sort(rng.random(n)) * 100
+        y = rng.standard_normal(n).cumsum()
+        assert lttb_indices(x, y, n_out).tolist() == reference_lttb(
+            x.tolist(), y.tolist(), n_out
+        )
+
+
+def test_minmax_keeps_extremes():
+    y = np.random.default_rng(1).standard_normal(10_001).cumsum()
+    indices = minmax_indices(y, 100)
+    assert len(indices) <= 100
+    assert np.all(np.diff(indices) > 0)
+    assert {0, len(y) - 1, int(y.argmin()), int(y.argmax())} <= set(indices.tolist())
+
+
+@pytest.mark.parametrize("n_out", [1, 2, 3, 4, 5])
+def test_minmax_few_points(n_out):
+    y = np.random.default_rng(2).standard_normal(1000).cumsum()
+    indices = minmax_indices(y, n_out)
+    assert 0 < len(indices) <= n_out
+    assert indices[0] == 0
+    if n_out >= 2:
+        assert indices[-1] == len(y) - 1
+    if n_out == 3:
+        extreme = int(np.abs(y - y.mean()).argmax())
+        assert indices.tolist() == sorted([0, extreme, len(y) - 1])
+    if n_out >= 4:
+        assert {int(y.argmin()), int(y.argmax())} <= set(indices.tolist())
+
+
+def test_downsample_viewport():
+    x = np.arange(10_000, dtype=np.float64)
+    y = np.sin(x / 100)
+    x_out, _ = downsample(x, y, 50, x_min=1000, x_max=2000)
+    assert len(x_out) == 50
+    # The points next to the viewport are kept, so lines reach its edges
+    assert x_out[0] == 999 and x_out[-1] == 2001
+    x_out, _ = downsample(x, y, 50, x_min=1000, x_max=1010)
+    assert x_out.tolist() == list(range(999, 1012))
@@ -0,0 +1,107 @@
+from typing import List, Tuple
+
+import pytest
+
+import jobs.engine
+from jobs.engine import JobEngine, JobQueueFull
+from jobs.status import job_run_status
+
+
+@pytest.fixture
+def statuses(monkeypatch) -> List[Tuple[int, str, bool]]:
+    """Records the statuses the engine writes instead of updating job_runs."""
+    written: List[Tuple[int, str, bool]] = []
+
+    def update_job_run_status(db, id_job_run, status, ended=False):
+        written.append((id_job_run, status, ended))
+
+    monkeypatch.setattr(jobs.engine, "update_job_run_status", update_job_run_status)
+    return written
+
+
+@pytest.fixture
+def engine():
+    engine = JobEngine(pool_size=1, queue_depth=2)
+    engine.start()
+    yield engine
+    engine.shutdown(wait=True)
+
+
+def test_slots_are_reserved_and_released(engine):
+    engine.reserve()
+    assert engine.reserve_many(5) == 2
+    with pytest.raises(JobQueueFull):
+        engine.reserve()
+    assert engine.reserve_many(1) == 0
+
+    engine.release(2)
+    assert engine.reserve_many(5) == 2
+    engine.release(3)
+    # Releasing more slots than were reserved is a bug in the caller
+    with pytest.raises(ValueError):
+        engine.release()
+
+
+def test_jobs_free_their_slot_when_done(engine, statuses):
+    engine.reserve_many(3)
+    futures = [engine.submit(i, "test", lambda: "done") for i in range(3)]
+    assert [f.result() for f in futures] == ["done"] * 3
+    # Each job released its slot when it ended, successful or not
+    assert engine.reserve_many(5) == 3
+    engine.release(3)
+    engine.reserve()
+    engine.submit(3, "test", lambda: 1 / 0).result()
+    assert engine.reserve_many(5) == 3
+
+
+def test_status_transitions_and_listeners(engine, statuses):
+    notified: List[Tuple[int, str, str]] = []
+    engine.add_status_listener(lambda *args: notified.append(args))
+
+    def failing_listener(id_job_run, job_name, status):
+        raise RuntimeError("listener failed")
+
+    # A failing listener does not stop the job or the other listeners
+    engine.add_status_listener(failing_listener)
+
+    def job(seconds: int, id_job_run: int) -> int:
+        # Jobs that take an id_job_run are passed the id of their run
+        return id_job_run * seconds
+
+    engine.reserve_many(2)
+    assert engine.submit(7, "ok", job, {"seconds": 2}).result() == 14
+    engine.submit(8, "broken", lambda: 1 / 0).result()
+
+    assert statuses == [
+        (7, job_run_status.RUNNING, False),
+        (7, job_run_status.SUCCESS, True),
+        (8, job_run_status.RUNNING, False),
+        (8, job_run_status.FAILED, True),
+    ]
+    assert notified == [
+        (7, "ok", job_run_status.QUEUED),
+        (7, "ok", job_run_status.RUNNING),
+        (7, "ok", job_run_status.SUCCESS),
+        (8, "broken", job_run_status.QUEUED),
+        (8, "broken", job_run_status.RUNNING),
+        (8, "broken", job_run_status.FAILED),
+    ]
+
+
+def test_status_write_errors_do_not_fail_jobs(engine, monkeypatch):
+    def update_job_run_status(db, id_job_run, status, ended=False):
+        raise RuntimeError("database is down")
+
+    monkeypatch.setattr(jobs.engine, "update_job_run_status", update_job_run_status)
+    notified: List[str] = []
+    engine.add_status_listener(lambda id_job_run, name, status: notified.append(status))
+    engine.reserve()
+    assert engine.submit(1, "test", lambda: "done").result() == "done"
+    assert notified[-1] == job_run_status.SUCCESS
+    assert engine.reserve_many(5) == 3
+
+
+def test_submit_needs_a_running_engine():
+    engine = JobEngine(pool_size=1, queue_depth=0)
+    with pytest.raises(RuntimeError):
+        engine.submit(1, "test", lambda: None)
@@ -0,0 +1,112 @@
+import asyncio
+from typing import Any, List
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from api.job_dedup import JobDeduplicator, JobRunKeyConflict, get_run_key
+from db.crud.job_run_keys import JobRunClaim, claim_job_run
+from db.tables.job_run_keys import JobRunKeys
+from db.tables.job_runs import JobRuns
+
+
+class FakeDb:
+    """Stands in for RequestDb, creating a new run on each claim."""
+
+    def __init__(self) -> None:
+        self.calls: List[Any] = []
+
+    async def run(self, fn, *args: Any) -> JobRunClaim:
+        self.calls.append(args)
+        await asyncio.sleep(0.01)
+        return JobRunClaim(id_job_run=len(self.calls), status="queued", created=True)
+
+
+def test_run_keys():
+    params = {"b": 1, "a": [1, 2]}
+    assert get_run_key("/run", "test", params) is None
+    key = get_run_key("/run", "test", params, coalesce=True)
+    assert key is not None and key.kind == "coalesce"
+    # The same params in another order are the same request
+    same = get_run_key("/run", "test", {"a": [1, 2], "b": 1}, coalesce=True)
+    assert same is not None and same.value == key.value
+    other = get_run_key("/run", "other", params, coalesce=True)
+    assert other is not None and other.value != key.value
+    idempotent = get_run_key("/run", "test", params, idempotency_key="k", coalesce=True)
+    assert idempotent is not None and idempotent.kind == "idempotency"
+    # Idempotency keys do not depend on the params, which are checked by hash
+    changed = get_run_key("/run", "test", {"a": 1}, idempotency_key="k")
+    assert changed is not None and changed.value == idempotent.value
+    assert changed.params_hash != idempotent.params_hash
+    assert idempotent.params_hash == key.params_hash
+
+
+def test_concurrent_claims_share_one_run():
+    deduplicator = JobDeduplicator()
+    db = FakeDb()
+    run_key = get_run_key("/run", "test", {}, coalesce=True)
+    assert run_key is not None
+
+    async def claim_many(n: int) -> List[JobRunClaim]:
+        return await asyncio.gather(
+            *(deduplicator.claim(db, run_key, "test") for _ in range(n))  # type: ignore
+        )
+
+    claims = asyncio.run(claim_many(20))
+    assert len(db.calls) == 1
+    assert [claim.created for claim in claims].count(True) == 1
+    assert {claim.id_job_run for claim in claims} == {1}
+
+    # Runs started here attach without the database while they are active
+    deduplicator.on_status(1, "test", "running")
+    claims = asyncio.run(claim_many(5))
+    assert len(db.calls) == 1
+    assert {claim.status for claim in claims} == {"running"}
+
+    # Once the run ends, the next request goes to the database
+    deduplicator.on_status(1, "test", "success")
+    claims = asyncio.run(claim_many(5))
+    assert len(db.calls) == 2
+    assert {claim.id_job_run for claim in claims} == {2}
+
+
+class SessionDb:
+    """Stands in for RequestDb, running db functions on one session."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def run(self, fn, *args: Any, **kwargs: Any) -> Any:
+        return fn(self.session, *args, **kwargs)
+
+
+def test_idempotency_key_with_other_params_conflicts():
+    engine = create_engine("sqlite://")
+    JobRuns.__table__.create(engine)
+    JobRunKeys.__table__.create(engine)
+    run_key = get_run_key("/run", "test", {"a": 1}, idempotency_key="k")
+    other = get_run_key("/run", "test", {"a": 2}, idempotency_key="k")
+    assert run_key is not None and other is not None
+
+    with Session(engine) as session:
+        db = SessionDb(session)
+        local = JobDeduplicator()
+        claim = asyncio.run(local.claim(db, run_key, "test"))  # type: ignore
+        assert claim.created and claim.params_hash == run_key.params_hash
+
+        # The deduplicator that created the run checks it in memory, a new one
+        # finds the key in the database
+        for deduplicator in (local, JobDeduplicator()):
+            same = asyncio.run(deduplicator.claim(db, run_key, "test"))  # type: ignore
+            assert not same.created and same.id_job_run == claim.id_job_run
+            with pytest.raises(JobRunKeyConflict):
+                asyncio.run(deduplicator.claim(db, other, "test"))  # type: ignore
+
+        # Keys stored before params were hashed are not checked
+        session.query(JobRunKeys).update({"params_hash": None})
+        session.commit()
+        old = claim_job_run(session, other.value, other.kind, "test", other.ttl)
+        assert not old.created and old.params_hash is None
+        old = asyncio.run(JobDeduplicator().claim(db, other, "test"))  # type: ignore
+        assert old.id_job_run == claim.id_job_run
@@ -0,0 +1,47 @@
+import asyncio
+import threading
+from typing import Any, Dict, List
+
+import api.job_events
+from api.job_events import JobRunWatcher
+
+
+def test_followers_share_one_poll(monkeypatch):
+    polls: List[List[int]] = []
+
+    def read_job_run_states(ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        polls.append(ids)
+        return {
+            id_job_run: {"status": "running", "progress_done": len(polls)}
+            for id_job_run in ids
+        }
+
+    monkeypatch.setattr(api.job_events, "read_job_run_states", read_job_run_states)
+    watcher = JobRunWatcher(poll_interval=0.05, keepalive_interval=10)
+
+    async def follow(id_job_run: int) -> List[Dict[str, Any]]:
+        states = []
+        state = {"job_name": "test", "status": "queued"}
+        async for change in watcher.follow(id_job_run, state):
+            states.append(change)
+        return states
+
+    async def run() -> List[List[Dict[str, Any]]]:
+        followers = [asyncio.ensure_future(follow(i % 2)) for i in range(50)]
+        await asyncio.sleep(0.18)
+        # Status changes from the job engines are pushed from their threads
+        for id_job_run in (0, 1):
+            threading.Thread(
+                target=watcher.on_status, args=(id_job_run, "test", "success")
+            ).start()
+        return await asyncio.wait_for(asyncio.gather(*followers), 5)
+
+    results = asyncio.run(run())
+    # One query per poll for all followers, not one per follower
+    assert 2 <= len(polls) <= 4
+    assert all(sorted(ids) == [0, 1] for ids in polls)
+    for states in results:
+        assert states[0]["status"] == "queued"
+        assert states[1]["status"] == "running"
+        assert states[-1]["status"] == "success"
+    assert watcher._queues == {}
@@ -0,0 +1,127 @@
+import asyncio
+import base64
+from datetime import datetime
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from api.routes.job_status import job_status_router
+from db.session import get_request_db
+from db.tables.job_runs import JobRuns
+
+# (id_job_run, job_name, status, start_ts), several runs share a start_ts
+RUNS = [
+    (1, "a", "success", datetime(2026, 10, 18, 9, 0)),
+    (2, "b", "failed", datetime(2026, 10, 18, 9, 0)),
+    (3, "a", "success", datetime(2026, 10, 18, 9, 0)),
+    (4, "a", "failed", datetime(2026, 10, 18, 10, 0)),
+    (5, "b", "success", datetime(2026, 10, 18, 10, 0)),
+    (6, "a", "success", datetime(2026, 10, 18, 11, 0)),
+    (7, "a", "running", datetime(2026, 10, 18, 11, 0)),
+]
+
+
+class SessionDb:
+    """Stands in for RequestDb, running db functions on one session."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def run(self, fn, *args: Any, **kwargs: Any) -> Any:
+        return fn(self.session, *args, **kwargs)
+
+
+@pytest.fixture
+def client():
+    engine = create_engine("sqlite://")
+    JobRuns.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(JobRuns.__table__),
+            [
+                {
+                    "id_job_run": id_job_run,
+                    "job_name": job_name,
+                    "status": status,
+                    "start_ts": start_ts,
+                    "update_ts": start_ts,
+                }
+                for id_job_run, job_name, status, start_ts in RUNS
+            ],
+        )
+    app = FastAPI()
+    app.include_router(job_status_router, prefix="/v1")
+    with Session(engine) as session:
+        app.dependency_overrides[get_request_db] = lambda: SessionDb(session)
+        yield app
+
+
+def get(app: FastAPI, params: Dict[str, Any]) -> httpx.Response:
+    async def request() -> httpx.Response:
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            return await client.get("/v1/status/job_runs", params=params)
+
+    return asyncio.run(request())
+
+
+def read_pages(app: FastAPI, **params: Any) -> List[List[Dict[str, Any]]]:
+    pages = []
+    cursor = None
+    while True:
+        page_params = {**params, **({"cursor": cursor} if cursor else {})}
+        response = get(app, page_params)
+        assert response.status_code == 200, response.text
+        pages.append(response.json()["job_runs"])
+        cursor = response.json()["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_pages_split_runs_that_started_at_the_same_time(client):
+    pages = read_pages(client, limit=2)
+    ids = [run["id_job_run"] for page in pages for run in page]
+    assert ids == [7, 6, 5, 4, 3, 2, 1]
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+
+    pages = read_pages(client, limit=1, job_name="a", status="success")
+    assert [run["id_job_run"] for page in pages for run in page] == [6, 3, 1]
+
+
+def test_fields_projection(client):
+    pages = read_pages(client, limit=3, fields="status, job_name")
+    assert [len(page) for page in pages] == [3, 3, 1]
+    # The cursor works without the keyset columns in the response
+    assert all(set(run) == {"status", "job_name"} for page in pages for run in page)
+    assert [run["status"] for run in pages[0]] == ["running", "success", "success"]
+
+    assert get(client, {"fields": "status,password"}).status_code == 422
+    assert get(client, {"fields": ","}).status_code == 422
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "not a cursor",
+        base64.urlsafe_b64encode(b'["yesterday", 3]').decode(),
+        base64.urlsafe_b64encode(b'["2026-10-18T09:00:00"]').decode(),
+        base64.urlsafe_b64encode(b'{"id": 3}').decode(),
+    ],
+)
+def test_invalid_cursor(client, cursor):
+    response = get(client, {"cursor": cursor})
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_since_and_until_with_a_timezone(client):
+    # 11:00+02:00 is 09:00 UTC and 12:00+02:00 is 10:00 UTC
+    pages = read_pages(
+        client, since="2026-10-18T11:00:00+02:00", until="2026-10-18T12:00:00+02:00"
+    )
+    assert [run["id_job_run"] for run in pages[0]] == [3, 2, 1]
+    pages = read_pages(client, since="2026-10-18T10:00:00Z")
+    assert [run["id_job_run"] for run in pages[0]] == [7, 6, 5, 4]
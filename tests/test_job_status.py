@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+
+import httpx
+from fastapi import FastAPI
+
+from api.routes.job_status import (
+    invalidate_job_status,
+    job_status_cache,
+    job_status_router,
+)
+from db.session import get_request_db
+from utils.ttl_cache import TTLCache
+
+
+def test_set_skips_values_read_before_a_delete():
+    cache: TTLCache[str] = TTLCache(ttl=60, maxsize=2)
+    generation = cache.generation("a")
+    cache.set("a", "old", generation)
+    assert cache.get("a") == "old"
+
+    generation = cache.generation("a")
+    cache.delete("a")
+    cache.set("a", "stale", generation)
+    assert cache.get("a") is None
+    cache.set("a", "new", cache.generation("a"))
+    assert cache.get("a") == "new"
+
+    # Keys whose generation was evicted still reject older values
+    generation = cache.generation("a")
+    cache.delete("a")
+    cache.delete("b")
+    cache.delete("c")
+    cache.set("a", "stale", generation)
+    assert cache.get("a") is None
+
+
+class SlowDb:
+    """Returns a running run, and finishes it while the read is in flight."""
+
+    async def run(self, fn, *args: Any, **kwargs: Any) -> Any:
+        invalidate_job_status(1, "test", "success")
+        return SimpleNamespace(
+            status="running", id_job_run=1, progress_done=None, progress_total=None
+        )
+
+
+def test_status_read_during_a_change_is_not_cached():
+    app = FastAPI()
+    app.include_router(job_status_router, prefix="/v1")
+    app.dependency_overrides[get_request_db] = SlowDb
+
+    async def request() -> httpx.Response:
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            return await client.post("/v1/status/job", json={"job_name": "test"})
+
+    job_status_cache.clear()
+    assert asyncio.run(request()).json()["job_status"] == "running"
+    assert job_status_cache.get("test") is None
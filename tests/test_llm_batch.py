@@ -0,0 +1,106 @@
+import polars as pl
+import pytest
+
+from api.settings import api_settings
+from jobs.llm_batch import get_output_uri, llm_batch_job
+from llm.mock_upstream import create_mock_app
+from tests.test_completions import run_server
+
+ROWS = 60
+
+
+@pytest.fixture
+def batch_settings(tmp_path, monkeypatch):
+    datasets_dir = tmp_path.joinpath("datasets")
+    datasets_dir.mkdir()
+    pl.DataFrame(
+        {"review_id": list(range(ROWS)), "review": [f"r{i}" for i in range(ROWS)]}
+    ).write_csv(datasets_dir.joinpath("reviews.csv"))
+    monkeypatch.setattr(api_settings, "datasets_dir", str(datasets_dir))
+    monkeypatch.setattr(api_settings, "llm_batch_output_uri", str(tmp_path / "out"))
+    monkeypatch.setattr(api_settings, "llm_batch_checkpoint_rows", 10)
+    monkeypatch.setattr(api_settings, "openai_api_key", "test")
+    return tmp_path
+
+
+def run_batch() -> dict:
+    return llm_batch_job(
+        dataset="reviews.csv",
+        prompt_template="Classify {review}",
+        id_column="review_id",
+        model="mock",
+        concurrency=8,
+    )
+
+
+def read_results(output: str) -> pl.DataFrame:
+    """Returns the latest result of each row."""
+    results = pl.read_parquet(f"{output}/part-*.parquet")
+    return results.unique(subset="row", keep="last").sort("row")
+
+
+def test_batch_backs_off_on_rate_limits_and_resumes(batch_settings, monkeypatch):
+    # The mock serves 3 requests at a time and rate limits the rest
+    mock_app = create_mock_app(chunks=2, delay=0.01, max_concurrent=3, retry_after=0.02)
+    stats = mock_app.state.stats
+    with run_server(mock_app) as upstream_url:
+        monkeypatch.setattr(api_settings, "openai_base_url", upstream_url)
+        # Without retries, rows that are rate limited fail
+        max_retries = api_settings.llm_batch_max_retries
+        monkeypatch.setattr(api_settings, "llm_batch_max_retries", 0)
+        result = run_batch()
+        assert result["done"] == ROWS
+        assert result["failed"] == stats.rate_limited > 0
+        failed_rows = (
+            read_results(result["output"])
+            .filter(pl.col("error").is_not_null())["row"]
+            .to_list()
+        )
+        assert len(failed_rows) == result["failed"]
+
+        # The failed rows are run again, and back off on rate limits
+        monkeypatch.setattr(api_settings, "llm_batch_max_retries", max_retries)
+        rate_limited = stats.rate_limited
+        result = run_batch()
+
+        assert result["rows"] == ROWS
+        assert result["done"] == ROWS
+        assert result["failed"] == 0
+        assert result["rate_limits"] == stats.rate_limited - rate_limited
+        results = read_results(result["output"])
+        assert results["row"].to_list() == list(range(ROWS))
+        assert results["review_id"].to_list() == list(range(ROWS))
+        assert results["content"][5] == "Classify-0 Classify-1 "
+        # The latest result of the rows that failed before succeeded
+        assert results["error"].null_count() == ROWS
+
+        # Completed rows are not run again
+        completions = stats.requests - stats.rate_limited
+        assert completions == ROWS
+        assert run_batch()["done"] == ROWS
+        assert stats.requests - stats.rate_limited == completions
+
+        # Rows that succeeded in a missing checkpoint file are run again
+        part = sorted(batch_settings.joinpath("out").glob("*/part-*.parquet"))[0]
+        lost_rows = pl.read_parquet(part)["error"].null_count()
+        part.unlink()
+        assert run_batch()["done"] == ROWS
+        assert stats.requests - stats.rate_limited == completions + lost_rows
+    assert read_results(result["output"])["row"].to_list() == list(range(ROWS))
+
+
+def test_batch_records_errors(batch_settings, monkeypatch):
+    monkeypatch.setattr(api_settings, "openai_base_url", "http://127.0.0.1:1")
+    monkeypatch.setattr(api_settings, "llm_batch_max_retries", 0)
+    result = run_batch()
+    assert result["failed"] == ROWS
+    results = read_results(result["output"])
+    assert results["content"].null_count() == ROWS
+    assert results["attempts"].to_list() == [1] * ROWS
+
+
+@pytest.mark.parametrize("output", ["/etc/batch", "../batch", "a/../../batch", ".."])
+def test_batch_output_must_stay_under_output_uri(batch_settings, output):
+    with pytest.raises(ValueError, match="llm_batch_output_uri"):
+        llm_batch_job(dataset="reviews.csv", output=output)
+    assert get_output_uri("a/../b") == str(batch_settings / "out") + "/b"
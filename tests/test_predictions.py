@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+import pytest
+
+import api.predictions
+from api.predictions import CachedModel, ModelCache, PredictionBatcher
+
+
+@pytest.fixture
+def loads(monkeypatch) -> List[str]:
+    """Stands in for the artifact store. Models are 40 bytes and take 50ms to
+    load. Returns the ids of the models loaded."""
+    loaded: List[str] = []
+    lock = threading.Lock()
+
+    def load_cached_model(model_id: str) -> CachedModel:
+        time.sleep(0.05)
+        with lock:
+            loaded.append(model_id)
+        nbytes = 200 if model_id == "large" else 40
+        return CachedModel(model_id, estimator=None, n_features=2, nbytes=nbytes)
+
+    monkeypatch.setattr(api.predictions, "load_cached_model", load_cached_model)
+    return loaded
+
+
+def test_least_recently_used_models_are_evicted(loads):
+    cache = ModelCache(max_bytes=100)
+    cache.get("a")
+    cache.get("b")
+    # a was used last, so b is evicted to make room for c
+    assert cache.get_cached("a") is not None
+    cache.get("c")
+    assert cache.get_cached("b") is None
+    assert cache.stats()["bytes"] == 80
+    assert cache.stats()["evictions"] == 1
+
+    # Models larger than the cache are served but not kept
+    assert cache.get("large").nbytes == 200
+    assert cache.get_cached("large") is None
+    assert cache.get_cached("a") is not None and cache.get_cached("c") is not None
+    assert loads == ["a", "b", "c", "large"]
+
+
+def test_concurrent_requests_load_a_model_once(loads):
+    cache = ModelCache(max_bytes=100)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        models = list(pool.map(cache.get, ["a"] * 8 + ["b"] * 8))
+    assert sorted(loads) == ["a", "b"]
+    assert len({id(model) for model in models[:8]}) == 1
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["hits"] == 14
+
+
+@pytest.fixture
+def batches(monkeypatch) -> List[List[List[float]]]:
+    """Records the rows of each batch, predicting the sum of each row."""
+    predicted: List[List[List[float]]] = []
+
+    def predict_rows(model: CachedModel, rows: List[List[float]]) -> List[Any]:
+        if model.model_id == "broken":
+            raise ValueError("X has 1 feature, but the model expects 2")
+        predicted.append(rows)
+        time.sleep(0.01)
+        return [sum(row) for row in rows]
+
+    monkeypatch.setattr(api.predictions, "predict_rows", predict_rows)
+    return predicted
+
+
+def predict_many(
+    batcher: PredictionBatcher, model_id: str, rows: List[List[float]]
+) -> List[Any]:
+    model = CachedModel(model_id, estimator=None, n_features=2, nbytes=0)
+
+    async def predict() -> List[Any]:
+        return await asyncio.gather(
+            *(batcher.predict(model, row) for row in rows), return_exceptions=True
+        )
+
+    return asyncio.run(predict())
+
+
+def test_concurrent_rows_are_predicted_in_one_batch(batches):
+    batcher = PredictionBatcher(window=0.05, max_batch_size=8)
+    rows = [[float(i), 1.0] for i in range(5)]
+    assert predict_many(batcher, "m", rows) == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert batches == [rows]
+    assert batcher.stats() == {"batches": 1, "rows": 5}
+
+
+def test_batches_are_capped_at_max_batch_size(batches):
+    batcher = PredictionBatcher(window=10, max_batch_size=4)
+    rows = [[float(i), 0.0] for i in range(10)]
+    # Full batches do not wait for the window, rows that arrive while a batch
+    # runs go in the next one
+    start = time.monotonic()
+    assert predict_many(batcher, "m", rows) == [float(i) for i in range(10)]
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert time.monotonic() - start < 10
+    assert batcher.stats() == {"batches": 3, "rows": 10}
+
+
+def test_batch_failure_reaches_every_request(batches):
+    batcher = PredictionBatcher(window=0.05, max_batch_size=8)
+    results = predict_many(batcher, "broken", [[1.0], [2.0], [3.0]])
+    assert len(results) == 3
+    assert all(isinstance(result, ValueError) for result in results)
+    # The batcher is not stuck after a failed batch
+    assert predict_many(batcher, "m", [[1.0, 2.0]]) == [3.0]
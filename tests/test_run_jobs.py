@@ -0,0 +1,33 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+import httpx
+from fastapi import FastAPI
+
+from api.routes.run_jobs import run_jobs_router
+from db.session import get_request_db
+
+
+def post_jobs(body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+    app = FastAPI()
+    app.include_router(run_jobs_router, prefix="/v1")
+    # Rejected requests do not reach the database
+    app.dependency_overrides[get_request_db] = lambda: None
+
+    async def request() -> httpx.Response:
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            return await client.post("/v1/run/jobs", json=body, headers=headers)
+
+    return asyncio.run(request())
+
+
+def test_batch_rejects_deduplication_options():
+    response = post_jobs({"jobs": [{"job_name": "test"}, {"coalesce": True}]})
+    assert response.status_code == 422
+    assert "coalesce is only supported by /v1/run/job" in response.text
+
+    response = post_jobs({"jobs": [{"job_name": "test"}]}, {"Idempotency-Key": "k"})
+    assert response.status_code == 422
+    assert (
+        response.json()["detail"] == "Idempotency-Key is only supported by /v1/run/job"
+    )
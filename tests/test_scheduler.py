@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import db.crud.job_leases
+import jobs.scheduler
+from db.crud.job_leases import acquire_lease, release_lease
+from db.tables.job_leases import JobLeases
+from jobs.engine import JobQueueFull
+from jobs.scheduler import JobScheduler
+from jobs.schedules import ScheduledJob
+
+NOW = datetime(2026, 10, 18, 5, 30, tzinfo=timezone.utc)
+
+
+class FakeEngine:
+    """Records submitted runs, with `slots` free slots."""
+
+    def __init__(self, slots: int = 100):
+        self.slots = slots
+        self.submitted: List[int] = []
+
+    def reserve(self) -> None:
+        if self.slots == 0:
+            raise JobQueueFull("Job queue is full")
+        self.slots -= 1
+
+    def release(self, count: int = 1) -> None:
+        self.slots += count
+
+    def submit(self, id_job_run, job_name, job_fn, job_params=None) -> None:
+        self.submitted.append(id_job_run)
+
+
+@pytest.fixture
+def scheduled(monkeypatch):
+    """Stands in for the lease and job_runs queries. Returns the scheduled_ts of
+    the runs created."""
+    created: List[datetime] = []
+    state = {"lease": True, "last_scheduled_ts": None}
+
+    def create_job_run(db, job_name, status, scheduled_ts=None):
+        created.append(scheduled_ts)
+        return len(created)
+
+    monkeypatch.setattr(jobs.scheduler, "acquire_lease", lambda *args: state["lease"])
+    monkeypatch.setattr(
+        jobs.scheduler, "get_last_scheduled_ts", lambda *a: state["last_scheduled_ts"]
+    )
+    monkeypatch.setattr(jobs.scheduler, "create_job_run", create_job_run)
+    return created, state
+
+
+def create_scheduler(engine: FakeEngine, max_catchup: int = 1) -> JobScheduler:
+    schedule = ScheduledJob(job_name="test", cron="0 * * * *", max_catchup=max_catchup)
+    return JobScheduler([schedule], engine, interval=60, lease_ttl=30)
+
+
+def test_catches_up_on_the_latest_missed_runs(scheduled):
+    created, state = scheduled
+    engine = FakeEngine()
+    # Last run at midnight, so the 1:00 to 5:00 runs were missed
+    state["last_scheduled_ts"] = datetime(2026, 10, 18, 0, 0)
+    assert create_scheduler(engine, max_catchup=3).tick(NOW) == 3
+    assert created == [datetime(2026, 10, 18, hour) for hour in (3, 4, 5)]
+    assert engine.submitted == [1, 2, 3]
+
+    state["last_scheduled_ts"] = datetime(2026, 10, 18, 5, 0)
+    assert create_scheduler(engine).tick(NOW) == 0
+
+
+def test_first_tick_only_runs_the_last_interval(scheduled):
+    created, _ = scheduled
+    scheduler = create_scheduler(FakeEngine(), max_catchup=10)
+    assert scheduler.tick(NOW) == 0
+    assert scheduler.tick(NOW.replace(hour=6, minute=0, second=30)) == 1
+    assert created == [datetime(2026, 10, 18, 6, 0)]
+
+
+def test_only_the_lease_holder_dispatches(scheduled):
+    created, state = scheduled
+    state["lease"] = False
+    state["last_scheduled_ts"] = datetime(2026, 10, 18, 0, 0)
+    assert create_scheduler(FakeEngine(), max_catchup=3).tick(NOW) == 0
+    assert created == []
+
+
+def test_full_queue_delays_runs(scheduled):
+    created, state = scheduled
+    engine = FakeEngine(slots=1)
+    state["last_scheduled_ts"] = datetime(2026, 10, 18, 0, 0)
+    assert create_scheduler(engine, max_catchup=3).tick(NOW) == 1
+    assert created == [datetime(2026, 10, 18, 3, 0)]
+
+
+@pytest.fixture
+def lease_db(monkeypatch):
+    engine = create_engine("sqlite://")
+    JobLeases.__table__.create(engine)
+    clock = {"now": NOW}
+    monkeypatch.setattr(db.crud.job_leases, "current_utc", lambda: clock["now"])
+    with Session(engine) as session:
+        yield session, clock
+
+
+def advance(clock, seconds: float) -> None:
+    clock["now"] += timedelta(seconds=seconds)
+
+
+def test_lease_is_held_until_it_expires(lease_db):
+    session, clock = lease_db
+    assert acquire_lease(session, "scheduler", "a", ttl=30)
+    assert not acquire_lease(session, "scheduler", "b", ttl=30)
+
+    # Renewing at 20 s moves the expiry to 50 s, so b cannot take it at 40 s
+    advance(clock, 20)
+    assert acquire_lease(session, "scheduler", "a", ttl=30)
+    advance(clock, 20)
+    assert not acquire_lease(session, "scheduler", "b", ttl=30)
+
+    # a stopped renewing, so b takes the lease over once it expires
+    advance(clock, 11)
+    assert acquire_lease(session, "scheduler", "b", ttl=30)
+    assert not acquire_lease(session, "scheduler", "a", ttl=30)
+    assert session.get(JobLeases, "scheduler").owner == "b"
+
+
+def test_released_lease_can_be_taken_right_away(lease_db):
+    session, clock = lease_db
+    assert acquire_lease(session, "scheduler", "a", ttl=30)
+    # Only the owner can release it
+    release_lease(session, "scheduler", "b")
+    advance(clock, 1)
+    assert not acquire_lease(session, "scheduler", "b", ttl=30)
+
+    release_lease(session, "scheduler", "a")
+    advance(clock, 1)
+    assert acquire_lease(session, "scheduler", "b", ttl=30)
+    # Leases are independent of each other
+    assert acquire_lease(session, "archive", "a", ttl=30)
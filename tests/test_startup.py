@@ -0,0 +1,17 @@
+import subprocess
+import sys
+
+# Imported when the routes that use them are called, not when the api starts
+DEFERRED_MODULES = ["numpy", "polars", "pandas", "pyarrow", "sklearn", "duckdb"]
+
+
+def test_api_starts_without_heavy_imports():
+    code = (
+        "import sys, api.app; "
+        f"print('loaded:', *(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    # The api can log to stdout while it is imported, the modules are printed last
+    assert output.rsplit("loaded:", 1)[1].split() == []
@@ -0,0 +1,62 @@
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List
+
+import pytest
+
+from jobs.status import job_run_status
+from jobs.sweeps import SweepSpec, run_successive_halving
+
+
+class BrokenExecutor(Executor):
+    """Runs the first n_ok calls and then fails like a pool whose worker died."""
+
+    def __init__(self, n_ok: int):
+        self.n_ok = n_ok
+
+    def submit(self, fn, *args, **kwargs):
+        if self.n_ok <= 0:
+            raise BrokenProcessPool("A worker process died")
+        self.n_ok -= 1
+        future: Future = Future()
+        future.set_result(100 if fn.__name__ == "get_sweep_train_size" else 0.5)
+        return future
+
+
+def test_random_candidates_of_large_grid():
+    grid = {f"p{i}": list(range(10)) for i in range(10)}
+    sweep = SweepSpec(param_grid=grid, search="random", n_candidates=16)
+    assert sweep.get_grid_size() == 10**10
+    candidates = sweep.get_candidates(max_candidates=16)
+    assert len(candidates) == 16
+    assert len({tuple(c.values()) for c in candidates}) == 16
+    assert all(sorted(c) == sorted(grid) for c in candidates)
+    assert candidates == sweep.get_candidates()
+
+    with pytest.raises(ValueError, match="limit is 4"):
+        SweepSpec(param_grid=grid).get_candidates(max_candidates=4)
+
+
+def test_random_candidates_cover_small_grid():
+    grid = {"a": [1, 2, 3], "b": ["x", "y"]}
+    sweep = SweepSpec(param_grid=grid, search="random", n_candidates=4)
+    candidates = sweep.get_candidates()
+    assert len(candidates) == 4
+    all_candidates = SweepSpec(param_grid=grid).get_candidates()
+    assert all(c in all_candidates for c in candidates)
+
+
+def test_trials_fail_when_the_executor_breaks():
+    sweep = SweepSpec(param_grid={"a": [1, 2, 3, 4, 5, 6]}, factor=3)
+    candidates = sweep.get_candidates()
+    statuses: Dict[int, str] = {}
+
+    def on_status(indices: List[int], status: str) -> None:
+        statuses.update({i: status for i in indices})
+
+    # The train size and three trials of the first round run
+    with pytest.raises(BrokenProcessPool):
+        run_successive_halving(
+            {}, sweep, candidates, BrokenExecutor(n_ok=4), on_status=on_status
+        )
+    assert statuses == {i: job_run_status.FAILED for i in range(len(candidates))}
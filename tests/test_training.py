@@ -0,0 +1,161 @@
+import asyncio
+from typing import Any, Dict, List
+
+import httpx
+import polars as pl
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import api.routes.train_jobs
+from api.routes.train_jobs import train_jobs_router
+from api.settings import api_settings
+from db.session import get_request_db
+from db.tables.job_run_keys import JobRunKeys
+from db.tables.job_runs import JobRuns
+from jobs.artifacts import artifact_store
+from jobs.training import (
+    TrainSpec,
+    get_dataset_hash,
+    get_dataset_path,
+    get_estimator_class,
+)
+from tests.test_job_runs_list import SessionDb
+
+
+class InlineEngine:
+    """Runs submitted jobs right away, in the calling thread."""
+
+    pool_size = 1
+
+    def __init__(self) -> None:
+        self.submitted: List[int] = []
+
+    def reserve(self) -> None:
+        pass
+
+    def release(self, count: int = 1) -> None:
+        pass
+
+    def submit(self, id_job_run, job_name, job_fn, job_params=None) -> None:
+        self.submitted.append(id_job_run)
+        job_fn(**(job_params or {}))
+
+
+@pytest.fixture
+def datasets_dir(tmp_path, monkeypatch):
+    datasets_dir = tmp_path.joinpath("datasets")
+    datasets_dir.mkdir()
+    pl.DataFrame(
+        {
+            "x1": [float(i % 7) for i in range(40)],
+            "x2": [float(i % 5) for i in range(40)],
+            "label": [i % 2 for i in range(40)],
+        }
+    ).write_csv(datasets_dir.joinpath("small.csv"))
+    monkeypatch.setattr(api_settings, "datasets_dir", str(datasets_dir))
+    monkeypatch.setattr(artifact_store, "uri", str(tmp_path / "artifacts"))
+    return datasets_dir
+
+
+@pytest.fixture
+def app(datasets_dir, monkeypatch):
+    engine = create_engine("sqlite://")
+    JobRuns.__table__.create(engine)
+    JobRunKeys.__table__.create(engine)
+    train_engine = InlineEngine()
+    monkeypatch.setattr(api.routes.train_jobs, "train_engine", train_engine)
+    app = FastAPI()
+    app.include_router(train_jobs_router, prefix="/v1")
+    app.state.train_engine = train_engine
+    with Session(engine) as session:
+        app.dependency_overrides[get_request_db] = lambda: SessionDb(session)
+        yield app
+
+
+def post(app: FastAPI, body: Dict[str, Any]) -> httpx.Response:
+    async def request() -> httpx.Response:
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            return await client.post("/v1/train/job", json=body)
+
+    return asyncio.run(request())
+
+
+@pytest.mark.parametrize("dataset", ["../small.csv", "/etc/passwd", "a/../../x.csv"])
+def test_dataset_must_be_under_datasets_dir(datasets_dir, dataset):
+    with pytest.raises(FileNotFoundError, match="datasets_dir"):
+        get_dataset_path(dataset)
+    assert get_dataset_path("small.csv") == datasets_dir.joinpath("small.csv")
+
+
+def test_only_listed_estimators_are_created():
+    assert get_estimator_class("ridge").__name__ == "Ridge"
+    for estimator in ["os.system", "sklearn.linear_model.Ridge", "builtins.eval"]:
+        with pytest.raises(ValueError, match="Unknown estimator"):
+            get_estimator_class(estimator)
+
+
+def test_model_id_depends_on_spec_and_data(datasets_dir):
+    data_hash = get_dataset_hash("small.csv")
+    spec = TrainSpec(dataset="small.csv", estimator="ridge", params={"a": 1, "b": 2})
+    same = TrainSpec(dataset="small.csv", estimator="ridge", params={"b": 2, "a": 1})
+    assert spec.get_model_id(data_hash) == same.get_model_id(data_hash)
+    other = TrainSpec(dataset="small.csv", estimator="ridge", params={"a": 2, "b": 2})
+    assert other.get_model_id(data_hash) != spec.get_model_id(data_hash)
+    assert spec.get_model_id("0" * 64) != spec.get_model_id(data_hash)
+
+    # Changing the file changes its hash
+    datasets_dir.joinpath("small.csv").write_text("x1,label\n1,0\n2,1\n")
+    assert get_dataset_hash("small.csv") != data_hash
+
+
+def test_trained_model_is_cached(app):
+    body = {
+        "dataset": "small.csv",
+        "target": "label",
+        "estimator": "logistic_regression",
+        "params": {"C": 0.5},
+    }
+    first = post(app, body)
+    assert first.status_code == 200, first.text
+    assert first.json()["job_status"] == "queued"
+    assert not first.json()["cached"]
+    assert app.state.train_engine.submitted == [first.json()["id_job_run"]]
+
+    second = post(app, body)
+    assert second.json()["job_status"] == "success"
+    assert second.json()["cached"]
+    assert second.json()["model_id"] == first.json()["model_id"]
+    assert second.json()["score"] is not None
+    # The second request did not train the model again
+    assert len(app.state.train_engine.submitted) == 1
+
+    other = post(app, {**body, "params": {"C": 1.0}})
+    assert not other.json()["cached"]
+    assert other.json()["model_id"] != first.json()["model_id"]
+    assert len(app.state.train_engine.submitted) == 2
+
+
+def test_train_job_rejects_unknown_estimators_and_datasets(app):
+    response = post(app, {"estimator": "os.system"})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Unknown estimator: os.system"
+    response = post(app, {"dataset": "../small.csv", "estimator": "ridge"})
+    assert response.status_code == 404
+    assert app.state.train_engine.submitted == []
+
+
+def test_failed_submit_fails_the_run(app):
+    def submit(*args, **kwargs):
+        raise RuntimeError("pool is broken")
+
+    app.state.train_engine.submit = submit
+    body = {"dataset": "small.csv", "target": "label", "estimator": "ridge"}
+    response = post(app, body)
+    assert response.json()["job_status"] == "failed"
+    session = app.dependency_overrides[get_request_db]().session
+    assert [run.status for run in session.query(JobRuns)] == ["failed"]
+    # The coalesce key was freed, so the next request starts a new run
+    del app.state.train_engine.submit
+    assert post(app, body).json()["job_status"] == "queued"
@@ -0,0 +1,143 @@
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Returns the indices of n_out points picked by Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept. The points in between are split into
+    n_out - 2 buckets, and from each bucket the point that forms the largest
+    triangle with the point picked from the previous bucket and the mean of the
+    next bucket is kept. The bucket means are computed up front, and each
+    bucket's triangles in one vectorized step, so the python loop only runs once
+    per output point. x must be sorted.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket i covers [edges[i], edges[i + 1]), edges[-1] is the last point
+    every = (n - 2) / (n_out - 2)
+    edges = (np.arange(n_out - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+    counts = np.diff(edges)
+    means_x = np.add.reduceat(x[: n - 1], edges[:-1]) / counts
+    means_y = np.add.reduceat(y[: n - 1], edges[:-1]) / counts
+    # The triangle of bucket i ends at the mean of bucket i + 1,
+    # the triangle of the last bucket at the last point
+    next_x = np.append(means_x[1:], x[-1])
+    next_y = np.append(means_y[1:], y[-1])
+
+    # Twice the area of the triangle (a, b, next) is |slope_y * y_b + slope_x * x_b
+    # + offset|, so each bucket takes one pass over its points. The loop uses python
+    # floats, numpy scalars are slower to do arithmetic with.
+    edges_list = edges.tolist()
+    next_x_list = next_x.tolist()
+    next_y_list = next_y.tolist()
+    sampled = [0] * n_out
+    sampled[-1] = n - 1
+    a = 0
+    ax, ay = float(x[0]), float(y[0])
+    for i in range(n_out - 2):
+        start, end = edges_list[i], edges_list[i + 1]
+        slope_y = ax - next_x_list[i]
+        slope_x = next_y_list[i] - ay
+        offset = -slope_y * ay - slope_x * ax
+        areas = np.abs(slope_y * y[start:end] + slope_x * x[start:end] + offset)
+        a = start + int(areas.argmax())
+        sampled[i + 1] = a
+        ax, ay = float(x[a]), float(y[a])
+    return np.array(sampled, dtype=np.int64)
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Returns the indices of the first, last and the min and max point of each of
+    n_out / 2 equal buckets, in order.
+
+    Keeps every peak and dip, so lines drawn from the result have the same
+    envelope as the full series. The full buckets are a 2d view of y, so this runs
+    in a few vectorized passes over the data without copying it. With n_out of 3
+    there is no room for a min and a max, so the one further from the mean of y is
+    kept.
+    """
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    y = np.asarray(y)
+    if n_out < 4:
+        extremes = np.array([np.argmin(y), np.argmax(y)])
+        extreme = extremes[np.argmax(np.abs(y[extremes] - y.mean()))]
+        return np.unique([0, n - 1, extreme][:n_out])
+    n_buckets = (n_out - 2) // 2
+    size = -(-n // n_buckets)
+    n_full = n // size
+    buckets = y[: n_full * size].reshape(n_full, size)
+    offsets = np.arange(n_full) * size
+    parts = [
+        np.array([0, n - 1]),
+        offsets + np.argmin(buckets, axis=1),
+        offsets + np.argmax(buckets, axis=1),
+    ]
+    if n_full * size < n:
+        # The last bucket is shorter
+        tail = y[n_full * size :]
+        parts.append(n_full * size + np.array([np.argmin(tail), np.argmax(tail)]))
+    return np.unique(np.concatenate(parts))
+
+
+def minmax_lttb_indices(
+    x: np.ndarray, y: np.ndarray, n_out: int, ratio: int = 4
+) -> np.ndarray:
+    """Returns the indices of n_out points picked by LTTB from the min and max
+    points of ratio * n_out buckets.
+
+    The min/max pass cuts large series down to a few times n_out points, which
+    keeps the shape LTTB picks from, so LTTB runs on thousands of points instead
+    of millions.
+    """
+    if len(y) <= n_out * ratio:
+        return lttb_indices(x, y, n_out)
+    candidates = minmax_indices(y, n_out * ratio)
+    return candidates[lttb_indices(x[candidates], y[candidates], n_out)]
+
+
+DOWNSAMPLERS: Dict[str, Callable[[np.ndarray, np.ndarray, int], np.ndarray]] = {
+    "minmax_lttb": minmax_lttb_indices,
+    "lttb": lttb_indices,
+    "minmax": lambda x, y, n_out: minmax_indices(y, n_out),
+}
+
+
+def get_viewport(
+    x: np.ndarray, x_min: Optional[float] = None, x_max: Optional[float] = None
+) -> slice:
+    """Returns the slice of the sorted x that is in [x_min, x_max], plus the point
+    on each side, so lines run to the edges of the view."""
+    start = 0 if x_min is None else int(np.searchsorted(x, x_min, side="left"))
+    end = len(x) if x_max is None else int(np.searchsorted(x, x_max, side="right"))
+    return slice(max(0, start - 1), min(len(x), end + 1))
+
+
+def downsample(
+    x: np.ndarray,
+    y: np.ndarray,
+    n_out: int,
+    method: str = "minmax_lttb",
+    x_min: Optional[float] = None,
+    x_max: Optional[float] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns at most n_out points of the part of a series in [x_min, x_max].
+
+    When a chart zooms in, downsampling again with the new range shows the detail
+    in that range, rather than stretching the points picked for the whole series.
+    x must be sorted. method is one of DOWNSAMPLERS.
+    """
+    if method not in DOWNSAMPLERS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    viewport = get_viewport(x, x_min, x_max)
+    x, y = x[viewport], y[viewport]
+    indices = DOWNSAMPLERS[method](x, y, n_out)
+    return x[indices], y[indices]
@@ -7,3 +7,22 @@ def current_utc() -> datetime:
 
 def current_utc_str() -> str:
     return current_utc().strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def as_utc(dttm: datetime) -> datetime:
+    """Returns dttm as a timezone-aware UTC datetime.
+
+    Naive datetimes, such as those read back from MySQL and sqlite DATETIME columns,
+    are assumed to be in UTC.
+    """
+    if dttm.tzinfo is None:
+        return dttm.replace(tzinfo=timezone.utc)
+    return dttm.astimezone(timezone.utc)
+
+
+def as_naive_utc(dttm: datetime) -> datetime:
+    """Returns dttm as a naive UTC datetime, to compare with the DATETIME columns.
+
+    Naive datetimes are assumed to be in UTC already.
+    """
+    return as_utc(dttm).replace(tzinfo=None)
@@ -0,0 +1,18 @@
+from pathlib import Path
+from typing import TYPE_CHECKING, Tuple
+
+# pyarrow is imported when it is used, importing it adds ~0.5s to api startup
+if TYPE_CHECKING:
+    import pyarrow.fs as pafs
+
+
+def get_filesystem(uri: str) -> Tuple["pafs.FileSystem", str]:
+    """Returns the filesystem and base path for a uri.
+
+    The uri can be a local directory or a uri supported by pyarrow, e.g. s3://bucket/prefix
+    """
+    import pyarrow.fs as pafs
+
+    if "://" in uri:
+        return pafs.FileSystem.from_uri(uri)
+    return pafs.LocalFileSystem(), str(Path(uri).resolve())
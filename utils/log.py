@@ -1,11 +1,94 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from typing import IO, Any, Dict, Optional
 
+# Logging is configured using environment variables, because the logger is
+# created before ApiSettings.
+# LOG_FORMAT: "rich" for readable console output in dev, or "json" for one
+#   JSON object per line. JSON records are written by a background thread.
+# LOG_LEVEL: the minimum level logged, e.g. "INFO" or "WARNING".
+# LOG_SAMPLE_RATE: fraction of INFO and DEBUG records kept in json mode,
+#   e.g. 0.1 keeps 1 in 10. Warnings and errors are always kept.
+# LOG_QUEUE_SIZE: max records waiting for the writer thread in json mode.
+#   Records are dropped when the queue is full, so logging never blocks.
 
-def build_logger(logger_name: str) -> logging.Logger:
+# Attributes of every LogRecord, anything else was passed using `extra=`
+LOG_RECORD_ATTRS = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__)
+LOG_RECORD_ATTRS.update(("message", "asctime"))
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as compact JSON lines, including fields passed using `extra=`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        log: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in LOG_RECORD_ATTRS:
+                log[key] = value
+        if record.exc_info:
+            log["exc"] = self.formatException(record.exc_info)
+        return json.dumps(log, default=str, separators=(",", ":"))
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of INFO and lower records. Warnings and errors are always kept."""
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.INFO or random.random() < self.sample_rate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to a QueueListener without formatting them.
+
+    Records are dropped and counted when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the args now, they may change before the writer thread formats
+        # the record. Formatting is left to the writer thread.
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def build_rich_handler(stream: Optional[IO[str]] = None) -> logging.Handler:
+    from rich.console import Console
     from rich.logging import RichHandler
 
     rich_handler = RichHandler(
-        show_time=False, rich_tracebacks=False, tracebacks_show_locals=False
+        console=Console(file=stream) if stream is not None else None,
+        show_time=False,
+        rich_tracebacks=False,
+        tracebacks_show_locals=False,
     )
     rich_handler.setFormatter(
         logging.Formatter(
@@ -13,10 +96,57 @@ def build_logger(logger_name: str) -> logging.Logger:
             datefmt="[%X]",
         )
     )
+    return rich_handler
+
+
+def build_json_handler(
+    stream: Optional[IO[str]] = None,
+    sample_rate: float = 1.0,
+    queue_size: int = 10000,
+) -> NonBlockingQueueHandler:
+    """Returns a handler that queues records for a thread writing JSON lines to stream."""
+    stream_handler = logging.StreamHandler(stream or sys.stderr)
+    stream_handler.setFormatter(JsonFormatter())
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    if sample_rate < 1:
+        queue_handler.addFilter(SamplingFilter(sample_rate))
+    listener = logging.handlers.QueueListener(
+        queue_handler.queue, stream_handler, respect_handler_level=True
+    )
+    listener.start()
+    # Write the queued records before exiting
+    atexit.register(listener.stop)
+    return queue_handler
+
+
+def build_logger(
+    logger_name: str,
+    log_format: Optional[str] = None,
+    log_level: Optional[str] = None,
+    sample_rate: Optional[float] = None,
+    stream: Optional[IO[str]] = None,
+) -> logging.Logger:
+    log_format = log_format or os.getenv("LOG_FORMAT", "rich")
+    log_level = log_level or os.getenv("LOG_LEVEL", "INFO")
+    if sample_rate is None:
+        sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "1"))
+
+    handler: logging.Handler
+    if log_format == "json":
+        handler = build_json_handler(
+            stream=stream,
+            sample_rate=sample_rate,
+            queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+        )
+    elif log_format == "rich":
+        handler = build_rich_handler(stream=stream)
+    else:
+        raise ValueError(f"Invalid LOG_FORMAT: {log_format}")
 
     _logger = logging.getLogger(logger_name)
-    _logger.addHandler(rich_handler)
-    _logger.setLevel(logging.INFO)
+    _logger.addHandler(handler)
+    _logger.setLevel(log_level.upper())
     _logger.propagate = False
     return _logger
 
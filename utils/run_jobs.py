@@ -1,5 +0,0 @@
-from utils.log import logger
-
-
-async def run_scheduled_jobs():
-    logger.info("Running scheduled jobs")
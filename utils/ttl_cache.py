@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """A thread-safe in-process cache where entries expire after ttl seconds.
+
+    When the cache holds maxsize entries, the least recently used entry is evicted.
+
+    Deleting a key bumps its generation. Callers that compute a value outside the
+    lock pass the generation they read before to set(), so a value computed before
+    a delete is not stored after it.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Generation of the keys deleted last, the others are at _min_generation.
+        # Generations only increase, so evicting one raises _min_generation to it.
+        self._generations: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._last_generation = 0
+        self._min_generation = 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def generation(self, key: Hashable) -> int:
+        with self._lock:
+            return self._generations.get(key, self._min_generation)
+
+    def set(self, key: Hashable, value: V, generation: Optional[int] = None) -> None:
+        """Stores value, unless generation is given and key was deleted since it
+        was read."""
+        with self._lock:
+            current = self._generations.get(key, self._min_generation)
+            if generation is not None and generation != current:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._last_generation += 1
+            self._generations[key] = self._last_generation
+            self._generations.move_to_end(key)
+            while len(self._generations) > self.maxsize:
+                _, evicted = self._generations.popitem(last=False)
+                self._min_generation = max(self._min_generation, evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
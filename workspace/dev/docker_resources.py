@@ -57,6 +57,7 @@ container_env = {
     # Redis configuration
     "REDIS_HOST": dev_redis.get_db_host_docker(),
     "REDIS_PORT": dev_redis.get_db_port_docker(),
+    "REDIS_PASS": dev_redis.get_db_password(),
     "REDIS_SCHEMA": 1,
     # Upgrade database on startup
     # "UPGRADE_DB": True,
@@ -86,7 +87,8 @@ dev_streamlit = StreamlitApp(
     enabled=ws_settings.dev_app_enabled,
     image=dev_image,
     command="app start Home",
-    env=container_env,
+    # Call the api container on the docker network
+    env={**container_env, "API_URL": f"http://{ws_settings.ws_name}-api:9090"},
     mount_workspace=True,
     use_cache=ws_settings.use_cache,
     # Read secrets from secrets/app_secrets.yml
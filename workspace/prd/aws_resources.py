@@ -152,8 +152,16 @@ prd_fastapi = FastApiServer(
     ecs_cluster=prd_ecs_cluster,
     aws_subnets=ws_settings.subnet_ids,
     # aws_security_groups=ws_settings.security_groups,
-    # Get the OpenAI API key from the environment if available
-    env={"OPENAI_API_KEY": getenv("OPENAI_API_KEY", "")},
+    env={
+        # Get the OpenAI API key from the environment if available
+        "OPENAI_API_KEY": getenv("OPENAI_API_KEY", ""),
+        # Archive old job runs to the prd data bucket
+        "JOB_RUNS_ARCHIVE_URI": f"s3://{prd_data_s3_bucket.name}/job_runs",
+        # Store trained models in the prd data bucket
+        "ARTIFACTS_URI": f"s3://{prd_data_s3_bucket.name}/artifacts",
+        # Write JSON logs from a background thread
+        "LOG_FORMAT": "json",
+    },
     use_cache=ws_settings.use_cache,
     # Read secrets from a file
     secrets_file=ws_settings.ws_root.joinpath("workspace/secrets/api_secrets.yml"),